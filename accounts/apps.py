@@ -1,6 +1,6 @@
 from django.apps import AppConfig
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth import get_user_model
 
 class AccountsConfig(AppConfig):
@@ -19,3 +19,8 @@ class AccountsConfig(AppConfig):
                 Profile.objects.get_or_create(user=instance)
 
         post_save.connect(ensure_profile_exists, sender=UserModel, dispatch_uid="ensure_profile_exists")
+
+        from .prefs import profile_changed
+
+        post_save.connect(profile_changed, sender=Profile, dispatch_uid="invalidate_profile_prefs")
+        post_delete.connect(profile_changed, sender=Profile, dispatch_uid="invalidate_profile_prefs")
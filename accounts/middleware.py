@@ -1,21 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils import translation
 
+from .prefs import get_prefs
+
 class UserLanguageMiddleware:
     """
     If user is authenticated and has profile.language -> activate it.
     Else fallback to session/cookie/Accept-Language handled by LocaleMiddleware.
+
+    The language comes from accounts.prefs, so a warm cache adds no queries.
+    Works in both sync and async (ASGI) middleware chains.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        lang = None
-
-        if getattr(request, "user", None) and request.user.is_authenticated:
-            profile = getattr(request.user, "profile", None)
-            if profile and profile.language:
-                lang = profile.language
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
+        lang = self._user_language(request)
         if lang:
             translation.activate(lang)
             request.LANGUAGE_CODE = lang
@@ -26,3 +34,23 @@ class UserLanguageMiddleware:
             translation.deactivate()
 
         return response
+
+    async def __acall__(self, request):
+        # request.user is lazy and may hit the session / user tables.
+        lang = await sync_to_async(self._user_language)(request)
+        if lang:
+            translation.activate(lang)
+            request.LANGUAGE_CODE = lang
+
+        response = await self.get_response(request)
+
+        if lang:
+            translation.deactivate()
+
+        return response
+
+    @staticmethod
+    def _user_language(request):
+        if getattr(request, "user", None) and request.user.is_authenticated:
+            return get_prefs(request.user.pk).get("language")
+        return None
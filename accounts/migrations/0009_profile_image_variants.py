@@ -0,0 +1,23 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_profile_gender'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображений'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='images_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображения в обработке'),
+        ),
+    ]
@@ -9,6 +9,8 @@ import secrets
 import string
 from datetime import timedelta
 
+from marketplace.images import ProcessedImagesMixin
+
 def get_default_expiry():
     return timezone.now() + timedelta(minutes=15)
 
@@ -32,7 +34,9 @@ class User(AbstractUser):
         return self.username or self.email
 
 
-class Profile(models.Model):
+class Profile(ProcessedImagesMixin, models.Model):
+    IMAGE_FIELDS = {"avatar": ("thumb",)}
+
     LANG_CHOICES = (
         ("ru", "Русский"),
         ("en", "English"),
@@ -0,0 +1,49 @@
+"""
+Cached hot profile fields.
+
+The language middleware and booking notifications only need a handful of
+Profile fields; reading them through request.user.profile costs a query
+per request. get_prefs() keeps them in one cache entry per user, dropped
+by the Profile post_save/post_delete receivers (see AccountsConfig.ready):
+
+    prefs = get_prefs(user.pk)
+    prefs.get("language"), prefs.get("telegram_id")
+
+A user without a profile gets {}. QuerySet.update() on these fields
+bypasses the signals, so call invalidate() after one.
+
+The receivers invalidate once the transaction commits: dropping the entry
+earlier would let a concurrent request re-cache the old row for a day.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREF_FIELDS = ("language", "role", "telegram_id", "phone")
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def cache_key(user_id):
+    return f"accounts:prefs:{user_id}"
+
+
+def get_prefs(user_id):
+    if user_id is None:
+        return {}
+    key = cache_key(user_id)
+    prefs = cache.get(key)
+    if prefs is None:
+        from .models import Profile
+
+        prefs = Profile.objects.filter(user_id=user_id).values(*PREF_FIELDS).first() or {}
+        cache.set(key, prefs, CACHE_TIMEOUT)
+    return prefs
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def profile_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id))
@@ -1,3 +1,42 @@
-from django.test import TestCase
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from config.cache import FileCache
+
+from .models import Profile
+from .prefs import cache_key, get_prefs
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PrefsCacheTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("prefs_user", "prefs_user@example.com", "pw")
+        self.profile, _ = Profile.objects.update_or_create(user=user, defaults={"language": "ru"})
+        self.addCleanup(cache.delete, cache_key(user.pk))
+
+    def test_entry_is_dropped_only_after_commit(self):
+        self.assertEqual(get_prefs(self.profile.user_id)["language"], "ru")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.language = "uz"
+            self.profile.save()
+            # Still uncommitted: the cached row stays until commit.
+            self.assertEqual(get_prefs(self.profile.user_id)["language"], "ru")
+
+        self.assertEqual(get_prefs(self.profile.user_id)["language"], "uz")
+
+
+class FileCacheTests(TestCase):
+    def test_culls_on_every_nth_set_only(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        file_cache = FileCache(location, {"OPTIONS": {"MAX_ENTRIES": 2, "CULL_FREQUENCY": 0, "CULL_EVERY": 3}})
+
+        for key in ("a", "b"):
+            file_cache.set(key, 1)
+        file_cache.set("c", 1)  # third set: the cull clears the full cache first
+        self.assertEqual([file_cache.get(key) for key in ("a", "b", "c")], [None, None, 1])
@@ -1,3 +1,4 @@
+import logging
 import re
 import time
 import random
@@ -31,6 +32,8 @@ from marketplace.models import SalonWorkingHours
 from marketplace.utils import send_sms
 from .models import PasswordResetCode, Profile
 
+logger = logging.getLogger(__name__)
+
 OTP_EXPIRY_SECONDS = 10 * 60  # 10 minutes
 OTP_RESEND_SECONDS = 60        # 1 minute
 
@@ -50,9 +53,8 @@ def _send_registration_otp(phone: str, code: str) -> bool:
     # code is always 6 digits — pad with leading zeros just in case
     code = str(code).zfill(6)
     message = f"Siz iBron ilovasida ro'yxatdan o'tmoqdasiz. Kodni hech kimga bermang: {code}"
-    print(f"[OTP] phone={phone}  code={code}  message='{message}'")
     result = send_sms(phone, message)
-    print(f"[OTP] send_sms result → {result}")
+    logger.info("registration otp sent", extra={"fields": {"phone": phone, "sent": result}})
     return result
 
 
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Picks the async variants of the I/O-bound views (settings.SERVER_MODE).
+os.environ['SERVER_MODE'] = 'asgi'
 
 application = get_asgi_application()
@@ -0,0 +1,22 @@
+"""
+Cache backend used by settings.CACHES.
+
+    FileCache   FileBasedCache that lists its directory to cull only on
+                every CULL_EVERY-th set() of the process (OPTIONS, default
+                100) instead of on every set(). The cache can run over
+                MAX_ENTRIES by that many sets per process before a cull.
+"""
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class FileCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_every = max(1, int(params.get("OPTIONS", {}).get("CULL_EVERY", 100)))
+        self._sets = 0
+
+    def _cull(self):
+        self._sets += 1
+        if self._sets % self._cull_every == 0:
+            super()._cull()
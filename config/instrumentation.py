@@ -0,0 +1,431 @@
+"""
+Per-request instrumentation: timings, query counts, sampled profiles and
+Prometheus metrics.
+
+InstrumentationMiddleware (first in MIDDLEWARE) measures every request:
+
+  - wall time, DB query count and DB time (an execute wrapper installed
+    on every connection),
+  - time spent in external HTTP calls wrapped in track_external()
+    (Telegram, Eskiz, the image proxy),
+
+and then
+  - logs one line per request on the "instrumentation.request" logger
+    (logfmt message; the same values are in record.fields),
+  - adds a Server-Timing header (app / db / one entry per external service),
+  - logs queries slower than SLOW_QUERY_MS on "instrumentation.sql",
+  - with PROFILE_SAMPLE_RATE > 0, runs that share of (sync) requests under
+    cProfile and keeps the .prof file in PROFILE_DIR when the request took
+    longer than PROFILE_SLOW_MS (open with snakeviz or pstats),
+  - updates the counters and histograms served by metrics_view() in the
+    Prometheus text format.
+
+Counters live in each worker process. With METRICS_DIR set, every worker
+writes a snapshot there at most every METRICS_FLUSH_SECONDS and the
+endpoint adds them all up, so a scrape covers all gunicorn workers. The
+snapshot of a worker that has exited is folded into ARCHIVE and removed,
+so its counts stay in the totals and a new worker that gets the same pid
+cannot overwrite them (which would make counters go backwards).
+
+    from config.instrumentation import track_external
+
+    with track_external("telegram"):
+        requests.post(...)
+"""
+
+import cProfile
+import contextvars
+import fcntl
+import hmac
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseNotFound
+
+request_log = logging.getLogger("instrumentation.request")
+sql_log = logging.getLogger("instrumentation.sql")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =====================================================================
+# PER-REQUEST COUNTERS
+# =====================================================================
+
+class RequestMetrics:
+    __slots__ = ("queries", "db_seconds", "external")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.external = defaultdict(float)  # service -> seconds
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_seconds += elapsed
+        if elapsed * 1000 >= _setting("SLOW_QUERY_MS", 200):
+            sql_log.warning(
+                "slow query %.1fms: %s", elapsed * 1000, sql[:2000],
+                extra={"fields": {"duration_ms": round(elapsed * 1000, 1), "many": many}},
+            )
+
+
+@contextmanager
+def track_external(service):
+    """Time an outbound HTTP call; counted in the current request and in metrics."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.external[service] += elapsed
+        REGISTRY.observe("external_request_duration_seconds", (("service", service),), elapsed)
+        REGISTRY.inc("external_requests_total", (("service", service), ("outcome", outcome)))
+
+
+# =====================================================================
+# PROMETHEUS REGISTRY
+# =====================================================================
+
+METRIC_HELP = {
+    "http_requests_total": ("counter", "Requests served, by view, method and status."),
+    "http_request_duration_seconds": ("histogram", "Request wall time, by view."),
+    "db_queries_total": ("counter", "SQL queries executed while serving requests, by view."),
+    "db_query_duration_seconds_total": ("counter", "Time spent in SQL while serving requests, by view."),
+    "external_requests_total": ("counter", "Outbound HTTP calls, by service and outcome."),
+    "external_request_duration_seconds": ("histogram", "Outbound HTTP call time, by service."),
+}
+
+
+class Registry:
+    """Counters and histograms keyed by (metric, labels), labels a tuple of pairs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}   # key -> [bucket counts..., +Inf count, sum]
+        self._flushed = 0.0
+        self._owner = None   # pid that has claimed its snapshot file
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            hist = self.histograms.setdefault((name, labels), [0] * (len(DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, list(hist)] for (name, labels), hist in self.histograms.items()],
+            }
+
+    def maybe_flush(self):
+        """Write this worker's snapshot to METRICS_DIR (rate-limited)."""
+        directory = _setting("METRICS_DIR", "")
+        now = time.monotonic()
+        if not directory or now - self._flushed < _setting("METRICS_FLUSH_SECONDS", 5):
+            return
+        self._flushed = now
+        os.makedirs(directory, exist_ok=True)
+        self.claim(directory)
+        _write_snapshot(directory, f"{os.getpid()}.json", self.snapshot())
+
+    def claim(self, directory):
+        """Retire a snapshot left under this pid by an exited worker, once per process."""
+        if self._owner == os.getpid():
+            return
+        self._owner = os.getpid()
+        own = f"{self._owner}.json"
+        if os.path.exists(os.path.join(directory, own)):
+            _retire(directory, own)
+
+
+REGISTRY = Registry()
+
+# Counts of exited workers, in the per-worker snapshot format.
+ARCHIVE = "archive.json"
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(directory, name, snapshot):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+@contextmanager
+def _locked(directory, mode):
+    # Readers share the lock, _retire() takes it exclusively: a scrape never
+    # sees a snapshot both in ARCHIVE and under its pid, or in neither.
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, mode)
+        yield
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _retire(directory, name):
+    """Fold the snapshot `name` of an exited worker into ARCHIVE and remove it."""
+    path = os.path.join(directory, name)
+    with _locked(directory, fcntl.LOCK_EX):
+        snapshot = _read_snapshot(path)
+        if snapshot is None:
+            return  # retired by another worker meanwhile
+        archive = _read_snapshot(os.path.join(directory, ARCHIVE)) or {"counters": [], "histograms": []}
+        counters, histograms = _merge([archive, snapshot])
+        _write_snapshot(directory, ARCHIVE, {
+            "counters": [[metric, labels, value] for (metric, labels), value in counters.items()],
+            "histograms": [[metric, labels, hist] for (metric, labels), hist in histograms.items()],
+        })
+        os.remove(path)
+
+
+def _merge(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, hist in snap["histograms"]:
+            total = histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(hist))
+            for i, value in enumerate(hist):
+                total[i] += value
+    return counters, histograms
+
+
+def _merged_snapshots():
+    snapshots = [REGISTRY.snapshot()]
+    directory = _setting("METRICS_DIR", "")
+    if directory and os.path.isdir(directory):
+        REGISTRY.claim(directory)
+        own = f"{os.getpid()}.json"
+        for name in os.listdir(directory):
+            pid = name[:-len(".json")]
+            if name.endswith(".json") and name != own and pid.isdigit() and not _pid_alive(int(pid)):
+                _retire(directory, name)
+        with _locked(directory, fcntl.LOCK_SH):
+            for name in os.listdir(directory):
+                if name.endswith(".json") and name != own:
+                    snapshot = _read_snapshot(os.path.join(directory, name))
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+    return _merge(snapshots)
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render_metrics():
+    counters, histograms = _merged_snapshots()
+    series = defaultdict(list)  # name -> [(labels, lines)]
+    for (name, labels), value in counters.items():
+        series[name].append((labels, [f"{name}{_labels(labels)} {value:g}"]))
+    for (name, labels), hist in histograms.items():
+        lines = [
+            f"{name}_bucket{_labels(labels, [('le', f'{bound:g}')])} {count:g}"
+            for bound, count in zip(DURATION_BUCKETS, hist)
+        ]
+        lines += [
+            f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist[-2]:g}",
+            f"{name}_count{_labels(labels)} {hist[-2]:g}",
+            f"{name}_sum{_labels(labels)} {hist[-1]:.6f}",
+        ]
+        series[name].append((labels, lines))
+    out = []
+    for name in sorted(series):
+        kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for _, lines in sorted(series[name], key=lambda item: [(k, str(v)) for k, v in item[0]]):
+            out += lines
+    return "\n".join(out) + "\n"
+
+
+def metrics_view(request):
+    """Prometheus endpoint: Bearer METRICS_TOKEN, or a staff session."""
+    token = _setting("METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    authorized = bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+    if not authorized and not request.user.is_staff:
+        return HttpResponseNotFound()
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# =====================================================================
+# MIDDLEWARE
+# =====================================================================
+
+def _save_profile(profiler, view_name, elapsed):
+    directory = _setting("PROFILE_DIR", "")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    safe_view = "".join(c if c.isalnum() else "_" for c in view_name)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_view}-{elapsed * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+    request_log.warning("profile saved: %s", path, extra={"fields": {"view": view_name, "profile": path}})
+
+
+def install_query_wrapper(conn):
+    if _execute_wrapper not in conn.execute_wrappers:
+        conn.execute_wrappers.append(_execute_wrapper)
+
+
+def _connection_created(sender, connection, **kwargs):
+    # Every new connection, in any thread: under ASGI the ORM runs in
+    # sync_to_async threads, which see the request's metrics through the
+    # copied context.
+    install_query_wrapper(connection)
+
+
+connection_created.connect(_connection_created, dispatch_uid="instrumentation_query_wrapper")
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # The connection may predate this module (opened before the first request).
+        install_query_wrapper(connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+        return self._finish(request, response, elapsed, metrics, profiler)
+
+    async def __acall__(self, request):
+        # No cProfile here: one event loop interleaves many requests.
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+        return self._finish(request, response, elapsed, metrics, None)
+
+    def _start_profiler(self):
+        if random.random() >= _setting("PROFILE_SAMPLE_RATE", 0.0):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this process (3.12+ allows one).
+            return None
+        return profiler
+
+    def _finish(self, request, response, elapsed, metrics, profiler):
+        match = getattr(request, "resolver_match", None)
+        view_name = (match.view_name if match else "") or "unresolved"
+        if profiler is not None and elapsed * 1000 >= _setting("PROFILE_SLOW_MS", 500):
+            _save_profile(profiler, view_name, elapsed)
+
+        self._record(request, response, view_name, elapsed, metrics)
+        if _setting("SERVER_TIMING", True):
+            response["Server-Timing"] = self._server_timing(elapsed, metrics)
+        return response
+
+    def _record(self, request, response, view_name, elapsed, metrics):
+        view = (("view", view_name),)
+        REGISTRY.inc("http_requests_total", view + (("method", request.method), ("status", response.status_code)))
+        REGISTRY.observe("http_request_duration_seconds", view, elapsed)
+        REGISTRY.inc("db_queries_total", view, metrics.queries)
+        REGISTRY.inc("db_query_duration_seconds_total", view, metrics.db_seconds)
+        REGISTRY.maybe_flush()
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 1),
+            "queries": metrics.queries,
+            "db_ms": round(metrics.db_seconds * 1000, 1),
+        }
+        for service, seconds in metrics.external.items():
+            fields[f"{service}_ms"] = round(seconds * 1000, 1)
+        request_log.info(" ".join(f"{k}={v}" for k, v in fields.items()), extra={"fields": fields})
+
+    def _server_timing(self, elapsed, metrics):
+        entries = [
+            f"app;dur={elapsed * 1000:.1f}",
+            f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries"',
+        ]
+        entries += [f"{service};dur={seconds * 1000:.1f}" for service, seconds in metrics.external.items()]
+        return ", ".join(entries)
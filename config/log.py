@@ -0,0 +1,158 @@
+"""
+Logging plumbing used by settings.LOGGING.
+
+    JsonFormatter         one JSON object per line: ts, level, logger,
+                          message, the keys of extra={"fields": {...}} and
+                          the traceback, if any.
+    RedactFilter          masks phone numbers, one-time codes, tokens and
+                          message bodies in messages, fields and tracebacks.
+    QueuedStreamHandler   formats in the calling thread, then hands the line
+                          to a queue; a QueueListener thread does the write,
+                          so request threads never block on stdout. When the
+                          queue is full the record is dropped (and counted)
+                          rather than waited on.
+
+App code logs through its module logger:
+
+    logger = logging.getLogger(__name__)
+    logger.info("sms sent", extra={"fields": {"phone": phone, "status": 200}})
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+MASK = "***"
+
+# Field values dropped entirely, whatever they contain.
+SECRET_FIELDS = frozenset({"code", "otp", "password", "token", "secret", "text", "message"})
+
+REDACTIONS = (
+    # Telegram bot token in API URLs (shows up in requests exceptions).
+    (re.compile(r"bot\d+:[\w-]+"), "bot" + MASK),
+    (re.compile(r"(?i)\bbearer\s+[\w.=-]+"), "Bearer " + MASK),
+    # code=123456, password: hunter2, "token": "…"
+    (
+        re.compile(r"(?i)\b(code|otp|password|token|secret)(['\"]?\s*[=:]\s*['\"]?)[^\s'\",}]+"),
+        r"\1\2" + MASK,
+    ),
+    # +998 90 123 45 67, 998901234567, (90) 123-45-67 (keeps the last two
+    # digits). Bare digit runs without the 998 prefix or the 2-3-2-2
+    # separators are ids, amounts or card numbers and are left alone.
+    (
+        re.compile(
+            r"(?<![\w.:-])"
+            r"(?:(?:\+|%2B)?998[\s-]?\(?\d{2}\)?[\s-]?\d{3}[\s-]?\d{2}[\s-]?"
+            r"|\(?\d{2}\)?[\s-]\d{3}[\s-]\d{2}[\s-])"
+            r"(\d{2})(?![\w:])"
+        ),
+        MASK + r"\1",
+    ),
+)
+
+
+def redact(text):
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def redact_fields(fields):
+    clean = {}
+    for key, value in fields.items():
+        if key in SECRET_FIELDS:
+            clean[key] = MASK
+        elif key == "phone" and value:
+            digits = re.sub(r"\D", "", str(value))
+            clean[key] = MASK + digits[-2:]
+        elif isinstance(value, str):
+            clean[key] = redact(value)
+        else:
+            clean[key] = value
+    return clean
+
+
+class RedactFilter(logging.Filter):
+    """Attach to handlers, so it also covers records propagated from child loggers."""
+
+    _formatter = logging.Formatter()
+
+    def filter(self, record):
+        record.msg = redact(record.getMessage())
+        record.args = None
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = redact_fields(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            data.setdefault(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # stop() joins the thread anyway; a full queue must not make it raise.
+        self.queue.put(self._sentinel)
+
+
+class QueuedStreamHandler(QueueHandler):
+    def __init__(self, stream="stdout", maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.stream_name = stream
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        # Started lazily, and again in a forked child (the thread does not
+        # survive fork, e.g. gunicorn --preload).
+        if self._pid == os.getpid():
+            return
+        target = logging.StreamHandler(getattr(sys, self.stream_name))
+        target.setFormatter(logging.Formatter("%(message)s"))  # prepare() already formatted
+        self._listener = _Listener(self.queue, target)
+        self._listener.start()
+        self._pid = os.getpid()
+        atexit.register(self._stop)
+
+    def _stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def enqueue(self, record):
+        # Called from handle(), under the handler lock.
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._stop()
+        super().close()
@@ -54,12 +54,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "django.middleware.locale.LocaleMiddleware",
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     "accounts.middleware.UserLanguageMiddleware",
+    "marketplace.middleware.TimeContextMiddleware",
     'django.middleware.common.CommonMiddleware',
     "django.middleware.csrf.CsrfViewMiddleware",
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -67,6 +69,17 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware'
 ]
 
+# wsgi: gunicorn config.wsgi with gthread workers (default).
+# asgi: gunicorn config.asgi with uvicorn workers, see start.sh. Static files
+# then come from nginx only: WhiteNoise's middleware is sync-only and would
+# put every request through a thread hop.
+# config.wsgi / config.asgi set the variable for the process they serve, so
+# views pick the matching sync or async variant; .env only feeds start.sh
+# and management commands.
+SERVER_MODE = os.environ.get('SERVER_MODE') or config.get('SERVER_MODE', 'wsgi')
+if SERVER_MODE == 'asgi':
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 LOCALE_PATHS = [BASE_DIR / "locale"]
 
 
@@ -148,11 +161,44 @@ MEDIA_URL = '/media/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Media files are named by content hash (cas/…): duplicates are stored once
+# and nginx serves /media/cas/ as immutable. See marketplace/storage.py.
+DEFAULT_FILE_STORAGE = 'marketplace.storage.ContentAddressedStorage'
+
 # STATIC_ROOT = f'/var/www/{DOMAIN_NAME}/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 # MEDIA_ROOT = f'/var/www/{DOMAIN_NAME}/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Local cache of resized external images (logo_url/cover_url/photo_url),
+# see marketplace/image_proxy.py. Least recently used files are evicted
+# past the cap.
+IMAGE_PROXY_CACHE_DIR = BASE_DIR / 'cache' / 'images'
+IMAGE_PROXY_CACHE_MAX_BYTES = int(config.get('IMAGE_PROXY_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# The proxy only fetches from public addresses; hosts listed here (comma
+# separated) may resolve to private ones.
+IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS = [h.strip() for h in config.get('IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS', '').split(',') if h.strip()]
+
+# Shared by all gunicorn workers and, through the cache_volume in
+# docker-compose.yml, by the worker containers, so invalidation (e.g. of
+# accounts.prefs on Profile save) reaches every process that fires booking
+# notifications. Size it for one prefs entry per user active in a day plus
+# OTP codes: past MAX_ENTRIES a cull deletes 1/CULL_FREQUENCY of the
+# entries at random. A cull lists the cache directory, so FileCache runs it
+# on every CULL_EVERY-th set() of a process only; a much larger user base
+# wants a cache server instead.
+CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.FileCache',
+        'LOCATION': config.get('CACHE_DIR') or str(BASE_DIR / 'cache' / 'django'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(config.get('CACHE_MAX_ENTRIES', '50000')),
+            'CULL_FREQUENCY': int(config.get('CACHE_CULL_FREQUENCY', '10')),
+            'CULL_EVERY': int(config.get('CACHE_CULL_EVERY', '100')),
+        },
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -211,6 +257,8 @@ EMAIL_HOST_PASSWORD = config.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config.get('DEFAULT_FROM_EMAIL')
 
 TELEGRAM_BOT_TOKEN = config.get('TELEGRAM_BOT_TOKEN')
+# Bot API base URL: a self-hosted Bot API server, or the stub bench_concurrency runs.
+TELEGRAM_API_URL = config.get('TELEGRAM_API_URL', 'https://api.telegram.org')
 
 BUSINESS_LEADS_TELEGRAM_ID = config.get('BUSINESS_LEADS_TELEGRAM_ID')
 
@@ -220,3 +268,55 @@ ESKIZ_TOKEN      = config.get('ESKIZ_TOKEN', '')
 ESKIZ_EMAIL      = config.get('ESKIZ_EMAIL', '')
 ESKIZ_PASSWORD   = config.get('ESKIZ_PASSWORD', '')
 ESKIZ_SENDER     = config.get('ESKIZ_SENDER', '4546')
+
+# ── Owner dashboard live updates (marketplace.events) ─────────────────
+# Seconds an SSE connection stays open polling for events. 0 = send what is
+# pending and close (the browser reconnects); safe with sync gunicorn workers.
+BOOKING_EVENTS_STREAM_SECONDS = int(config.get('BOOKING_EVENTS_STREAM_SECONDS', '0'))
+
+# ── Request instrumentation (config/instrumentation.py) ───────────────
+SERVER_TIMING         = config.get('SERVER_TIMING', 'True') == 'True'
+SLOW_QUERY_MS         = int(config.get('SLOW_QUERY_MS', '200'))
+# Share of requests run under cProfile; kept in PROFILE_DIR if slower than PROFILE_SLOW_MS.
+PROFILE_SAMPLE_RATE   = float(config.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS       = int(config.get('PROFILE_SLOW_MS', '500'))
+PROFILE_DIR           = config.get('PROFILE_DIR') or str(BASE_DIR / 'cache' / 'profiles')
+# /metrics/ needs "Authorization: Bearer <METRICS_TOKEN>" (or a staff login).
+METRICS_TOKEN         = config.get('METRICS_TOKEN', '')
+# Per-worker snapshots, summed by /metrics/ across gunicorn workers.
+METRICS_DIR           = config.get('METRICS_DIR') or str(BASE_DIR / 'cache' / 'metrics')
+METRICS_FLUSH_SECONDS = int(config.get('METRICS_FLUSH_SECONDS', '5'))
+
+# ── Logging (config/log.py) ────────────────────────────────────────────
+# JSON lines on stdout, written by a background thread; phone numbers,
+# codes and tokens are masked. LOG_FORMAT=text for local development.
+LOG_LEVEL  = config.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = config.get('LOG_FORMAT', 'json')
+# Per-module overrides, e.g. LOG_LEVELS=marketplace.utils=DEBUG,instrumentation.request=WARNING
+LOG_LEVELS = dict(
+    item.strip().split('=', 1) for item in config.get('LOG_LEVELS', '').split(',') if '=' in item
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'redact': {'()': 'config.log.RedactFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'config.log.JsonFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'()': 'config.log.QueuedStreamHandler', 'formatter': LOG_FORMAT, 'filters': ['redact']},
+    },
+    'root': {'handlers': ['console'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'accounts': {'level': LOG_LEVEL},
+        'marketplace': {'level': LOG_LEVEL},
+        'pc_clubs': {'level': LOG_LEVEL},
+        'instrumentation': {'level': LOG_LEVEL},
+        **{name: {'level': level.upper()} for name, level in LOG_LEVELS.items()},
+    },
+}
@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.instrumentation import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     
     path('', include('marketplace.urls', namespace='marketplace')),
     path('pc-clubs/', include('pc_clubs.urls', namespace='pc_clubs')),
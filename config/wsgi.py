@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Picks the sync variants of the I/O-bound views (settings.SERVER_MODE).
+os.environ['SERVER_MODE'] = 'wsgi'
 
 application = get_wsgi_application()
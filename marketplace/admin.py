@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from mptt.admin import DraggableMPTTAdmin
-from .models import Category, Salon, Master, Service, Appointment, SalonWorkingHours, SalonPhoto, Address, BusinessLead
+from .models import Category, Salon, Master, Service, Appointment, SalonWorkingHours, SalonPhoto, Address, BusinessLead, BookingReminder
 
 
 class ParentCategoryFilter(admin.SimpleListFilter):
@@ -93,4 +93,10 @@ class BusinessLeadAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("phone", "description")
     readonly_fields = ("created_at",)
-    list_editable = ("status",)
\ No newline at end of file
+    list_editable = ("status",)
+
+@admin.register(BookingReminder)
+class BookingReminderAdmin(admin.ModelAdmin):
+    list_display = ("kind", "appointment", "pc_booking", "created_at", "sent_at")
+    list_filter = ("kind", "sent_at")
+    raw_id_fields = ("appointment", "pc_booking")
@@ -0,0 +1,255 @@
+"""
+Owner analytics built on DailyBookingRollup.
+
+Write side:
+  * apply_booking_events() – consumes BookingEvent rows (see
+    marketplace.events) and recomputes only the (venue, day) slices they
+    touch. Run via:  python manage.py update_booking_rollups --loop
+  * rebuild_rollups() – recomputes a day range from BookingIndex;
+    the nightly `rebuild_booking_rollups` command uses it to repair drift
+    (rescheduled or deleted bookings, events pruned while the worker was
+    down).
+
+Read side:
+  * build_owner_analytics() – totals, per-day series, per-venue occupancy
+    and top services/plans, read from rollup rows only, so the cost
+    depends on venues × days, not on the number of bookings.
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import clock
+from .dashboard import day_bounds
+from .models import BookingEvent, BookingIndex, DailyBookingRollup, SalonWorkingHours
+
+# Bookings that count toward hours and revenue.
+EARNED_STATUSES = ("confirmed", "completed")
+STATUSES = ("pending", "confirmed", "completed", "cancelled")
+BATCH_SIZE = 500
+
+# pg_advisory_xact_lock key: one rebuild at a time, so the delete + insert of
+# a slice never races the nightly pass or a second worker.
+ROLLUP_LOCK_KEY = 7_203_311
+
+TWO_PLACES = Decimal("0.01")
+
+
+# =====================================================================
+# WRITE SIDE
+# =====================================================================
+
+def _rollup_rows(venue_type, start, end, venue_ids):
+    earned = Q(status__in=EARNED_STATUSES)
+    counts = {"bookings": Count("pk")}
+    for status in STATUSES:
+        counts[status] = Count("pk", filter=Q(status=status))
+
+    qs = BookingIndex.objects.filter(venue_type=venue_type, start_time__gte=start, start_time__lt=end)
+    if venue_ids is not None:
+        qs = qs.filter(venue_id__in=venue_ids)
+    rows = (
+        qs.annotate(day=TruncDate("start_time"))
+        .values("venue_id", "day", "item_id", "item_name")
+        .annotate(**counts, booked_hours=Sum("hours", filter=earned), earned=Sum("price", filter=earned))
+        .order_by()
+    )
+    for row in rows:
+        yield DailyBookingRollup(
+            venue_type=venue_type,
+            venue_id=row["venue_id"],
+            day=row["day"],
+            item_id=row["item_id"],
+            item_name=row["item_name"],
+            hours=row["booked_hours"] or 0,
+            revenue=row["earned"] or 0,
+            **{key: row[key] for key in ("bookings",) + STATUSES},
+        )
+
+
+def rebuild_rollups(venue_type, start_day, end_day, venue_ids=None):
+    """
+    Recompute rollup rows of `venue_type` for local days in
+    [start_day, end_day), optionally only for `venue_ids`.
+    Returns the number of rollup rows written.
+    """
+    start, _ = day_bounds(start_day)
+    end, _ = day_bounds(end_day)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK_KEY])
+
+        stale = DailyBookingRollup.objects.filter(
+            venue_type=venue_type, day__gte=start_day, day__lt=end_day
+        )
+        if venue_ids is not None:
+            stale = stale.filter(venue_id__in=venue_ids)
+        stale.delete()
+        return len(DailyBookingRollup.objects.bulk_create(
+            list(_rollup_rows(venue_type, start, end, venue_ids)), batch_size=BATCH_SIZE
+        ))
+
+
+def _affected_slices(events):
+    """{(venue_type, day): {venue_id, ...}} for the bookings behind `events`."""
+    ids = {"appointment": set(), "pc_booking": set()}
+    for e in events:
+        ids[e.kind].add(e.booking_id)
+    if not any(ids.values()):
+        return {}
+
+    located = BookingIndex.objects.filter(
+        Q(kind="appointment", booking_id__in=ids["appointment"])
+        | Q(kind="pc_booking", booking_id__in=ids["pc_booking"])
+    ).values_list("venue_type", "venue_id", "start_time")
+    slices = {}
+    for venue_type, venue_id, start_time in located:
+        day = timezone.localtime(start_time).date()
+        slices.setdefault((venue_type, day), set()).add(venue_id)
+    return slices
+
+
+def apply_booking_events(limit=BATCH_SIZE):
+    """
+    Fold up to `limit` unprocessed BookingEvent rows into the rollups by
+    recomputing each affected (venue, day) slice once. Returns the number
+    of events processed.
+    """
+    with transaction.atomic():
+        events = list(
+            BookingEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(rolled_up=False)
+            .order_by("pk")[:limit]
+        )
+        for (venue_type, day), venue_ids in _affected_slices(events).items():
+            rebuild_rollups(venue_type, day, day + timedelta(days=1), venue_ids=venue_ids)
+        BookingEvent.objects.filter(pk__in=[e.pk for e in events]).update(rolled_up=True)
+    return len(events)
+
+
+# =====================================================================
+# READ SIDE
+# =====================================================================
+
+def _totals():
+    # Suffixed: annotations may not shadow the rollup's own field names.
+    return {
+        "bookings_total": Sum("bookings"),
+        "cancelled_total": Sum("cancelled"),
+        "hours_total": Sum("hours"),
+        "revenue_total": Sum("revenue"),
+    }
+
+
+def _open_hours(wh):
+    if wh.is_closed or not wh.open_time or not wh.close_time:
+        return 0
+    opened = datetime.combine(date.min, wh.open_time)
+    closed = datetime.combine(date.min, wh.close_time)
+    if closed <= opened:  # open past midnight (or 24h)
+        closed += timedelta(days=1)
+    return (closed - opened).total_seconds() / 3600
+
+
+def _capacity_hours(schedule, units, days):
+    """Bookable hours over `days`: units × opening hours per weekday."""
+    if not schedule or not units:
+        return 0
+    return units * sum(schedule.get(d.weekday(), 0) for d in days)
+
+
+def _rate(part, whole):
+    return round(100 * float(part or 0) / float(whole), 1) if whole else None
+
+
+def build_owner_analytics(user, days=30, today=None):
+    """
+    Context for business/analytics.html: the last `days` local days for
+    every salon and PC club the user owns.
+    """
+    from pc_clubs.models import PCClub, PCWorkingHours
+
+    today = today or clock.current().today
+    start_day = today - timedelta(days=days - 1)
+    period = [start_day + timedelta(days=i) for i in range(days)]
+
+    salons = list(user.salons.annotate(
+        units=Count("masters", filter=Q(masters__is_active=True))
+    ))
+    clubs = list(PCClub.objects.filter(owner=user))
+
+    rollups = DailyBookingRollup.objects.filter(day__gte=start_day, day__lte=today).filter(
+        Q(venue_type="salon", venue_id__in=[s.pk for s in salons])
+        | Q(venue_type="pc_club", venue_id__in=[c.pk for c in clubs])
+    )
+
+    totals = rollups.aggregate(**_totals())
+    totals["cancel_rate"] = _rate(totals["cancelled_total"], totals["bookings_total"])
+
+    # Per-day series, zero-filled so the chart has one bar per day.
+    by_day = {row["day"]: row for row in rollups.values("day").annotate(**_totals()).order_by()}
+    max_revenue = max([row["revenue_total"] or 0 for row in by_day.values()] or [0])
+    max_bookings = max([row["bookings_total"] or 0 for row in by_day.values()] or [0])
+    series = []
+    for day in period:
+        row = by_day.get(day, {})
+        revenue, bookings = row.get("revenue_total") or 0, row.get("bookings_total") or 0
+        series.append({
+            "day": day,
+            "revenue": revenue,
+            "bookings": bookings,
+            "cancelled": row.get("cancelled_total") or 0,
+            "revenue_pct": _rate(revenue, max_revenue) or 0,
+            "bookings_pct": _rate(bookings, max_bookings) or 0,
+        })
+
+    # Per-venue totals with occupancy against opening hours.
+    schedules = {}
+    for wh in SalonWorkingHours.objects.filter(salon__in=salons):
+        schedules.setdefault(("salon", wh.salon_id), {})[wh.weekday] = _open_hours(wh)
+    for wh in PCWorkingHours.objects.filter(pc_club__in=clubs):
+        schedules.setdefault(("pc_club", wh.pc_club_id), {})[wh.weekday] = _open_hours(wh)
+
+    per_venue = {
+        (row["venue_type"], row["venue_id"]): row
+        for row in rollups.values("venue_type", "venue_id").annotate(**_totals()).order_by()
+    }
+    venues = []
+    for venue_type, venue, units in (
+        [("salon", s, s.units) for s in salons] + [("pc_club", c, c.total_pcs) for c in clubs]
+    ):
+        row = per_venue.get((venue_type, venue.pk), {})
+        capacity = _capacity_hours(schedules.get((venue_type, venue.pk)), units, period)
+        venues.append({
+            "type": venue_type,
+            "venue": venue,
+            "bookings": row.get("bookings_total") or 0,
+            "hours": row.get("hours_total") or 0,
+            "revenue": row.get("revenue_total") or 0,
+            "cancel_rate": _rate(row.get("cancelled_total"), row.get("bookings_total")),
+            "occupancy": _rate(row.get("hours_total"), capacity),
+        })
+
+    top_items = list(
+        rollups.values("venue_type", "item_name")
+        .annotate(**_totals())
+        .order_by("-revenue_total", "-bookings_total")[:10]
+    )
+
+    return {
+        "days": days,
+        "start_day": start_day,
+        "today": today,
+        "totals": totals,
+        "series": series,
+        "venues": venues,
+        "top_items": top_items,
+        "has_anything": bool(salons or clubs),
+    }
@@ -7,3 +7,7 @@ class MarketplaceConfig(AppConfig):
 
     def ready(self):
         import marketplace.signals
+        from .i18n import install_accessors
+        from .models import MultilingualMixin
+
+        install_accessors(m for m in self.apps.get_models() if issubclass(m, MultilingualMixin))
@@ -0,0 +1,181 @@
+"""
+Sync of the BookingIndex read model.
+
+Every Appointment / PCBooking row is mirrored into BookingIndex with its
+venue, resource, client, time range, status and price, so cross-venue
+reads need a single indexed query:
+
+  * sync_bookings() – upserts index rows from the booking tables. The
+    post_save receivers call it (via sync_booking) for one booking, inside
+    the same transaction as the save; saves that leave the indexed fields
+    alone are skipped and status-only saves issue a single UPDATE. The
+    rebuild command calls it for everything.
+  * remove_booking() – post_delete receivers (cascades included).
+  * set_status() – bulk status changes done with queryset.update(), which
+    fire no signals (see utils.complete_overdue_bookings).
+  * refresh_names() – venue / master / service / plan renames.
+
+Migration 0016 backfills bookings made before the index existed.
+Repair via:  python manage.py rebuild_booking_index
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, IntegerField, OuterRef
+from django.db.models.functions import Coalesce
+
+from .models import Appointment, BookingIndex
+
+BATCH_SIZE = 1000
+TWO_PLACES = Decimal("0.01")
+
+SYNCED_FIELDS = [
+    "client", "venue_type", "venue_id", "venue_name", "resource_id", "resource_name",
+    "item_id", "item_name", "item_name_en", "item_name_uz",
+    "start_time", "end_time", "status", "quantity", "hours", "price", "created_at",
+]
+
+
+def _appointment_entries(qs):
+    minutes = Coalesce(F("service__duration_minutes"), F("hours") * 60, output_field=IntegerField())
+    rows = qs.annotate(minutes=minutes).values_list(
+        "pk", "client_id", "salon_id", "salon__name", "master_id", "master__name",
+        "service_id", "service__name_ru", "service__name_en", "service__name_uz",
+        "start_time", "end_time", "status", "quantity", "minutes", "service__price", "created_at",
+    )
+    for (pk, client_id, salon_id, salon_name, master_id, master_name,
+         service_id, name_ru, name_en, name_uz,
+         start_time, end_time, status, quantity, minutes, price, created_at) in rows.iterator(chunk_size=BATCH_SIZE):
+        yield BookingIndex(
+            kind="appointment", booking_id=pk, client_id=client_id,
+            venue_type="salon", venue_id=salon_id, venue_name=salon_name or "",
+            resource_id=master_id or 0, resource_name=master_name or "",
+            item_id=service_id or 0, item_name=name_ru or "", item_name_en=name_en or "", item_name_uz=name_uz or "",
+            start_time=start_time, end_time=end_time, status=status, quantity=quantity,
+            hours=(Decimal(quantity * (minutes or 0)) / 60).quantize(TWO_PLACES),
+            price=quantity * (price or 0), created_at=created_at,
+        )
+
+
+def _pc_booking_entries(qs):
+    rows = qs.annotate(
+        total=ExpressionWrapper(
+            F("quantity") * F("hours") * F("plan__price_per_hour"),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    ).values_list(
+        "pk", "client_id", "pc_club_id", "pc_club__name", "plan_id",
+        "plan__name", "plan__name_en", "plan__name_uz",
+        "start_time", "end_time", "status", "quantity", "hours", "total", "created_at",
+    )
+    for (pk, client_id, club_id, club_name, plan_id, name_ru, name_en, name_uz,
+         start_time, end_time, status, quantity, hours, total, created_at) in rows.iterator(chunk_size=BATCH_SIZE):
+        yield BookingIndex(
+            kind="pc_booking", booking_id=pk, client_id=client_id,
+            venue_type="pc_club", venue_id=club_id, venue_name=club_name or "",
+            resource_id=plan_id or 0, resource_name=name_ru or "",
+            item_id=plan_id or 0, item_name=name_ru or "", item_name_en=name_en or "", item_name_uz=name_uz or "",
+            start_time=start_time, end_time=end_time, status=status, quantity=quantity,
+            hours=quantity * hours, price=total or 0, created_at=created_at,
+        )
+
+
+def _upsert(entries):
+    written = 0
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            written += _write(batch)
+            batch = []
+    return written + (_write(batch) if batch else 0)
+
+
+def _write(batch):
+    # INSERT ... ON CONFLICT (kind, booking_id) DO UPDATE: one statement per batch.
+    return len(BookingIndex.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["kind", "booking_id"],
+        update_fields=SYNCED_FIELDS,
+    ))
+
+
+def sync_bookings(kind, pks=None):
+    """Upsert index rows of `kind` for the booking ids in `pks` (all when None)."""
+    from pc_clubs.models import PCBooking
+
+    if kind == "appointment":
+        qs = Appointment.objects.all()
+        entries = _appointment_entries
+    else:
+        qs = PCBooking.objects.all()
+        entries = _pc_booking_entries
+    if pks is not None:
+        qs = qs.filter(pk__in=pks)
+    return _upsert(entries(qs.order_by("pk")))
+
+
+def sync_booking(booking, update_fields=None):
+    """
+    post_save: skip saves that changed no indexed field, update just the
+    status for status-only saves, upsert the whole row otherwise.
+    """
+    if not booking.index_changed():
+        return
+    kind = "appointment" if isinstance(booking, Appointment) else "pc_booking"
+    if update_fields is not None and set(update_fields) <= {"status"}:
+        set_status(kind, [booking.pk], booking.status)
+    else:
+        sync_bookings(kind, [booking.pk])
+    booking._indexed_state = booking.indexed_state()
+
+
+def remove_booking(kind, pk):
+    BookingIndex.objects.filter(kind=kind, booking_id=pk).delete()
+
+
+def set_status(kind, pks, status):
+    if pks:
+        BookingIndex.objects.filter(kind=kind, booking_id__in=pks).update(status=status)
+
+
+def prune_orphans():
+    """Delete index rows whose booking no longer exists. Returns the count."""
+    from pc_clubs.models import PCBooking
+
+    deleted = 0
+    for kind, model in (("appointment", Appointment), ("pc_booking", PCBooking)):
+        source = model.objects.filter(pk=OuterRef("booking_id"))
+        deleted += BookingIndex.objects.filter(kind=kind).exclude(Exists(source)).delete()[0]
+    return deleted
+
+
+# Per renamed model: (venue_type, instance attr holding the venue id,
+# index field holding the instance id, {index field: instance field}).
+RENAMES = {
+    "marketplace.Salon": ("salon", "pk", "venue_id", {"venue_name": "name"}),
+    "marketplace.Master": ("salon", "salon_id", "resource_id", {"resource_name": "name"}),
+    "marketplace.Service": (
+        "salon", "salon_id", "item_id",
+        {"item_name": "name_ru", "item_name_en": "name_en", "item_name_uz": "name_uz"},
+    ),
+    "pc_clubs.PCClub": ("pc_club", "pk", "venue_id", {"venue_name": "name"}),
+    "pc_clubs.PCPlan": (
+        "pc_club", "pc_club_id", "item_id",
+        {"resource_name": "name", "item_name": "name", "item_name_en": "name_en", "item_name_uz": "name_uz"},
+    ),
+}
+
+
+def refresh_names(instance):
+    """Copy a renamed venue / master / service / plan onto its index rows."""
+    venue_type, venue_attr, id_field, names = RENAMES[instance._meta.label]
+    values = {field: getattr(instance, source) or "" for field, source in names.items()}
+    lookup = {"venue_type": venue_type, "venue_id": getattr(instance, venue_attr), id_field: instance.pk}
+    (
+        BookingIndex.objects
+        .filter(**lookup)
+        .exclude(**values)  # saves that did not rename anything touch no rows
+        .update(**values)
+    )
@@ -0,0 +1,82 @@
+"""
+Per-request time context.
+
+TimeContextMiddleware activates one TimeContext per request, so a view and
+everything it calls agree on a single "now" and share the tz object and
+the day boundaries it has already computed:
+
+    ctx = clock.current()
+    ctx.now, ctx.local_now, ctx.today
+    ctx.day_bounds(day)      # [start, end) of a local date as UTC instants
+    ctx.aware(naive)         # local wall time -> aware datetime
+
+Range filters use the bounds (start_time__gte / __lt) so the start_time
+indexes apply; start_time__date would wrap the column in a tz conversion.
+
+Hot loops (slot generation) work in integer UTC minutes since the epoch,
+to_minutes() / from_minutes(), and convert to local time only for output.
+
+Outside a request (commands, shell) current() returns a fresh context on
+every call.
+"""
+
+import contextvars
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+_current = contextvars.ContextVar("time_context", default=None)
+
+
+class TimeContext:
+    def __init__(self, now=None, tz=None):
+        self.now = now or timezone.now()
+        self.tz = tz or timezone.get_current_timezone()
+        self.local_now = self.now.astimezone(self.tz)
+        self.today = self.local_now.date()
+        self.now_minutes = to_minutes(self.now)
+        self._bounds = {}
+
+    def aware(self, naive):
+        return timezone.make_aware(naive, self.tz)
+
+    def local(self, dt):
+        return dt.astimezone(self.tz)
+
+    def day_bounds(self, day):
+        """UTC [start, end) of the local date `day` (23/25 hours across a DST change)."""
+        bounds = self._bounds.get(day)
+        if bounds is None:
+            start = self.aware(datetime.combine(day, time.min)).astimezone(dt_timezone.utc)
+            end = self.aware(datetime.combine(day + timedelta(days=1), time.min)).astimezone(dt_timezone.utc)
+            bounds = self._bounds[day] = (start, end)
+        return bounds
+
+
+def to_minutes(dt):
+    """Whole minutes since the epoch, rounded down."""
+    return int(dt.timestamp()) // 60
+
+
+def to_minutes_ceil(dt):
+    return -(-int(dt.timestamp()) // 60)
+
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=minutes)
+
+
+def current():
+    return _current.get() or TimeContext()
+
+
+def activate(ctx=None):
+    """Make `ctx` (default: a new one) current; returns a token for deactivate()."""
+    return _current.set(ctx or TimeContext())
+
+
+def deactivate(token):
+    _current.reset(token)
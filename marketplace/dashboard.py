@@ -0,0 +1,137 @@
+"""
+Data service for the owner dashboard.
+
+Fetches every "live" booking (pending, or starting today or later) for all
+venues the user runs in ONE range-bounded query per model, then splits the
+rows into pending / today / upcoming buckets in Python. Past history is a
+separate paginated query so the dashboard never loads the full archive.
+
+Filters compare start_time against precomputed day bounds instead of
+start_time__date, so the (venue, status, start_time) indexes are usable.
+"""
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from . import clock
+from .models import Appointment
+
+PAST_PER_PAGE = 20
+
+
+def day_bounds(day):
+    """Aware [start, end) datetimes covering the given local date."""
+    return clock.current().day_bounds(day)
+
+
+def split_buckets(bookings, day_start, day_end):
+    """
+    Split live bookings (ordered by start_time) into dashboard buckets.
+    Pending rows stay in "pending" even when today/upcoming, matching the
+    original tabs.
+    """
+    buckets = {"pending": [], "today": [], "upcoming": []}
+    for b in bookings:
+        if b.status == "pending":
+            buckets["pending"].append(b)
+        if b.status == "cancelled" or b.start_time < day_start:
+            continue
+        if b.start_time < day_end:
+            buckets["today"].append(b)
+        else:
+            buckets["upcoming"].append(b)
+    return buckets
+
+
+def _live_and_past(base, day_start, page):
+    live = list(
+        base.filter(Q(status="pending") | Q(start_time__gte=day_start)).order_by("start_time")
+    )
+    past = Paginator(base.filter(start_time__lt=day_start).order_by("-start_time"), PAST_PER_PAGE)
+    return live, past.get_page(page)
+
+
+def owner_venues(user):
+    """
+    (salons, master_profile, pc_clubs) visible on the user's dashboard:
+    owned salons plus the salon they work at as a master, and owned clubs.
+    """
+    from pc_clubs.models import PCClub
+
+    salons = list(user.salons.all())
+    master_profile = getattr(user, "master_profile", None)
+    if master_profile and master_profile.salon not in salons:
+        salons.append(master_profile.salon)
+    return salons, master_profile, list(PCClub.objects.filter(owner=user))
+
+
+def booking_scope(user, salons, master_profile):
+    """
+    Q over Appointment (or BookingEvent) rows the user may see: everything
+    at salons they own, only their own appointments where they are a master.
+    """
+    scope = Q(salon__in=[s for s in salons if s.owner_id == user.pk])
+    if master_profile:
+        scope |= Q(master=master_profile)
+    return scope
+
+
+def build_owner_dashboard(user, page=None, pc_page=None, today=None):
+    """
+    Context for business/dashboard.html covering all salons the user owns,
+    the salon they work at as a master, and all their PC clubs.
+    """
+    from pc_clubs.models import PCBooking
+
+    from .events import latest_event_id
+
+    today = today or clock.current().today
+    day_start, day_end = day_bounds(today)
+
+    # Taken before loading bookings so the live stream cannot miss a change.
+    last_event_id = latest_event_id()
+    salons, master_profile, pc_clubs = owner_venues(user)
+
+    # ── Salon bookings ──────────────────────────────────────────────
+    scope = booking_scope(user, salons, master_profile)
+
+    buckets = {"pending": [], "today": [], "upcoming": []}
+    past = None
+    if salons:
+        base = (
+            Appointment.objects
+            .filter(scope)
+            .select_related("client__profile", "service", "master", "salon")
+        )
+        live, past = _live_and_past(base, day_start, page)
+        buckets = split_buckets(live, day_start, day_end)
+
+    # ── PC club bookings ────────────────────────────────────────────
+    pc_buckets = {"pending": [], "today": [], "upcoming": []}
+    pc_past = None
+    if pc_clubs:
+        pc_base = (
+            PCBooking.objects
+            .filter(pc_club__in=pc_clubs)
+            .select_related("client__profile", "plan", "pc_club")
+        )
+        pc_live, pc_past = _live_and_past(pc_base, day_start, pc_page)
+        pc_buckets = split_buckets(pc_live, day_start, day_end)
+
+    return {
+        "salon": salons[0] if salons else None,
+        "salons": salons,
+        "multi_salon": len(salons) > 1,
+        "bookings_pending": buckets["pending"],
+        "bookings_today": buckets["today"],
+        "bookings_upcoming": buckets["upcoming"],
+        "bookings_past": past,
+        "today": today,
+        "user_pc_clubs": pc_clubs,
+        "pc_bookings_pending": pc_buckets["pending"],
+        "pc_bookings_today": pc_buckets["today"],
+        "pc_bookings_upcoming": pc_buckets["upcoming"],
+        "pc_bookings_past": pc_past,
+        "has_anything": bool(salons or pc_clubs),
+        "last_event_id": last_event_id,
+    }
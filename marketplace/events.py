@@ -0,0 +1,197 @@
+"""
+Live booking updates for the owner dashboard.
+
+Appointment / PCBooking saves append a BookingEvent row after commit (see
+the post_save receivers in marketplace.signals and pc_clubs.signals; the
+overdue sweeper publishes in bulk). The dashboard opens an EventSource on
+owner_dashboard_events, which streams events for the owner's venues with
+each row's rendered HTML per dashboard tab, so the page patches itself in
+place instead of reloading.
+
+The database is the channel, so every gunicorn worker sees every event.
+With sync workers keep BOOKING_EVENTS_STREAM_SECONDS at 0: each request
+sends what is new and closes, and the browser reconnects after RETRY_MS
+with the Last-Event-ID header.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import clock
+from .dashboard import booking_scope, day_bounds, owner_venues, split_buckets
+from .models import Appointment, BookingEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_TTL = timedelta(hours=1)
+# Events the rollup worker has not applied yet are kept this long, so a
+# stopped or lagging update_booking_rollups does not lose them.
+UNROLLED_EVENT_TTL = timedelta(days=7)
+RETRY_MS = 5000
+POLL_INTERVAL = 2
+HEARTBEAT_INTERVAL = 15
+BATCH_SIZE = 200
+
+ROW_TEMPLATES = {
+    "appointment": "include/booking_row.html",
+    "pc_booking": "include/pc_booking_row.html",
+}
+
+# Must match the include flags used for each tab in business/dashboard.html.
+BUCKET_OPTIONS = {
+    "pending": {"show_actions": True},
+    "today": {"show_actions": True},
+    "upcoming": {"show_date": True, "show_actions": True},
+    "past": {"show_date": True},
+}
+
+
+# =====================================================================
+# PUBLISHING
+# =====================================================================
+
+def event_for(booking):
+    """Unsaved BookingEvent describing the booking's current state."""
+    if isinstance(booking, Appointment):
+        return BookingEvent(
+            kind="appointment",
+            booking_id=booking.pk,
+            salon_id=booking.salon_id,
+            master_id=booking.master_id,
+            status=booking.status,
+        )
+    return BookingEvent(
+        kind="pc_booking",
+        booking_id=booking.pk,
+        pc_club_id=booking.pc_club_id,
+        status=booking.status,
+    )
+
+
+def publish_events(events):
+    if events:
+        BookingEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+
+def publish_on_commit(booking):
+    """Queue an event for `booking`, written once the current transaction commits."""
+    event = event_for(booking)
+    transaction.on_commit(lambda: publish_events([event]))
+
+
+def latest_event_id():
+    return BookingEvent.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+def prune_events(now=None):
+    """Delete rolled-up events older than EVENT_TTL, and any older than UNROLLED_EVENT_TTL."""
+    now = now or timezone.now()
+    deleted, _ = BookingEvent.objects.filter(rolled_up=True, created_at__lt=now - EVENT_TTL).delete()
+    expired, _ = BookingEvent.objects.filter(rolled_up=False, created_at__lt=now - UNROLLED_EVENT_TTL).delete()
+    if expired:
+        logger.warning(
+            "dropped booking events the rollup worker never applied",
+            extra={"fields": {"count": expired}},
+        )
+    return deleted + expired
+
+
+# =====================================================================
+# STREAMING
+# =====================================================================
+
+def owner_event_scope(user):
+    """
+    (Q over BookingEvent, multi_salon) for the venues on the user's
+    dashboard; the Q is None when the user has no venues at all.
+    """
+    salons, master_profile, pc_clubs = owner_venues(user)
+    if not (salons or pc_clubs):
+        return None, False
+    scope = booking_scope(user, salons, master_profile) | Q(pc_club__in=pc_clubs)
+    return scope, len(salons) > 1
+
+
+def _load_bookings(events):
+    from pc_clubs.models import PCBooking
+
+    ids = {"appointment": set(), "pc_booking": set()}
+    for e in events:
+        ids[e.kind].add(e.booking_id)
+    return {
+        "appointment": Appointment.objects.select_related(
+            "client__profile", "service", "master", "salon"
+        ).in_bulk(ids["appointment"]),
+        "pc_booking": PCBooking.objects.select_related(
+            "client__profile", "plan", "pc_club"
+        ).in_bulk(ids["pc_booking"]),
+    }
+
+
+def _payload(event, booking, day_start, day_end, multi_salon):
+    """Event JSON: one rendered row per dashboard tab the booking belongs in."""
+    data = {"kind": event.kind, "id": event.booking_id, "status": event.status, "rows": {}}
+    if booking is None:
+        return data  # deleted: the dashboard just drops the row
+
+    buckets = [name for name, rows in split_buckets([booking], day_start, day_end).items() if rows]
+    if booking.start_time < day_start:
+        buckets.append("past")
+    for bucket in buckets:
+        context = dict(BUCKET_OPTIONS[bucket], b=booking, show_venue=multi_salon)
+        data["rows"][bucket] = render_to_string(ROW_TEMPLATES[event.kind], context)
+    return data
+
+
+def _format(event_id, data):
+    return f"id: {event_id}\nevent: booking\ndata: {json.dumps(data)}\n\n"
+
+
+def _pending_messages(scope, last_id, multi_salon):
+    events = list(
+        BookingEvent.objects.filter(scope, pk__gt=last_id).order_by("pk")[:BATCH_SIZE]
+    )
+    if not events:
+        return last_id, []
+
+    # Several changes to one booking collapse into its latest state.
+    latest = {}
+    for e in events:
+        latest[(e.kind, e.booking_id)] = e
+    bookings = _load_bookings(latest.values())
+    day_start, day_end = day_bounds(clock.current().today)
+
+    messages = [
+        _format(e.pk, _payload(e, bookings[e.kind].get(e.booking_id), day_start, day_end, multi_salon))
+        for e in sorted(latest.values(), key=lambda e: e.pk)
+    ]
+    return events[-1].pk, messages
+
+
+def stream_owner_events(scope, last_id, multi_salon):
+    """
+    Yield SSE messages for events after `last_id`. Sends what is pending
+    and returns when BOOKING_EVENTS_STREAM_SECONDS is 0; otherwise keeps
+    polling for that long, with heartbeat comments for idle proxies.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+    deadline = time.monotonic() + settings.BOOKING_EVENTS_STREAM_SECONDS
+    last_beat = time.monotonic()
+
+    while True:
+        last_id, messages = _pending_messages(scope, last_id, multi_salon)
+        yield from messages
+        if time.monotonic() >= deadline:
+            return
+        if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+            yield ": ping\n\n"
+            last_beat = time.monotonic()
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,282 @@
+"""
+Booking exports for owners (CSV / XLSX).
+
+Rows are read with values_list().iterator(chunk_size=...), which on
+Postgres uses a server-side cursor, so memory stays flat however many
+years of bookings a venue has. Both formats are streamed: the first
+bytes go out with the first rows, so a large export never waits on the
+gunicorn timeout.
+
+  * CSV is written row by row into a StreamingHttpResponse.
+  * XLSX is a minimal SpreadsheetML package written into a zip stream
+    (zipfile uses data descriptors when the output is not seekable) and
+    flushed every EXPORT_CHUNK rows.
+
+Client-controlled text (names, comments) must never become a formula in
+the owner's spreadsheet: XLSX cells are inline strings, which Excel does
+not evaluate, and CSV cells starting with = + - @ TAB or CR get a
+leading apostrophe.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .dashboard import booking_scope, day_bounds, owner_venues
+from .models import Appointment
+
+EXPORT_CHUNK = 2000
+
+APPOINTMENT_HEADER = [
+    "ID", "Дата", "Начало", "Конец", "Салон", "Мастер", "Услуга",
+    "Клиент", "Телефон", "Статус", "Цена", "Комментарий", "Создано",
+]
+PC_BOOKING_HEADER = [
+    "ID", "Дата", "Начало", "Конец", "Клуб", "Тариф", "Мест", "Часов", "Сумма",
+    "Клиент", "Телефон", "Статус", "Комментарий", "Создано",
+]
+
+
+def parse_period(params):
+    """(start, end) aware datetimes from ?from=YYYY-MM-DD&to=YYYY-MM-DD; either may be None."""
+    start = end = None
+    try:
+        if params.get("from"):
+            start, _ = day_bounds(date.fromisoformat(params["from"]))
+        if params.get("to"):
+            _, end = day_bounds(date.fromisoformat(params["to"]))
+    except ValueError:
+        pass
+    return start, end
+
+
+def _in_period(qs, start, end):
+    if start:
+        qs = qs.filter(start_time__gte=start)
+    if end:
+        qs = qs.filter(start_time__lt=end)
+    return qs
+
+
+def _client_name(first, last, username):
+    return f"{first} {last}".strip() or username
+
+
+def _local(dt, fmt):
+    return timezone.localtime(dt).strftime(fmt) if dt else ""
+
+
+def appointment_rows(user, start=None, end=None):
+    salons, master_profile, _ = owner_venues(user)
+    if not salons:
+        return
+    statuses = dict(Appointment.STATUS_CHOICES)
+    qs = _in_period(Appointment.objects.filter(booking_scope(user, salons, master_profile)), start, end)
+    rows = qs.order_by("start_time", "pk").values_list(
+        "pk", "start_time", "end_time", "salon__name", "master__name", "service__name_ru",
+        "client__first_name", "client__last_name", "client__username", "client__profile__phone",
+        "status", "service__price", "comment", "created_at",
+    )
+    for (pk, start_time, end_time, salon, master, service, first, last, username, phone,
+         status, price, comment, created_at) in rows.iterator(chunk_size=EXPORT_CHUNK):
+        yield [
+            pk, _local(start_time, "%Y-%m-%d"), _local(start_time, "%H:%M"), _local(end_time, "%H:%M"),
+            salon, master or "", service or "", _client_name(first, last, username), phone or "",
+            statuses.get(status, status), price if price is not None else "", comment,
+            _local(created_at, "%Y-%m-%d %H:%M"),
+        ]
+
+
+def pc_booking_rows(user, start=None, end=None):
+    from pc_clubs.models import PCBooking
+
+    _, _, pc_clubs = owner_venues(user)
+    if not pc_clubs:
+        return
+    statuses = dict(PCBooking.STATUS_CHOICES)
+    qs = _in_period(PCBooking.objects.filter(pc_club__in=pc_clubs), start, end)
+    rows = qs.order_by("start_time", "pk").values_list(
+        "pk", "start_time", "end_time", "pc_club__name", "plan__name", "quantity", "hours",
+        "plan__price_per_hour",
+        "client__first_name", "client__last_name", "client__username", "client__profile__phone",
+        "status", "comment", "created_at",
+    )
+    for (pk, start_time, end_time, club, plan, quantity, hours, price_per_hour, first, last,
+         username, phone, status, comment, created_at) in rows.iterator(chunk_size=EXPORT_CHUNK):
+        yield [
+            pk, _local(start_time, "%Y-%m-%d"), _local(start_time, "%H:%M"), _local(end_time, "%H:%M"),
+            club, plan or "", quantity, hours,
+            price_per_hour * quantity * hours if price_per_hour is not None else "",
+            _client_name(first, last, username), phone or "",
+            statuses.get(status, status), comment, _local(created_at, "%Y-%m-%d %H:%M"),
+        ]
+
+
+EXPORTS = {
+    "appointments": (APPOINTMENT_HEADER, appointment_rows),
+    "pc-bookings": (PC_BOOKING_HEADER, pc_booking_rows),
+}
+
+
+# =====================================================================
+# RESPONSES
+# =====================================================================
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Phone numbers and signed numbers stay as they are.
+PLAIN_NUMBER = re.compile(r"[+-]?[\d\s()]+")
+
+
+def csv_safe(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PLAIN_NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(header, rows, filename):
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield "\ufeff"  # BOM so Excel opens Cyrillic text as UTF-8
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([csv_safe(value) for value in row])
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+# ── XLSX ────────────────────────────────────────────────────────────
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Style 1 is the bold header.
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+SHEET_TAIL = "</sheetData></worksheet>"
+
+# Characters XML 1.0 does not allow, even escaped.
+XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value, style):
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+        text = escape(XML_ILLEGAL.sub("", str(value)))
+        return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+    return f"<c{style}><v>{value}</v></c>"
+
+
+def _xlsx_row(values, style=""):
+    return "<row>" + "".join(_xlsx_cell(value, style) for value in values) + "</row>"
+
+
+class _Chunks:
+    """Unseekable sink for zipfile: collects the bytes it writes until drained."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def xlsx_stream(header, rows):
+    sink = _Chunks()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, body in XLSX_PARTS.items():
+            package.writestr(name, body)
+        with package.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write((SHEET_HEAD + _xlsx_row(header, ' s="1"')).encode())
+            for i, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if i % EXPORT_CHUNK == 0 and sink.buffer:
+                    yield sink.drain()
+            sheet.write(SHEET_TAIL.encode())
+    yield sink.drain()
+
+
+def xlsx_response(header, rows, filename):
+    response = StreamingHttpResponse(xlsx_stream(header, rows), content_type=XLSX_CONTENT_TYPE)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.xlsx"'
+    return response
@@ -1,7 +1,6 @@
 from datetime import datetime
 
 from django import forms
-from django.utils import timezone
 from django.forms import modelformset_factory
 
 from .models import Master, SalonWorkingHours
@@ -9,10 +8,10 @@ from .models import Master, SalonWorkingHours
 from datetime import datetime
 
 from django import forms
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.forms import modelformset_factory
 
+from . import clock
 from .models import Master, SalonWorkingHours, BusinessLead
 
 
@@ -62,8 +61,7 @@ class BookingForm(forms.Form):
     def build_start_datetime(self):
         d = self.cleaned_data["date"]
         t = self.cleaned_data["time"]
-        naive = datetime.combine(d, t)
-        return timezone.make_aware(naive, timezone.get_current_timezone())
+        return clock.current().aware(datetime.combine(d, t))
 
 class SalonWorkingHoursForm(forms.ModelForm):
     open_time = forms.TimeField(
@@ -0,0 +1,105 @@
+"""
+Localized field lookup for models with per-language columns
+(name_ru / name_en / name_uz, description_ru / …).
+
+Two ways to read the value for the active language:
+
+1. Per object, e.g. {% i18n obj "name" %} or obj.get_i18n("name", lang):
+   a lookup in the model's accessor table, built once by
+   MarketplaceConfig.ready(), mapping (field_base, lang) to a getter over
+   the fallback chain
+       <base>_<lang> -> <base>_<LANGUAGE_CODE> -> <base>
+   (columns the model does not have are left out of the chain).
+
+2. Per queryset, for listing pages:
+
+       annotate_localized(Service.objects.all(), "name", "description")
+       -> every row gets .name_localized / .description_localized computed
+          by Postgres with the same fallback chain (COALESCE(NULLIF(…, ''), …)),
+          so templates just read an attribute.
+"""
+
+from django.conf import settings
+from django.db.models import CharField, F, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils.translation import get_language
+
+LANGUAGE_CODES = tuple(code for code, _ in settings.LANGUAGES)
+
+
+def site_language():
+    return settings.LANGUAGE_CODE.split("-")[0]
+
+
+def current_language():
+    return (get_language() or site_language()).split("-")[0].lower()
+
+
+def fallback_chain(field_names, base, lang):
+    """Concrete column names tried, in order, for `base` in `lang`."""
+    chain = []
+    for name in (f"{base}_{lang}", f"{base}_{site_language()}", base):
+        if name in field_names and name not in chain:
+            chain.append(name)
+    return tuple(chain)
+
+
+def _getter(chain):
+    def get(obj):
+        for name in chain:
+            val = getattr(obj, name)
+            if val:
+                return val
+        return ""
+    return get
+
+
+def _missing(obj):
+    return ""
+
+
+def build_accessors(model):
+    """{(field_base, lang): getter} for every translated column group of `model`."""
+    fields = model._meta.concrete_fields
+    field_names = {f.attname for f in fields}
+    bases = {
+        name[: -len(code) - 1]
+        for name in field_names
+        for code in LANGUAGE_CODES
+        if name.endswith(f"_{code}")
+    }
+    # Untranslated text columns (Salon.name) resolve to themselves.
+    bases.update(f.attname for f in fields if isinstance(f, (CharField, TextField)))
+    return {
+        (base, lang): _getter(fallback_chain(field_names, base, lang))
+        for base in bases
+        for lang in LANGUAGE_CODES
+    }
+
+
+def install_accessors(models):
+    for model in models:
+        model._i18n_accessors = build_accessors(model)
+
+
+def accessor(model, field_base, lang):
+    table = model.__dict__.get("_i18n_accessors")
+    if table is None:
+        # Model imported outside of an initialised app registry (scripts).
+        install_accessors([model])
+        table = model._i18n_accessors
+    return table.get((field_base, lang), _missing)
+
+
+def annotate_localized(queryset, *field_bases, lang=None):
+    """Annotate `<base>_localized` for each of `field_bases` in `lang` (default: active language)."""
+    lang = lang or current_language()
+    field_names = {f.attname for f in queryset.model._meta.concrete_fields}
+    annotations = {}
+    for base in field_bases:
+        chain = fallback_chain(field_names, base, lang)
+        annotations[f"{base}_localized"] = Coalesce(
+            *(NullIf(F(name), Value("")) for name in chain), Value(""),
+            output_field=TextField(),
+        ) if chain else Value("", output_field=TextField())
+    return queryset.annotate(**annotations)
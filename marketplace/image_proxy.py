@@ -0,0 +1,290 @@
+"""
+Local proxy/cache for external images (logo_url, cover_url, photo_url).
+
+Templates never hotlink the remote host: {{ url|proxied:"card" }} links to
+the image_proxy view with a signed token for (url, size). The first
+request fetches the remote image, resizes it to that size, encodes WebP
+and stores it under IMAGE_PROXY_CACHE_DIR; later requests are served from
+disk. Only signed tokens are fetched, so the endpoint is not an open
+proxy, and only from public addresses: venue owners set these URLs, so a
+URL (or a redirect hop) pointing at loopback, the LAN or the cloud
+metadata service is refused. The check runs on the peer address of every
+socket the fetch opens, so a host that resolves to a public address for
+the check and to 127.0.0.1 for the connection (DNS rebinding) is refused
+too. IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS exempts named hosts, e.g. an
+internal CDN.
+
+The cache is an LRU bounded by IMAGE_PROXY_CACHE_MAX_BYTES: hits bump the
+file's mtime, and a write that pushes the cache over the cap evicts the
+least recently used files down to PRUNE_TO of the cap. Each process keeps
+a running total of the cache size (one directory walk to start, then the
+sizes it writes) and only walks the cache again once that total passes
+the cap.
+"""
+
+import hashlib
+import ipaddress
+import os
+import socket
+import tempfile
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from django.core import signing
+from django.urls import reverse
+
+from config.instrumentation import track_external
+
+from .images import SIZES, WEBP_OPTIONS
+
+SALT = "marketplace.image_proxy"
+FETCH_TIMEOUT = 5
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+MAX_REDIRECTS = 3
+PRUNE_TO = 0.9
+
+
+class FetchError(Exception):
+    pass
+
+
+def cache_dir():
+    return str(getattr(settings, "IMAGE_PROXY_CACHE_DIR", settings.BASE_DIR / "cache" / "images"))
+
+
+def cache_cap():
+    return getattr(settings, "IMAGE_PROXY_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+
+
+# =====================================================================
+# SIGNED URLS
+# =====================================================================
+
+def proxy_url(url, size="card"):
+    if not url or size not in SIZES:
+        return url or ""
+    token = signing.dumps({"u": url, "s": size}, salt=SALT, compress=True)
+    return reverse("marketplace:image_proxy", args=[token])
+
+
+def unsign(token):
+    """(url, size) from a token, or None when forged or malformed."""
+    try:
+        data = signing.loads(token, salt=SALT)
+        url, size = data["u"], data["s"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+    if size not in SIZES or not url.startswith(("http://", "https://")):
+        return None
+    return url, size
+
+
+# =====================================================================
+# CACHE
+# =====================================================================
+
+def cache_path(url, size):
+    key = hashlib.sha256(f"{size}:{url}".encode()).hexdigest()
+    return os.path.join(cache_dir(), key[:2], f"{key}.webp")
+
+
+def lookup(url, size):
+    """Path of the cached image, bumped to most recently used, or None."""
+    path = cache_path(url, size)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+# cache dir -> this process's estimate of its size in bytes
+_cache_bytes = {}
+
+
+def _evict():
+    files = []
+    total = 0
+    for dirpath, _, filenames in os.walk(cache_dir()):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total > cache_cap():
+        target = cache_cap() * PRUNE_TO
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    _cache_bytes[cache_dir()] = total
+
+
+def store(url, size, data):
+    path = cache_path(url, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write + rename, so concurrent readers never see a partial file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+    # Other workers' writes are missing from the estimate until the next
+    # walk, so the cache can run over the cap by what they wrote since.
+    estimate = _cache_bytes.get(cache_dir())
+    if estimate is None or estimate + len(data) > cache_cap():
+        _evict()
+    else:
+        _cache_bytes[cache_dir()] = estimate + len(data)
+    return path
+
+
+# =====================================================================
+# FETCH + ENCODE
+# =====================================================================
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _private_allowed(host):
+    return host in getattr(settings, "IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS", ())
+
+
+def check_public(url):
+    """Raise FetchError unless every address the host of `url` resolves to is public."""
+    parts = urlsplit(url)
+    try:
+        host, port = parts.hostname, parts.port
+    except ValueError as exc:
+        raise FetchError(f"bad url: {exc}") from exc
+    if parts.scheme not in ("http", "https") or not host:
+        raise FetchError(f"bad url: {url}")
+    if _private_allowed(host):
+        return
+
+    try:
+        infos = socket.getaddrinfo(host, port or (443 if parts.scheme == "https" else 80), proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise FetchError(f"cannot resolve {host}: {exc}") from exc
+    for *_, sockaddr in infos:
+        if not _is_public(sockaddr[0]):
+            raise FetchError(f"non-public address: {host} -> {sockaddr[0]}")
+
+
+# ── Connections ──────────────────────────────────────────────────────
+# check_public() resolves the host on its own; the connection resolves it
+# again. These connection classes check the address the socket actually
+# connected to, while the request keeps the original Host header, SNI
+# and certificate check.
+
+class _PublicPeerMixin:
+    def _new_conn(self):
+        sock = super()._new_conn()
+        peer = sock.getpeername()[0]
+        if not _private_allowed(self.host) and not _is_public(peer):
+            sock.close()
+            raise FetchError(f"non-public address: {self.host} -> {peer}")
+        return sock
+
+
+class _PublicHTTPConnection(_PublicPeerMixin, HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicPeerMixin, HTTPSConnection):
+    pass
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class _PublicAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PublicHTTPConnectionPool,
+            "https": _PublicHTTPSConnectionPool,
+        }
+
+
+_session = None
+
+
+def session():
+    """requests.Session that only connects to public addresses (one per process)."""
+    global _session
+    if _session is None:
+        new = requests.Session()
+        new.trust_env = False  # an HTTP(S)_PROXY would be the peer of every socket
+        new.mount("http://", _PublicAdapter())
+        new.mount("https://", _PublicAdapter())
+        _session = new
+    return _session
+
+
+def fetch(url):
+    # Redirects are followed by hand so every hop goes through check_public.
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            check_public(url)
+            with track_external("image_proxy"), session().get(
+                url, timeout=FETCH_TIMEOUT, stream=True, allow_redirects=False,
+            ) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["Location"])
+                    continue
+                response.raise_for_status()
+                if not response.headers.get("Content-Type", "").startswith("image/"):
+                    raise FetchError(f"not an image: {response.headers.get('Content-Type')}")
+                body = BytesIO()
+                for chunk in response.iter_content(64 * 1024):
+                    body.write(chunk)
+                    if body.tell() > MAX_SOURCE_BYTES:
+                        raise FetchError("image too large")
+                return body.getvalue()
+    except requests.RequestException as exc:
+        raise FetchError(str(exc)) from exc
+    raise FetchError("too many redirects")
+
+
+def encode(data, size):
+    from PIL import Image, ImageOps
+
+    try:
+        img = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        # DecompressionBombError: over twice Image.MAX_IMAGE_PIXELS; a small
+        # file can still decode to gigabytes.
+        raise FetchError(f"unreadable image: {exc}") from exc
+    img.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format="WEBP", **WEBP_OPTIONS)
+    return buf.getvalue()
+
+
+def get_or_fetch(url, size):
+    """Path of the cached WebP for (url, size), fetching it on a miss. Raises FetchError."""
+    return lookup(url, size) or store(url, size, encode(fetch(url), size))
@@ -0,0 +1,326 @@
+"""
+Image pipeline for uploaded venue images.
+
+Uploads are stored as-is; saving a model only flags it (`images_pending`).
+A background worker then renders responsive variants of every image field
+in WebP (and AVIF when Pillow can encode it) and records them in
+`image_variants`, so no request ever waits on Pillow:
+
+    image_variants = {
+        "cover": {
+            "src": "salon_covers/…/ab12cd34.jpg",   # original the variants belong to
+            "lqip": "data:image/webp;base64,…",      # ~20px blurred placeholder
+            "color": "#a3b1c2",                      # dominant (average) colour
+            "card": {"w": 480, "h": 270, "webp": "salon_covers/…/ab12cd34.card.webp",
+                     "avif": "salon_covers/…/ab12cd34.card.avif"},
+            "full": {...},
+        },
+    }
+
+Models opt in with ProcessedImagesMixin and an IMAGE_FIELDS mapping of
+field name -> sizes to render. Templates use {% picture %} / |srcset from
+the `images` template library.
+
+Run the worker via:  python manage.py process_images --loop
+"""
+
+import logging
+import os
+import uuid
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels. Images are never upscaled.
+SIZES = {
+    "thumb": 160,
+    "card": 480,
+    "full": 1200,
+}
+
+# Keys of an image_variants entry that are not sizes.
+META_KEYS = ("src", "lqip", "color")
+LQIP_SIZE = 20
+
+WEBP_OPTIONS = {"quality": 80, "method": 4}
+AVIF_OPTIONS = {"quality": 60, "speed": 6}
+BATCH_SIZE = 20
+
+
+def upload_path(folder, filename):
+    """folder/YYYY/MM/DD/<random>.<original extension>"""
+    ext = os.path.splitext(filename)[1].lower() or ".jpg"
+    now = timezone.localtime()
+    return f"{folder}/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}{ext}"
+
+
+def _is_new_upload(field):
+    """Return True when field holds a freshly uploaded file (not a saved FieldFile)."""
+    try:
+        from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+        return isinstance(field.file, (InMemoryUploadedFile, TemporaryUploadedFile))
+    except Exception:
+        return False
+
+
+def avif_supported():
+    from PIL import Image
+
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF codec on Pillow < 11.3)
+    except ImportError:
+        pass
+    return "AVIF" in Image.SAVE
+
+
+def output_formats():
+    return ("webp", "avif") if avif_supported() else ("webp",)
+
+
+class ProcessedImagesMixin(models.Model):
+    """
+    Abstract base for models with uploaded images. Subclasses set
+    IMAGE_FIELDS = {"field_name": ("thumb", "card"), ...} and, when a
+    field has an external-URL fallback, IMAGE_URL_FIELDS = {"logo": "logo_url"}.
+    """
+    IMAGE_FIELDS = {}
+    IMAGE_URL_FIELDS = {}
+
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Варианты изображений")
+    images_pending = models.BooleanField(default=False, editable=False, verbose_name="Изображения в обработке")
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        for name in self.IMAGE_FIELDS:
+            field = getattr(self, name)
+            if (field and _is_new_upload(field)) or (not field and name in self.image_variants):
+                self.images_pending = True
+
+        update_fields = kwargs.get("update_fields")
+        if self.images_pending and update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"images_pending"}
+        super().save(*args, **kwargs)
+
+    def current_variants(self, name):
+        """{size: {"w", "h", "webp", ...}} rendered from the field's current file, or {}."""
+        field = getattr(self, name)
+        entry = self.image_variants.get(name) or {}
+        if not field or entry.get("src") != field.name:
+            return {}  # not rendered yet, or rendered from a replaced upload
+        return {size: variant for size, variant in entry.items() if size not in META_KEYS}
+
+    def placeholder(self, name):
+        """(lqip data URI, dominant colour) of the current upload, or ("", "")."""
+        if not self.current_variants(name):
+            return "", ""
+        entry = self.image_variants[name]
+        return entry.get("lqip", ""), entry.get("color", "")
+
+
+# =====================================================================
+# RENDERING
+# =====================================================================
+
+def _open(field_file):
+    from PIL import Image, ImageOps
+
+    field_file.open("rb")
+    try:
+        img = Image.open(field_file)
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    finally:
+        field_file.close()
+    return img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+
+def _encode(img, fmt):
+    buf = BytesIO()
+    if fmt == "avif":
+        img.save(buf, format="AVIF", **AVIF_OPTIONS)
+    else:
+        img.save(buf, format="WEBP", **WEBP_OPTIONS)
+    return buf.getvalue()
+
+
+def variant_files(entry):
+    """Storage names of the rendered files in one image_variants entry."""
+    for size, variant in entry.items():
+        if size in META_KEYS:
+            continue
+        for fmt in ("webp", "avif"):
+            if variant.get(fmt):
+                yield variant[fmt]
+
+
+def delete_variants(storage, entry):
+    # A no-op on ContentAddressedStorage (files may be shared); prune_media collects them.
+    for name in variant_files(entry):
+        storage.delete(name)
+
+
+def placeholder(img):
+    """(base64 WebP data URI of a ~20px version, "#rrggbb" average colour) of `img`."""
+    import base64
+    from PIL import Image
+
+    tiny = img.copy()
+    tiny.thumbnail((LQIP_SIZE, LQIP_SIZE), Image.BOX)
+    buf = BytesIO()
+    tiny.save(buf, format="WEBP", quality=30)
+    lqip = "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    r, g, b = tiny.convert("RGB").resize((1, 1), Image.BOX).getpixel((0, 0))
+    return lqip, f"#{r:02x}{g:02x}{b:02x}"
+
+
+def render_variants(field_file, sizes, formats=None):
+    """
+    Write `sizes` × `formats` of `field_file` next to the original and
+    return the image_variants entry for that field.
+    """
+    from PIL import Image
+
+    formats = formats or output_formats()
+    storage = field_file.storage
+    root = os.path.splitext(field_file.name)[0]
+    original = _open(field_file)
+
+    variants = {"src": field_file.name}
+    variants["lqip"], variants["color"] = placeholder(original)
+    for size in sizes:
+        img = original.copy()
+        img.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+        variant = {"w": img.width, "h": img.height}
+        for fmt in formats:
+            variant[fmt] = storage.save(f"{root}.{size}.{fmt}", ContentFile(_encode(img, fmt)))
+        variants[size] = variant
+    return variants
+
+
+def is_rendered(obj, name):
+    # Entries from before placeholders existed count as stale.
+    return bool(obj.current_variants(name)) and "lqip" in obj.image_variants[name]
+
+
+def render_instance(obj, force=False):
+    """
+    Render the image fields of `obj` whose variants are missing or stale
+    (every field with `force`), dropping replaced variant files.
+    Returns the new image_variants dict.
+    """
+    from PIL import Image
+
+    variants = {}
+    for name, sizes in obj.IMAGE_FIELDS.items():
+        field_file = getattr(obj, name)
+        if is_rendered(obj, name) and not force:
+            variants[name] = obj.image_variants[name]
+            continue
+        old = obj.image_variants.get(name)
+        if old:
+            delete_variants(field_file.storage, old)
+        if not field_file:
+            continue
+        try:
+            variants[name] = render_variants(field_file, sizes)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Missing, unreadable or oversized file: templates fall back to
+            # the original URL.
+            logger.warning("image not rendered", exc_info=True,
+                           extra={"fields": {"model": obj._meta.label, "pk": obj.pk, "field": name}})
+            continue
+    return variants
+
+
+# =====================================================================
+# WORKER
+# =====================================================================
+
+def image_models():
+    return [m for m in apps.get_models() if issubclass(m, ProcessedImagesMixin)]
+
+
+def _claim(model, limit):
+    """Clear images_pending on up to `limit` flagged rows and return them."""
+    with transaction.atomic():
+        batch = list(
+            model.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(images_pending=True)
+            .order_by("pk")[:limit]
+        )
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(images_pending=False)
+    return batch
+
+
+def process_pending_images(limit=BATCH_SIZE):
+    """
+    Render variants for up to `limit` flagged rows per model. Rows are
+    claimed in a short transaction (SKIP LOCKED, so several workers can run
+    at once) and rendered outside it, so owner edits and bookings never
+    wait on Pillow. A row whose image was replaced meanwhile is flagged
+    again by its save() and keeps the newer upload; a row that fails to
+    render is logged and left to the original URL (`reencode_media`
+    retries it). Returns the number of rows claimed.
+    """
+    claimed = 0
+    for model in image_models():
+        batch = _claim(model, limit)
+        claimed += len(batch)
+        for obj in batch:
+            try:
+                variants = render_instance(obj)
+            except Exception:
+                logger.exception("image render failed", extra={"fields": {"model": model._meta.label, "pk": obj.pk}})
+                continue
+            # update(), not save(): keeps post_save receivers out of the worker.
+            sources = {name: getattr(obj, name).name for name in model.IMAGE_FIELDS}
+            model.objects.filter(pk=obj.pk, **sources).update(image_variants=variants)
+    return claimed
+
+
+# =====================================================================
+# BULK RE-ENCODING  (see the `reencode_media` command)
+# =====================================================================
+
+def init_worker():
+    """ProcessPoolExecutor initializer: spawned children need Django set up."""
+    import django
+
+    django.setup()
+
+
+def needs_render(obj, force=False):
+    fields = [name for name in obj.IMAGE_FIELDS if getattr(obj, name)]
+    return bool(fields) and (force or any(not is_rendered(obj, name) for name in fields))
+
+
+def reencode(label, pk, force=False):
+    """
+    Render and record the variants of one row, in a worker process.
+    Returns (original bytes, bytes of the largest WebP variants), or
+    None when the row is gone.
+    """
+    model = apps.get_model(label)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return None
+
+    variants = render_instance(obj, force=force)
+    model.objects.filter(pk=pk).update(image_variants=variants, images_pending=False)
+
+    original = rendered = 0
+    for name, entry in variants.items():
+        storage = getattr(obj, name).storage
+        largest = max((v for size, v in entry.items() if size not in META_KEYS), key=lambda v: v["w"])
+        original += storage.size(entry["src"])
+        rendered += storage.size(largest["webp"])
+    return original, rendered
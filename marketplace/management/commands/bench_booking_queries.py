@@ -0,0 +1,300 @@
+"""
+Benchmark the booking hot queries with and without the composite indexes.
+
+Seeds a large Appointment / PCBooking table inside a transaction, records
+EXPLAIN plans and latencies for the queries behind get_available_slots,
+owner_dashboard, my_bookings and PCClub.pcs_booked_at, drops the booking
+indexes, measures again, then rolls everything back. Nothing is left in
+the database.
+
+Run with:
+    python manage.py bench_booking_queries
+    python manage.py bench_booking_queries --appointments 500000 --output bench.md
+"""
+
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from marketplace.models import Appointment, Master, Salon, Service
+from pc_clubs.models import PCBooking, PCClub, PCPlan
+
+# Indexes measured by this benchmark (dropped for the "before" run).
+BENCH_INDEXES = {
+    Appointment: [
+        "appt_status_start_idx",
+        "appt_master_active_idx",
+        "appt_salon_status_start_idx",
+        "appt_client_start_idx",
+    ],
+    PCBooking: [
+        "pcbooking_status_start_idx",
+        "pcbooking_club_active_idx",
+        "pcbooking_club_status_idx",
+        "pcbooking_client_start_idx",
+    ],
+}
+
+SALONS = 50
+MASTERS_PER_SALON = 4
+CLUBS = 20
+CLIENTS = 500
+BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = "Seed a large booking table and compare hot-query plans/latency with and without indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--appointments",
+            type=int,
+            default=200_000,
+            help="Number of appointments to seed (default: 200000).",
+        )
+        parser.add_argument(
+            "--pc-bookings",
+            type=int,
+            default=100_000,
+            help="Number of PC bookings to seed (default: 100000).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Runs per query when measuring latency (default: 20).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the full report (plans included) to this file.",
+        )
+
+    def handle(self, *args, **opts):
+        random.seed(42)
+        with transaction.atomic():
+            self.stdout.write("Seeding...")
+            fixtures = self._seed(opts["appointments"], opts["pc_bookings"])
+            self._analyze()
+
+            self.stdout.write("Measuring with indexes...")
+            after = self._measure(fixtures, opts["repeat"])
+
+            self._drop_indexes()
+            self._analyze()
+            self.stdout.write("Measuring without indexes...")
+            before = self._measure(fixtures, opts["repeat"])
+
+            transaction.set_rollback(True)
+
+        report = self._report(before, after)
+        self.stdout.write(report["summary"])
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(report["full"])
+            self.stdout.write(self.style.SUCCESS(f"Report written to {opts['output']}"))
+
+    # =====================================================================
+    # SEEDING
+    # =====================================================================
+
+    def _seed(self, n_appointments, n_pc_bookings):
+        User = get_user_model()
+        owner = User.objects.create(username="bench_owner")
+        clients = User.objects.bulk_create(
+            [User(username=f"bench_client_{i}") for i in range(CLIENTS)],
+            batch_size=BATCH,
+        )
+
+        salons, masters, services = [], [], {}
+        for i in range(SALONS):
+            salon = Salon.objects.create(name=f"Bench salon {i}", owner=owner, address="-", phone="-")
+            salons.append(salon)
+            services[salon.pk] = Service.objects.create(
+                salon=salon, name_ru="Bench", price=Decimal("100000"), duration_minutes=60,
+            )
+            masters.extend(
+                Master.objects.create(salon=salon, name=f"Bench master {i}-{j}")
+                for j in range(MASTERS_PER_SALON)
+            )
+
+        # Per master: back-to-back 60-minute bookings every 90 minutes,
+        # centred on "now" so past and future are both populated.
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        per_master = max(1, n_appointments // len(masters))
+        first_start = now - timedelta(minutes=90 * per_master // 2)
+        statuses = ["pending", "confirmed", "completed", "cancelled"]
+        weights = [1, 3, 5, 1]
+
+        batch = []
+        for master in masters:
+            for k in range(per_master):
+                start = first_start + timedelta(minutes=90 * k)
+                batch.append(Appointment(
+                    client=random.choice(clients),
+                    salon_id=master.salon_id,
+                    master=master,
+                    service=services[master.salon_id],
+                    start_time=start,
+                    end_time=start + timedelta(minutes=60),
+                    status=random.choices(statuses, weights)[0],
+                ))
+                if len(batch) >= BATCH:
+                    Appointment.objects.bulk_create(batch)
+                    batch = []
+        Appointment.objects.bulk_create(batch)
+
+        clubs, plans = [], {}
+        for i in range(CLUBS):
+            club = PCClub.objects.create(name=f"Bench club {i}", owner=owner, address="-", phone="-", total_pcs=40)
+            clubs.append(club)
+            plans[club.pk] = PCPlan.objects.create(pc_club=club, name="Bench", price_per_hour=Decimal("15000"))
+
+        span_hours = max(1, n_pc_bookings // (CLUBS * 4))
+        batch = []
+        for _ in range(n_pc_bookings):
+            club = random.choice(clubs)
+            start = now + timedelta(hours=random.randint(-span_hours, span_hours))
+            hours = random.randint(1, 4)
+            batch.append(PCBooking(
+                client=random.choice(clients),
+                pc_club=club,
+                plan=plans[club.pk],
+                quantity=random.randint(1, 3),
+                hours=hours,
+                start_time=start,
+                end_time=start + timedelta(hours=hours),
+                status=random.choices(statuses, weights)[0],
+            ))
+            if len(batch) >= BATCH:
+                PCBooking.objects.bulk_create(batch)
+                batch = []
+        PCBooking.objects.bulk_create(batch)
+
+        day_start = timezone.localtime(now).replace(hour=0)
+        return {
+            "now": now,
+            "day_start": day_start,
+            "day_end": day_start + timedelta(days=1),
+            "salon": salons[0],
+            "master": masters[0],
+            "client": clients[0],
+            "club": clubs[0],
+        }
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            for model in BENCH_INDEXES:
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    def _drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, names in BENCH_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        editor.remove_index(model, index)
+
+    # =====================================================================
+    # QUERIES
+    # =====================================================================
+
+    def _queries(self, f):
+        """(label, queryset, runner) for each hot path, mirroring the views."""
+        as_list = list
+        return [
+            (
+                "get_available_slots: master busy ranges",
+                Appointment.objects
+                .filter(master=f["master"], salon=f["salon"])
+                .filter(status__in=["pending", "confirmed", "completed"])
+                .filter(start_time__lt=f["day_end"], end_time__gt=f["day_start"])
+                .values_list("start_time", "end_time"),
+                as_list,
+            ),
+            (
+                "owner_dashboard: salon pending",
+                Appointment.objects.filter(salon=f["salon"], status="pending").order_by("start_time"),
+                as_list,
+            ),
+            (
+                "owner_dashboard: salon today",
+                Appointment.objects
+                .filter(salon=f["salon"], start_time__gte=f["day_start"], start_time__lt=f["day_end"])
+                .exclude(status="cancelled")
+                .order_by("start_time"),
+                as_list,
+            ),
+            (
+                "my_bookings: client history page",
+                Appointment.objects.filter(client=f["client"]).order_by("-start_time")[:20],
+                as_list,
+            ),
+            (
+                "pcs_booked_at: club capacity",
+                f["club"].bookings.filter(
+                    status__in=["pending", "confirmed"],
+                    start_time__lt=f["now"] + timedelta(hours=2),
+                    end_time__gt=f["now"],
+                ),
+                lambda qs: qs.aggregate(total=Sum("quantity")),
+            ),
+            (
+                "owner_dashboard: club pending",
+                PCBooking.objects.filter(pc_club=f["club"], status="pending").order_by("start_time"),
+                as_list,
+            ),
+            (
+                "my_bookings: client PC history page",
+                PCBooking.objects.filter(client=f["client"]).order_by("-start_time")[:20],
+                as_list,
+            ),
+        ]
+
+    def _measure(self, fixtures, repeat):
+        results = {}
+        analyze = connection.vendor == "postgresql"
+        for label, qs, run in self._queries(fixtures):
+            run(qs.all())  # warm-up
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                run(qs.all())
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            results[label] = {
+                "p50": statistics.median(timings),
+                "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                "plan": qs.explain(analyze=True) if analyze else qs.explain(),
+            }
+        return results
+
+    # =====================================================================
+    # REPORT
+    # =====================================================================
+
+    def _report(self, before, after):
+        lines = [
+            f"{'query':<42} {'before p50':>11} {'after p50':>10} {'before p95':>11} {'after p95':>10}",
+        ]
+        for label in after:
+            b, a = before[label], after[label]
+            lines.append(
+                f"{label:<42} {b['p50']:>9.2f}ms {a['p50']:>8.2f}ms {b['p95']:>9.2f}ms {a['p95']:>8.2f}ms"
+            )
+        summary = "\n".join(lines)
+
+        full = ["# Booking hot-query benchmark", "", "```", summary, "```", ""]
+        for label in after:
+            full += [
+                f"## {label}", "",
+                "### Without indexes", "", "```", before[label]["plan"], "```", "",
+                "### With indexes", "", "```", after[label]["plan"], "```", "",
+            ]
+        return {"summary": summary, "full": "\n".join(full)}
@@ -0,0 +1,251 @@
+"""
+Compare the concurrent-request capacity of the sync (WSGI) and async (ASGI)
+deployments on the I/O-bound endpoints. config.wsgi serves the sync views
+(api_slots_sync, submit_business_lead_sync) and config.asgi the async ones,
+so this compares the views as each deployment runs them.
+
+Both servers run against the same database; this command plays the
+clients. For each deployment, scenario and concurrency level it sends
+--requests requests from that many concurrent connections and reports
+req/s, p50/p95/p99 latency and errors. "Capacity" is the highest
+concurrency level whose p95 stays within --slo-ms without errors.
+
+    slots   GET api_slots (database bound)
+    lead    POST submit_business_lead, which waits on the Telegram API
+
+For "lead" the command starts a stand-in Telegram API on --upstream-port
+that answers after --upstream-delay-ms, so the result reflects a slow
+upstream rather than the real one. Point both servers at it in .env:
+
+    TELEGRAM_API_URL=http://127.0.0.1:8099
+    TELEGRAM_BOT_TOKEN=bench
+    BUSINESS_LEADS_TELEGRAM_ID=1
+
+Run with:
+    gunicorn config.wsgi:application --bind 127.0.0.1:8001 --workers 3 --worker-class gthread --threads 4 --timeout 60 &
+    gunicorn config.asgi:application --bind 127.0.0.1:8002 --workers 3 --worker-class uvicorn_worker.UvicornWorker --timeout 60 &
+    python manage.py bench_concurrency
+    python manage.py bench_concurrency --scenario lead --concurrency 1,16,64,256 --upstream-delay-ms 1000
+    python manage.py bench_concurrency --async-url "" --output sync-only.md
+
+Business leads created by the run are deleted afterwards.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from marketplace import clock
+from marketplace.models import BusinessLead, Salon
+
+from .loadtest import percentile
+
+SCENARIOS = ("slots", "lead")
+
+
+# =====================================================================
+# STAND-IN TELEGRAM API
+# =====================================================================
+
+def start_upstream(port, delay):
+    """Answer every POST with {"ok": true} after `delay` seconds; returns (server, hit counter)."""
+    hits = {"count": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay)
+            with lock:
+                hits["count"] += 1
+            body = b'{"ok": true, "result": {}}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+# =====================================================================
+# CLIENT
+# =====================================================================
+
+async def run_level(base_url, spec, concurrency, total, timeout):
+    """Send `total` requests from `concurrency` connections; returns ([seconds], errors, elapsed)."""
+    import aiohttp
+
+    method, path, params, data = spec
+    csrf = uuid.uuid4().hex
+    cookies = {settings.CSRF_COOKIE_NAME: csrf}
+    headers = {"X-CSRFToken": csrf, "Referer": base_url + "/"}
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency, force_close=False),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        cookies=cookies,
+        headers=headers,
+    ) as session:
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    async with session.request(
+                        method, base_url + path, params=params, data=data, allow_redirects=False,
+                    ) as response:
+                        await response.read()
+                        ok = response.status == 200
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent-request capacity of the WSGI and ASGI deployments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync-url", default="http://127.0.0.1:8001", help="WSGI deployment (\"\" to skip).")
+        parser.add_argument("--async-url", default="http://127.0.0.1:8002", help="ASGI deployment (\"\" to skip).")
+        parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="Repeatable; default: all.")
+        parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated levels (default: 1,8,32,128).")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per level (at least 2x the level).")
+        parser.add_argument("--upstream-port", type=int, default=8099, help="Stand-in Telegram API port.")
+        parser.add_argument("--upstream-delay-ms", type=int, default=300, help="Stand-in Telegram API latency.")
+        parser.add_argument("--slo-ms", type=float, default=1000, help="p95 budget used for capacity (default: 1000).")
+        parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds.")
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **opts):
+        targets = [(name, url.rstrip("/")) for name, url in (("wsgi", opts["sync_url"]), ("asgi", opts["async_url"])) if url]
+        if not targets:
+            raise CommandError("Nothing to benchmark: both --sync-url and --async-url are empty.")
+        try:
+            levels = [int(level) for level in opts["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency expects comma-separated integers, e.g. 1,8,32.")
+        scenarios = opts["scenario"] or list(SCENARIOS)
+        marker = f"bench_concurrency:{uuid.uuid4().hex[:12]}"
+        specs = self._specs(scenarios, marker)
+
+        upstream = hits = None
+        if "lead" in scenarios:
+            upstream, hits = start_upstream(opts["upstream_port"], opts["upstream_delay_ms"] / 1000)
+
+        rows = []
+        try:
+            for scenario in scenarios:
+                for name, url in targets:
+                    for level in levels:
+                        total = max(opts["requests"], level * 2)
+                        before = hits["count"] if hits else 0
+                        latencies, errors, elapsed = asyncio.run(
+                            run_level(url, specs[scenario], level, total, opts["timeout"])
+                        )
+                        row = self._row(name, scenario, level, latencies, errors, elapsed)
+                        if hits is not None and scenario == "lead":
+                            row["upstream"] = hits["count"] - before
+                        rows.append(row)
+                        self.stdout.write(
+                            f"{name:4} {scenario:5} c={level:<4} {row['rps']:8.1f} req/s  "
+                            f"p95 {row['p95']:7.0f} ms  errors {errors}"
+                        )
+        finally:
+            if upstream is not None:
+                upstream.shutdown()
+            BusinessLead.objects.filter(description=marker).delete()
+
+        report = self._report(rows, opts["slo_ms"], opts["upstream_delay_ms"])
+        self.stdout.write("\n" + report)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(report)
+        if "lead" in scenarios and not any(row.get("upstream") for row in rows):
+            self.stderr.write(
+                "No request reached the stand-in Telegram API: set TELEGRAM_API_URL, TELEGRAM_BOT_TOKEN "
+                "and BUSINESS_LEADS_TELEGRAM_ID in the servers' .env (see --help)."
+            )
+
+    # =================================================================
+
+    def _specs(self, scenarios, marker):
+        """scenario -> (method, path, query params, form data)."""
+        specs = {}
+        if "slots" in scenarios:
+            salon = (
+                Salon.objects.filter(services__isnull=False, masters__is_active=True)
+                .exclude(category__is_pc_club=True).order_by("pk").first()
+            )
+            if salon is None:
+                raise CommandError("No salon with services and active masters; run seed_marketplace first.")
+            service = salon.services.order_by("pk").first()
+            master = salon.masters.filter(is_active=True).order_by("pk").first()
+            day = clock.current().today + timedelta(days=7)
+            specs["slots"] = (
+                "GET", reverse("marketplace:api_slots", args=[salon.pk, service.pk]),
+                {"master": str(master.pk), "date": day.isoformat()}, None,
+            )
+        if "lead" in scenarios:
+            specs["lead"] = (
+                "POST", reverse("marketplace:submit_business_lead"), None,
+                {"phone": "+998900000000", "description": marker},
+            )
+        return specs
+
+    def _row(self, name, scenario, level, latencies, errors, elapsed):
+        ms = sorted(s * 1000 for s in latencies)
+        return {
+            "deployment": name, "scenario": scenario, "concurrency": level, "requests": len(ms),
+            "rps": len(ms) / elapsed if elapsed else 0.0, "errors": errors,
+            "p50": percentile(ms, 50), "p95": percentile(ms, 95), "p99": percentile(ms, 99),
+        }
+
+    def _report(self, rows, slo_ms, upstream_delay_ms):
+        lines = [
+            "# Concurrency benchmark",
+            "",
+            f"Stand-in Telegram latency: {upstream_delay_ms} ms; capacity = highest concurrency "
+            f"with p95 <= {slo_ms:.0f} ms and no errors.",
+            "",
+            "| deployment | scenario | concurrency | requests | req/s | p50 ms | p95 ms | p99 ms | errors | upstream calls |",
+            "|---|---|---|---|---|---|---|---|---|---|",
+        ]
+        for r in rows:
+            lines.append(
+                f"| {r['deployment']} | {r['scenario']} | {r['concurrency']} | {r['requests']} | {r['rps']:.1f} | "
+                f"{r['p50']:.0f} | {r['p95']:.0f} | {r['p99']:.0f} | {r['errors']} | {r.get('upstream', '')} |"
+            )
+
+        lines += ["", "| scenario | deployment | capacity | peak req/s |", "|---|---|---|---|"]
+        groups = {}
+        for r in rows:
+            groups.setdefault((r["scenario"], r["deployment"]), []).append(r)
+        for (scenario, name), group in groups.items():
+            within = [r["concurrency"] for r in group if r["p95"] <= slo_ms and not r["errors"]]
+            capacity = max(within) if within else "below lowest level"
+            lines.append(f"| {scenario} | {name} | {capacity} | {max(r['rps'] for r in group):.1f} |")
+        return "\n".join(lines) + "\n"
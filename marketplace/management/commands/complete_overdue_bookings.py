@@ -0,0 +1,46 @@
+"""
+Complete confirmed bookings whose end time has passed, and prune old
+dashboard events (marketplace.events).
+
+Run once (e.g. from cron):
+    python manage.py complete_overdue_bookings
+
+Or as a long-running sweeper:
+    python manage.py complete_overdue_bookings --loop --interval 60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.events import prune_events
+from marketplace.utils import complete_overdue_bookings
+
+
+class Command(BaseCommand):
+    help = "Mark overdue confirmed appointments and PC bookings as completed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, sweeping every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="Seconds between sweeps in --loop mode (default: 60).",
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            updated = complete_overdue_bookings()
+            self.stdout.write(
+                f"Completed appointments: {updated['appointments']}, "
+                f"PC bookings: {updated['pc_bookings']}, "
+                f"pruned events: {prune_events()}"
+            )
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
@@ -0,0 +1,372 @@
+"""
+Load test the booking and browsing flows against a running server.
+
+A population of virtual users (threads) runs a weighted mix of scripted
+sessions for --duration seconds:
+
+    browse  salon_list, then salon_detail of a random salon
+    slots   poll api_slots for the target salon / date
+    book    api_slots, then POST booking_start for one of the free slots
+    pc      POST pc_club_book for a random hour / quantity
+    accept  the salon owner accepts a pending booking from this run
+
+Every booking targets the same salon, club and date, so requests really
+race for the same slots. Users log in through server-side sessions (no
+passwords involved); every row created carries the comment
+"loadtest:<run id>" and is deleted afterwards unless --keep; the
+loadtest_client_<n> users are kept and reused by later runs.
+
+The report gives throughput and p50/p95/p99 latency per step, plus
+correctness checks read back from the database:
+  - no two non-cancelled appointments of a master overlap
+  - concurrent PC bookings never exceed the club's total_pcs
+  - every booking the server confirmed exists, and nothing else does
+A failed check makes the command exit non-zero.
+
+Run against a local gunicorn + Postgres (same .env / database):
+    python manage.py seed_marketplace
+    gunicorn config.wsgi:application --workers 3 --worker-class gthread --threads 4 &
+    python manage.py loadtest --users 50 --duration 60
+    python manage.py loadtest --mix browse=0,book=80,accept=20 --output load.md
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from importlib import import_module
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+
+from marketplace.models import Appointment, Salon
+from pc_clubs.models import PCBooking, PCClub
+
+DEFAULT_MIX = "browse=40,slots=20,book=20,pc=15,accept=5"
+CLIENT_PREFIX = "loadtest_client_"
+AUTH_BACKEND = "django.contrib.auth.backends.ModelBackend"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}.")
+        mix[name] = int(weight or 0)
+    if not any(mix.values()):
+        raise CommandError("--mix needs at least one scenario with a positive weight.")
+    return mix
+
+
+# =====================================================================
+# VIRTUAL USER
+# =====================================================================
+
+class VirtualUser:
+    def __init__(self, run, session_key):
+        self.run = run
+        self.http = requests.Session()
+        csrf = uuid.uuid4().hex  # any 32-char secret: the cookie and header must match
+        self.http.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+        self.http.cookies.set(settings.CSRF_COOKIE_NAME, csrf)
+        self.http.headers.update({"X-CSRFToken": csrf, "Referer": run.base_url + "/"})
+
+    def request(self, step, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(
+                method, self.run.base_url + path, timeout=self.run.timeout, allow_redirects=False, **kwargs
+            )
+        except requests.RequestException:
+            self.run.record(step, time.perf_counter() - started, None)
+            return None
+        self.run.record(step, time.perf_counter() - started, response.status_code)
+        return response
+
+    # ---- scenarios --------------------------------------------------
+
+    def browse(self):
+        self.request("salon_list", "GET", reverse("marketplace:salon_list"), params={"page": random.randint(1, 3)})
+        salon_id = random.choice(self.run.salon_ids)
+        self.request("salon_detail", "GET", reverse("marketplace:salon_detail", args=[salon_id]))
+
+    def slots(self, master_id=None):
+        run = self.run
+        master_id = master_id or random.choice(run.master_ids)
+        response = self.request(
+            "api_slots", "GET", reverse("marketplace:api_slots", args=[run.salon.pk, run.service.pk]),
+            params={"master": master_id, "date": run.day.isoformat()},
+        )
+        if response is None or response.status_code != 200:
+            return []
+        return response.json().get("slots", [])
+
+    def book(self):
+        run = self.run
+        master_id = random.choice(run.master_ids)
+        free = self.slots(master_id)
+        if not free:
+            return
+        response = self.request(
+            "booking_start", "POST", reverse("marketplace:booking_start", args=[run.salon.pk, run.service.pk]),
+            data={
+                "master": master_id, "date": run.day.isoformat(), "time": random.choice(free),
+                "quantity": 1, "comment": run.marker,
+            },
+        )
+        if response is not None:
+            # 302 -> booking_success; 200 re-renders the form (slot taken).
+            run.outcome("appointment", response.status_code == 302)
+
+    def pc(self):
+        run = self.run
+        response = self.request(
+            "pc_club_book", "POST", reverse("pc_clubs:book", args=[run.club.pk]),
+            data={
+                "plan_id": random.choice(run.plan_ids), "quantity": random.randint(1, 4),
+                "hours": random.randint(1, 3), "date": run.day.isoformat(),
+                "time": f"{random.randint(10, 20):02d}:00", "comment": run.marker,
+            },
+        )
+        if response is not None and response.status_code in (200, 400):
+            run.outcome("pc_booking", response.status_code == 200)
+
+    def accept(self):
+        run = self.run
+        pending = list(
+            Appointment.objects.filter(comment=run.marker, status="pending").values_list("pk", flat=True)[:20]
+        )
+        if pending:
+            owner = run.owner_user
+            owner.request("accept_booking", "POST", reverse("marketplace:accept_booking", args=[random.choice(pending)]))
+
+
+SCENARIOS = {
+    "browse": VirtualUser.browse,
+    "slots": VirtualUser.slots,
+    "book": VirtualUser.book,
+    "pc": VirtualUser.pc,
+    "accept": VirtualUser.accept,
+}
+
+
+# =====================================================================
+# RUN
+# =====================================================================
+
+class LoadRun:
+    def __init__(self, base_url, timeout, salon, club, day):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.salon = salon
+        self.service = salon.services.order_by("duration_minutes").first()
+        self.master_ids = list(salon.masters.filter(is_active=True).values_list("pk", flat=True))
+        self.salon_ids = list(Salon.objects.values_list("pk", flat=True)[:200])
+        self.club = club
+        self.plan_ids = list(club.plans.filter(is_active=True).values_list("pk", flat=True))
+        self.day = day
+        self.marker = f"loadtest:{uuid.uuid4().hex[:12]}"
+        self.owner_user = None
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)      # step -> [seconds]
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.confirmed = defaultdict(int)     # kind -> bookings the server accepted
+        self.rejected = defaultdict(int)
+
+    def record(self, step, seconds, status):
+        with self._lock:
+            self.samples[step].append(seconds)
+            self.statuses[step][status or "timeout"] += 1
+
+    def outcome(self, kind, ok):
+        with self._lock:
+            (self.confirmed if ok else self.rejected)[kind] += 1
+
+
+def login_session(user):
+    """Session key of a fresh server-side session logged in as `user`."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = AUTH_BACKEND
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return store.session_key
+
+
+class Command(BaseCommand):
+    help = "Load test browsing and booking flows against a running server; report latency and correctness."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server under test.")
+        parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users (default: 20).")
+        parser.add_argument("--duration", type=int, default=30, help="Seconds to run (default: 30).")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX}).")
+        parser.add_argument("--salon", type=int, help="Salon to book (default: the one with most active masters).")
+        parser.add_argument("--club", type=int, help="PC club to book (default: the largest).")
+        parser.add_argument("--days-ahead", type=int, default=7, help="Book this many days from today (default: 7).")
+        parser.add_argument("--timeout", type=float, default=10, help="Per-request timeout in seconds.")
+        parser.add_argument("--keep", action="store_true", help="Keep the bookings created by the run.")
+        parser.add_argument("--output", help="Also write the report to this file.")
+
+    def handle(self, *args, **opts):
+        mix = parse_mix(opts["mix"])
+        salon, club = self._targets(opts["salon"], opts["club"])
+        day = timezone.localdate() + timedelta(days=opts["days_ahead"])
+        run = LoadRun(opts["base_url"], opts["timeout"], salon, club, day)
+        if not run.service or not run.master_ids or not run.plan_ids:
+            raise CommandError("Target salon needs services and active masters, the club active plans.")
+
+        try:
+            requests.get(run.base_url + reverse("marketplace:home"), timeout=run.timeout)
+        except requests.RequestException as exc:
+            raise CommandError(f"Server not reachable at {run.base_url}: {exc}")
+
+        sessions = []
+        for i in range(opts["users"]):
+            user, _ = get_user_model().objects.get_or_create(
+                username=f"{CLIENT_PREFIX}{i}", defaults={"email": f"{CLIENT_PREFIX}{i}@example.com"}
+            )
+            sessions.append(login_session(user))
+        sessions.append(login_session(salon.owner))
+        users = [VirtualUser(run, key) for key in sessions[:-1]]
+        run.owner_user = VirtualUser(run, sessions[-1])
+
+        self.stdout.write(
+            f"{run.marker}: {len(users)} users for {opts['duration']}s against {run.base_url}\n"
+            f"  salon #{salon.pk} ({len(run.master_ids)} masters), club #{club.pk} "
+            f"({club.total_pcs} PCs), date {day}"
+        )
+        started = time.perf_counter()
+        deadline = started + opts["duration"]
+        names, weights = zip(*mix.items())
+
+        def work(user):
+            try:
+                while time.perf_counter() < deadline:
+                    SCENARIOS[random.choices(names, weights)[0]](user)
+            finally:
+                connection.close()  # the thread's own DB connection (accept scenario)
+
+        threads = [threading.Thread(target=work, args=(user,), daemon=True) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            checks = self._checks(run)
+            report = self._report(run, elapsed, checks)
+        finally:
+            if not opts["keep"]:
+                Appointment.objects.filter(comment=run.marker).delete()
+                PCBooking.objects.filter(comment=run.marker).delete()
+            import_module(settings.SESSION_ENGINE).SessionStore.get_model_class().objects.filter(
+                session_key__in=sessions
+            ).delete()
+            connections.close_all()
+
+        self.stdout.write(report)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(report)
+        failed = [name for name, ok, _ in checks if not ok]
+        if failed:
+            raise CommandError(f"Correctness checks failed: {', '.join(failed)}")
+
+    # =================================================================
+
+    def _targets(self, salon_id, club_id):
+        salons = Salon.objects.filter(services__isnull=False).exclude(category__is_pc_club=True)
+        if salon_id:
+            salons = salons.filter(pk=salon_id)
+        salon = (
+            salons.annotate(n=Count("masters", distinct=True)).order_by("-n", "pk").select_related("owner").first()
+        )
+        clubs = PCClub.objects.filter(plans__is_active=True)
+        if club_id:
+            clubs = clubs.filter(pk=club_id)
+        club = clubs.order_by("-total_pcs", "pk").first()
+        if salon is None or club is None:
+            raise CommandError("No salon with services or PC club with active plans; run seed_marketplace first.")
+        return salon, club
+
+    def _checks(self, run):
+        """[(name, ok, detail)] read back from the database."""
+        checks = []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT count(*) FROM marketplace_appointment a
+                JOIN marketplace_appointment b
+                  ON a.master_id = b.master_id AND a.id < b.id
+                 AND a.start_time < b.end_time AND b.start_time < a.end_time
+                WHERE a.salon_id = %s AND a.status <> 'cancelled' AND b.status <> 'cancelled'
+                """,
+                [run.salon.pk],
+            )
+            overlaps = cursor.fetchone()[0]
+        checks.append(("no double-booked master", overlaps == 0, f"{overlaps} overlapping pairs"))
+
+        day_start = timezone.make_aware(datetime.combine(run.day, datetime.min.time()))
+        bookings = PCBooking.objects.filter(
+            pc_club=run.club, start_time__lt=day_start + timedelta(days=2),
+            end_time__gt=day_start - timedelta(days=1),
+        ).exclude(status="cancelled").values_list("start_time", "end_time", "quantity")
+        events = sorted([(s, q) for s, _, q in bookings] + [(e, -q) for _, e, q in bookings],
+                        key=lambda ev: (ev[0], ev[1]))
+        in_use = peak = 0
+        for _, delta in events:
+            in_use += delta
+            peak = max(peak, in_use)
+        checks.append(("PC capacity respected", peak <= run.club.total_pcs, f"peak {peak} / {run.club.total_pcs} PCs"))
+
+        for kind, model in (("appointment", Appointment), ("pc_booking", PCBooking)):
+            stored = model.objects.filter(comment=run.marker).count()
+            confirmed = run.confirmed[kind]
+            checks.append((
+                f"{kind} writes match responses", stored == confirmed,
+                f"{confirmed} confirmed, {stored} stored, {run.rejected[kind]} rejected",
+            ))
+        return checks
+
+    def _report(self, run, elapsed, checks):
+        lines = [
+            f"# Load test {run.marker}",
+            "",
+            f"{elapsed:.1f}s, {sum(len(v) for v in run.samples.values()) / elapsed:.1f} req/s, "
+            f"{sum(run.confirmed.values()) / elapsed:.2f} bookings/s",
+            "",
+            "| step | requests | req/s | p50 ms | p95 ms | p99 ms | max ms | errors | statuses |",
+            "|---|---|---|---|---|---|---|---|---|",
+        ]
+        for step in sorted(run.samples):
+            ms = sorted(s * 1000 for s in run.samples[step])
+            statuses = run.statuses[step]
+            errors = sum(n for status, n in statuses.items() if status == "timeout" or status >= 500)
+            lines.append(
+                f"| {step} | {len(ms)} | {len(ms) / elapsed:.1f} | {percentile(ms, 50):.0f} | "
+                f"{percentile(ms, 95):.0f} | {percentile(ms, 99):.0f} | {ms[-1]:.0f} | {errors} | "
+                + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items(), key=str)) + " |"
+            )
+        lines += ["", "| check | result | detail |", "|---|---|---|"]
+        lines += [f"| {name} | {'PASS' if ok else 'FAIL'} | {detail} |" for name, ok, detail in checks]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,55 @@
+"""
+Render responsive WebP/AVIF variants for freshly uploaded images.
+
+Run once (e.g. from cron every minute):
+    python manage.py process_images
+
+Or as a long-running worker:
+    python manage.py process_images --loop --interval 5
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.images import output_formats, process_pending_images
+
+
+class Command(BaseCommand):
+    help = "Render image variants for rows flagged images_pending."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, polling every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=5,
+            help="Seconds between polls in --loop mode (default: 5).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Max rows per model per batch (default: 20).",
+        )
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"Formats: {', '.join(output_formats())}")
+        while True:
+            self._run_once(opts["batch_size"])
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+
+    def _run_once(self, batch_size):
+        processed = 0
+        while True:
+            batch = process_pending_images(limit=batch_size)
+            processed += batch
+            if batch < batch_size:
+                break
+        self.stdout.write(f"Images processed: {processed}")
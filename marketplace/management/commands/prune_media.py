@@ -0,0 +1,88 @@
+"""
+Delete media files no row refers to any more.
+
+ContentAddressedStorage never deletes on its own (one file can back many
+rows), so run this nightly (the "nightly" compose service does):
+    python manage.py prune_media
+    python manage.py prune_media --dry-run
+"""
+
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from marketplace.images import ProcessedImagesMixin, variant_files
+
+
+def referenced_names():
+    names = set()
+    for model in apps.get_models():
+        fields = [f.name for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+        if fields:
+            for row in model.objects.values_list(*fields).iterator(chunk_size=2000):
+                names.update(name for name in row if name)
+        if issubclass(model, ProcessedImagesMixin):
+            for variants in model.objects.values_list("image_variants", flat=True).iterator(chunk_size=2000):
+                for entry in (variants or {}).values():
+                    names.update(variant_files(entry))
+    return names
+
+
+class Command(BaseCommand):
+    help = "Remove files under MEDIA_ROOT that no FileField or image variant references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=24,
+            help="Keep files younger than this many hours: they may belong to an upload in flight (default: 24).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **opts):
+        keep = referenced_names()
+        cutoff = time.time() - opts["min_age"] * 3600
+        root = default_storage.location
+        purge = getattr(default_storage, "purge", default_storage.delete)
+
+        candidates = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name not in keep and not self._recent(path, cutoff):
+                    candidates.append((name, path))
+
+        # The walk can take a while: drop files that rows started to use
+        # meanwhile, and (just before each purge) files re-uploaded since,
+        # which ContentAddressedStorage touches on a dedup hit.
+        if candidates:
+            keep = referenced_names()
+        removed = freed = 0
+        for name, path in candidates:
+            if name in keep or self._recent(path, cutoff):
+                continue
+            removed += 1
+            freed += os.path.getsize(path)
+            if not opts["dry_run"]:
+                purge(name)
+
+        verb = "Would remove" if opts["dry_run"] else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} files ({freed / 1024 / 1024:.1f} MB); {len(keep)} referenced"
+        ))
+
+    def _recent(self, path, cutoff):
+        try:
+            return os.path.getmtime(path) > cutoff
+        except FileNotFoundError:
+            return True  # gone already; nothing to do
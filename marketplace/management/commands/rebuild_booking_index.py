@@ -0,0 +1,24 @@
+"""
+Rebuild the BookingIndex read model from the booking tables.
+
+Once after deploying the BookingIndex migration, then nightly (cron) to
+repair drift from writes that bypass signals (raw SQL, admin bulk
+actions):
+    python manage.py rebuild_booking_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from marketplace.booking_index import prune_orphans, sync_bookings
+
+
+class Command(BaseCommand):
+    help = "Upsert BookingIndex rows for every Appointment / PCBooking and drop orphans."
+
+    def handle(self, *args, **opts):
+        appointments = sync_bookings("appointment")
+        pc_bookings = sync_bookings("pc_booking")
+        orphans = prune_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {appointments} appointments, {pc_bookings} PC bookings; removed {orphans} orphans"
+        ))
@@ -0,0 +1,59 @@
+"""
+Recompute analytics rollups from the BookingIndex read model.
+
+Nightly (cron), re-derives recent days to repair any drift:
+    python manage.py rebuild_booking_rollups --days 7
+
+Full backfill:
+    python manage.py rebuild_booking_rollups --all
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from marketplace.analytics import rebuild_rollups
+from marketplace.models import BookingIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyBookingRollup rows for a range of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Rebuild this many days back from today, plus future bookings (default: 7).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild the whole booking history.",
+        )
+
+    def handle(self, *args, **opts):
+        today = timezone.localdate()
+        start_day = today - timedelta(days=opts["days"])
+        end_day = today + timedelta(days=1)
+
+        # Bookings can be made far ahead (and --all reaches back to the first one).
+        bounds = BookingIndex.objects.aggregate(first=Min("start_time"), last=Max("start_time"))
+        if bounds["last"]:
+            end_day = max(end_day, timezone.localtime(bounds["last"]).date() + timedelta(days=1))
+        if opts["all"] and bounds["first"]:
+            start_day = min(start_day, timezone.localtime(bounds["first"]).date())
+
+        # One day at a time keeps each transaction (and the rollup lock) short.
+        written = 0
+        day = start_day
+        while day < end_day:
+            for venue_type in ("salon", "pc_club"):
+                written += rebuild_rollups(venue_type, day, day + timedelta(days=1))
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups {start_day} … {end_day - timedelta(days=1)}: {written} rows"
+        ))
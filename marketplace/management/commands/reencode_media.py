@@ -0,0 +1,106 @@
+"""
+Re-encode every uploaded image into normalized WebP (and AVIF) variants.
+
+Rows whose variants are already current are skipped, so an interrupted
+run picks up where it stopped. Work is spread over a process pool, one
+row per task:
+    python manage.py reencode_media
+    python manage.py reencode_media --workers 4 --model marketplace.SalonPhoto
+    python manage.py reencode_media --force          # re-render everything
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from marketplace.images import image_models, init_worker, needs_render, output_formats, reencode
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = "Render image variants for all existing uploads using a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            default=[],
+            help="Only this model (app_label.Model); may be repeated.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render rows whose variants are already current.",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=100,
+            help="Print progress every N rows (default: 100).",
+        )
+
+    def _jobs(self, models, force):
+        for model in models:
+            has_file = Q()
+            for name in model.IMAGE_FIELDS:
+                has_file |= Q(**{f"{name}__gt": ""})
+            rows = model.objects.filter(has_file).only("pk", "image_variants", *model.IMAGE_FIELDS)
+            for obj in rows.order_by("pk").iterator(chunk_size=500):
+                if needs_render(obj, force):
+                    yield model._meta.label, obj.pk
+
+    def handle(self, *args, **opts):
+        models = image_models()
+        if opts["model"]:
+            wanted = {label.lower() for label in opts["model"]}
+            models = [m for m in models if m._meta.label_lower in wanted]
+            if not models:
+                raise CommandError(f"No image models match {', '.join(opts['model'])}")
+
+        jobs = list(self._jobs(models, opts["force"]))
+        self.stdout.write(
+            f"{len(jobs)} rows to re-encode ({', '.join(output_formats())}) "
+            f"with {opts['workers']} workers"
+        )
+        if not jobs:
+            return
+
+        # Children must open their own database connections.
+        connections.close_all()
+
+        done = failed = original = rendered = 0
+        with ProcessPoolExecutor(max_workers=opts["workers"], initializer=init_worker) as pool:
+            futures = {pool.submit(reencode, label, pk, opts["force"]): (label, pk) for label, pk in jobs}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    failed += 1
+                    label, pk = futures[future]
+                    self.stderr.write(f"{label} #{pk}: {exc}")
+                else:
+                    if result:
+                        original += result[0]
+                        rendered += result[1]
+                done += 1
+                if done % opts["progress_every"] == 0 or done == len(jobs):
+                    self.stdout.write(
+                        f"[{done}/{len(jobs)}] originals {_mb(original)} → largest WebP {_mb(rendered)}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-encoded {done - failed} rows, {failed} failed; bytes saved {_mb(original - rendered)} "
+            f"({_mb(original)} originals → {_mb(rendered)} largest WebP variants)"
+        ))
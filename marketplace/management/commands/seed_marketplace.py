@@ -358,11 +358,15 @@ class Command(BaseCommand):
                 leaf_categories.append(child)
                 self.stdout.write(f"    {child.name_ru}")
 
-        # Create salons for subcategories
+        # Create salons for subcategories. Every third one has no cover, so
+        # cards also fall back to the first photo.
+        made = 0
         for cat in leaf_categories:
             for _ in range(salons_per_sub):
                 salon_name = f"{fake.company()} ({cat.name_ru})"
                 h = abs(hash(salon_name))
+                no_cover = made % 3 == 0
+                made += 1
                 salon = Salon.objects.create(
                     owner=owner,
                     category=cat,
@@ -371,7 +375,7 @@ class Command(BaseCommand):
                     phone=self._random_phone(fake),
                     qr_token=generate_qr_token(),
                     logo_url=f"https://picsum.photos/seed/{h % 500}/200/200",
-                    cover_url=f"https://picsum.photos/seed/{(h + 500) % 1000}/1200/450",
+                    cover_url="" if no_cover else f"https://picsum.photos/seed/{(h + 500) % 1000}/1200/450",
                 )
                 self._seed_salon_photos(salon_name, salon)
 
@@ -656,17 +660,20 @@ class Command(BaseCommand):
             return
         for _ in range(5):
             try:
-                Appointment.objects.create(
-                    client=random.choice(clients),
-                    salon=salon,
-                    master=random.choice(masters),
-                    service=random.choice(services),
-                    start_time=timezone.now() + timedelta(
-                        days=random.randint(1, 5),
-                        hours=random.randint(1, 8),
-                    ),
-                    status="confirmed",
-                )
+                # Savepoint: a random slot may collide with the overlap
+                # constraint, which would otherwise abort the whole seed.
+                with transaction.atomic():
+                    Appointment.objects.create(
+                        client=random.choice(clients),
+                        salon=salon,
+                        master=random.choice(masters),
+                        service=random.choice(services),
+                        start_time=timezone.now() + timedelta(
+                            days=random.randint(1, 5),
+                            hours=random.randint(1, 8),
+                        ),
+                        status="confirmed",
+                    )
             except Exception:
                 continue
 
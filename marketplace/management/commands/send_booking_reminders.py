@@ -0,0 +1,55 @@
+"""
+Queue and send reminders for upcoming bookings (24h and 1h before start).
+
+Run once (e.g. from cron every few minutes):
+    python manage.py send_booking_reminders
+
+Or as a long-running worker:
+    python manage.py send_booking_reminders --loop --interval 60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.reminders import deliver_queued_reminders, queue_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Queue due booking reminders and deliver them via Telegram/SMS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, scanning every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="Seconds between scans in --loop mode (default: 60).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Max reminders delivered per batch (default: 500).",
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            self._run_once(opts["batch_size"])
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+
+    def _run_once(self, batch_size):
+        queued = queue_due_reminders()
+        processed = 0
+        while True:
+            batch = deliver_queued_reminders(limit=batch_size)
+            processed += batch
+            if batch < batch_size:
+                break
+        self.stdout.write(f"Reminders queued: {queued}, processed: {processed}")
@@ -0,0 +1,54 @@
+"""
+Fold new booking events into the analytics rollups.
+
+Run once (e.g. from cron every minute):
+    python manage.py update_booking_rollups
+
+Or as a long-running worker:
+    python manage.py update_booking_rollups --loop --interval 30
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.analytics import apply_booking_events
+
+
+class Command(BaseCommand):
+    help = "Recompute analytics rollups for the venue-days touched by recent booking events."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, polling every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=30,
+            help="Seconds between polls in --loop mode (default: 30).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Max events folded per batch (default: 500).",
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            self._run_once(opts["batch_size"])
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+
+    def _run_once(self, batch_size):
+        processed = 0
+        while True:
+            batch = apply_booking_events(limit=batch_size)
+            processed += batch
+            if batch < batch_size:
+                break
+        self.stdout.write(f"Booking events rolled up: {processed}")
@@ -0,0 +1,33 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import clock
+
+
+class TimeContextMiddleware:
+    """
+    One clock.TimeContext per request: a single "now", the current tz and
+    cached day bounds for every view and helper that asks clock.current().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = clock.activate()
+        try:
+            return self.get_response(request)
+        finally:
+            clock.deactivate(token)
+
+    async def __acall__(self, request):
+        token = clock.activate()
+        try:
+            return await self.get_response(request)
+        finally:
+            clock.deactivate(token)
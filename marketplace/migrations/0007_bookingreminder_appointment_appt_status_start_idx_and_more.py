@@ -0,0 +1,54 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pc_clubs', '0004_pcbooking_pcbooking_status_start_idx'),
+        ('marketplace', '0006_salon_cover_salon_cover_url_salonphoto_photo_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('24h', 'За 24 часа'), ('1h', 'За 1 час')], max_length=8, verbose_name='Тип')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Поставлено в очередь')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Напоминание',
+                'verbose_name_plural': 'Напоминания',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'start_time'], name='appt_status_start_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookingreminder',
+            name='appointment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='marketplace.appointment', verbose_name='Запись'),
+        ),
+        migrations.AddField(
+            model_name='bookingreminder',
+            name='pc_booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='pc_clubs.pcbooking', verbose_name='PC бронь'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingreminder',
+            index=models.Index(fields=['sent_at', 'created_at'], name='reminder_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingreminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'kind'), name='uniq_reminder_appointment_kind'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingreminder',
+            constraint=models.UniqueConstraint(fields=('pc_booking', 'kind'), name='uniq_reminder_pc_booking_kind'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:23
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+import marketplace.models
+
+
+def cancel_overlaps(apps, schema_editor):
+    """
+    The old check-then-insert could let two live bookings of one master
+    overlap, which would make AddConstraint fail. Per master the earliest
+    booking (lowest id) wins; later ones overlapping a kept booking are
+    cancelled and listed.
+    """
+    Appointment = apps.get_model("marketplace", "Appointment")
+    rows = (
+        Appointment.objects
+        .filter(master__isnull=False, end_time__isnull=False)
+        .exclude(status="cancelled")
+        .order_by("master_id", "pk")
+        .values_list("pk", "master_id", "start_time", "end_time")
+    )
+    kept = {}  # master_id -> [(start, end)]
+    losers = []
+    for pk, master_id, start, end in rows.iterator(chunk_size=2000):
+        if start >= end:
+            continue  # an empty range overlaps nothing
+        ranges = kept.setdefault(master_id, [])
+        if any(start < other_end and other_start < end for other_start, other_end in ranges):
+            losers.append(pk)
+        else:
+            ranges.append((start, end))
+    if losers:
+        Appointment.objects.filter(pk__in=losers).update(status="cancelled")
+        print(f"\n  Cancelled {len(losers)} overlapping appointments: {', '.join(map(str, losers))}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0007_bookingreminder_appointment_appt_status_start_idx_and_more'),
+    ]
+
+    operations = [
+        # `master_id WITH =` inside a GiST index needs btree_gist.
+        BtreeGistExtension(),
+        migrations.RunPython(cancel_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('end_time__isnull', False), ('master__isnull', False), models.Q(('status', 'cancelled'), _negated=True)), expressions=[('master', '='), (marketplace.models.TsTzRange('start_time', 'end_time', models.Value('[)')), '&&')], name='appointment_master_no_overlap', violation_error_message='This time is already booked for the selected master.'),
+        ),
+    ]
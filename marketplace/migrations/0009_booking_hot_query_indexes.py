@@ -0,0 +1,25 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_appointment_master_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'confirmed', 'completed'])), fields=['master', 'start_time', 'end_time'], name='appt_master_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['salon', 'status', 'start_time'], name='appt_salon_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', '-start_time'], name='appt_client_start_idx'),
+        ),
+    ]
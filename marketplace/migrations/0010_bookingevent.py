@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pc_clubs', '0005_booking_hot_query_indexes'),
+        ('marketplace', '0009_booking_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('appointment', 'Запись'), ('pc_booking', 'PC бронь')], max_length=16, verbose_name='Тип')),
+                ('booking_id', models.PositiveBigIntegerField(verbose_name='ID брони')),
+                ('status', models.CharField(max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создано')),
+                ('master', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.master', verbose_name='Мастер')),
+                ('pc_club', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pc_clubs.pcclub', verbose_name='PC Club')),
+                ('salon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.salon', verbose_name='Салон')),
+            ],
+            options={
+                'verbose_name': 'Событие брони',
+                'verbose_name_plural': 'События броней',
+            },
+        ),
+    ]
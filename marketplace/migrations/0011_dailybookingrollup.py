@@ -0,0 +1,52 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_bookingevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('venue_type', models.CharField(choices=[('salon', 'Салон'), ('pc_club', 'PC клуб')], max_length=16, verbose_name='Тип заведения')),
+                ('venue_id', models.PositiveBigIntegerField(verbose_name='ID заведения')),
+                ('day', models.DateField(verbose_name='День')),
+                ('item_id', models.PositiveBigIntegerField(default=0, verbose_name='ID услуги/тарифа')),
+                ('item_name', models.CharField(blank=True, max_length=200, verbose_name='Услуга/тариф')),
+                ('bookings', models.PositiveIntegerField(default=0, verbose_name='Всего броней')),
+                ('pending', models.PositiveIntegerField(default=0, verbose_name='Ожидают')),
+                ('confirmed', models.PositiveIntegerField(default=0, verbose_name='Подтверждены')),
+                ('completed', models.PositiveIntegerField(default=0, verbose_name='Завершены')),
+                ('cancelled', models.PositiveIntegerField(default=0, verbose_name='Отменены')),
+                ('hours', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Часы')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка броней',
+                'verbose_name_plural': 'Дневные сводки броней',
+            },
+        ),
+        migrations.AddField(
+            model_name='bookingevent',
+            name='rolled_up',
+            field=models.BooleanField(default=False, verbose_name='Учтено в сводке'),
+        ),
+        migrations.AddIndex(
+            model_name='bookingevent',
+            index=models.Index(condition=models.Q(('rolled_up', False)), fields=['id'], name='bookingevent_rollup_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailybookingrollup',
+            index=models.Index(fields=['venue_type', 'venue_id', 'day'], name='rollup_venue_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailybookingrollup',
+            constraint=models.UniqueConstraint(fields=('venue_type', 'venue_id', 'day', 'item_id'), name='uniq_rollup_venue_day_item'),
+        ),
+    ]
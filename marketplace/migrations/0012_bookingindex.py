@@ -0,0 +1,50 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('marketplace', '0011_dailybookingrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('appointment', 'Запись'), ('pc_booking', 'PC бронь')], max_length=16, verbose_name='Тип')),
+                ('booking_id', models.PositiveBigIntegerField(verbose_name='ID брони')),
+                ('venue_type', models.CharField(choices=[('salon', 'Салон'), ('pc_club', 'PC клуб')], max_length=16, verbose_name='Тип заведения')),
+                ('venue_id', models.PositiveBigIntegerField(verbose_name='ID заведения')),
+                ('venue_name', models.CharField(blank=True, max_length=200, verbose_name='Заведение')),
+                ('resource_id', models.PositiveBigIntegerField(default=0, verbose_name='ID мастера/тарифа')),
+                ('resource_name', models.CharField(blank=True, max_length=200, verbose_name='Мастер/тариф')),
+                ('item_id', models.PositiveBigIntegerField(default=0, verbose_name='ID услуги/тарифа')),
+                ('item_name', models.CharField(blank=True, max_length=200, verbose_name='Услуга/тариф (RU)')),
+                ('item_name_en', models.CharField(blank=True, max_length=200, verbose_name='Услуга/тариф (EN)')),
+                ('item_name_uz', models.CharField(blank=True, max_length=200, verbose_name='Услуга/тариф (UZ)')),
+                ('start_time', models.DateTimeField(verbose_name='Начало')),
+                ('end_time', models.DateTimeField(blank=True, null=True, verbose_name='Конец')),
+                ('status', models.CharField(max_length=20, verbose_name='Статус')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Количество')),
+                ('hours', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Часы')),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('created_at', models.DateTimeField(verbose_name='Создано')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+            ],
+            options={
+                'verbose_name': 'Бронь (сводный индекс)',
+                'verbose_name_plural': 'Брони (сводный индекс)',
+                'indexes': [models.Index(fields=['client', '-start_time', '-id'], name='bookingindex_client_idx'), models.Index(fields=['venue_type', 'venue_id', 'start_time'], name='bookingindex_venue_idx'), models.Index(fields=['status', 'start_time'], name='bookingindex_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookingindex',
+            constraint=models.UniqueConstraint(fields=('kind', 'booking_id'), name='uniq_bookingindex_kind_booking'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:40
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def queue_existing_images(apps, schema_editor):
+    # Let the image worker render variants for files uploaded before the pipeline.
+    apps.get_model("marketplace", "Salon").objects.filter(
+        ~Q(logo="") | ~Q(cover="")
+    ).update(images_pending=True)
+    apps.get_model("marketplace", "SalonPhoto").objects.filter(
+        ~Q(image="")
+    ).update(images_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0012_bookingindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображений'),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='images_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображения в обработке'),
+        ),
+        migrations.AddField(
+            model_name='salonphoto',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображений'),
+        ),
+        migrations.AddField(
+            model_name='salonphoto',
+            name='images_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображения в обработке'),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='master',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображений'),
+        ),
+        migrations.AddField(
+            model_name='master',
+            name='images_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображения в обработке'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображений'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='images_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображения в обработке'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.26 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0014_service_master_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingreminder',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки'),
+        ),
+        migrations.AddField(
+            model_name='bookingreminder',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка'),
+        ),
+    ]
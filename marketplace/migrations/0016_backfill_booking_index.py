@@ -0,0 +1,55 @@
+# Backfill BookingIndex for bookings created before 0012. Rows the
+# post_save receivers have written since are left alone.
+
+from django.db import migrations
+
+BACKFILL_APPOINTMENTS = """
+INSERT INTO marketplace_bookingindex (
+    kind, booking_id, client_id, venue_type, venue_id, venue_name,
+    resource_id, resource_name, item_id, item_name, item_name_en, item_name_uz,
+    start_time, end_time, status, quantity, hours, price, created_at
+)
+SELECT
+    'appointment', a.id, a.client_id, 'salon', a.salon_id, s.name,
+    COALESCE(a.master_id, 0), COALESCE(m.name, ''),
+    COALESCE(a.service_id, 0), COALESCE(sv.name_ru, ''), COALESCE(sv.name_en, ''), COALESCE(sv.name_uz, ''),
+    a.start_time, a.end_time, a.status, a.quantity,
+    ROUND(a.quantity * COALESCE(sv.duration_minutes, a.hours * 60) / 60.0, 2),
+    a.quantity * COALESCE(sv.price, 0), a.created_at
+FROM marketplace_appointment a
+JOIN marketplace_salon s ON s.id = a.salon_id
+LEFT JOIN marketplace_master m ON m.id = a.master_id
+LEFT JOIN marketplace_service sv ON sv.id = a.service_id
+ON CONFLICT (kind, booking_id) DO NOTHING
+"""
+
+BACKFILL_PC_BOOKINGS = """
+INSERT INTO marketplace_bookingindex (
+    kind, booking_id, client_id, venue_type, venue_id, venue_name,
+    resource_id, resource_name, item_id, item_name, item_name_en, item_name_uz,
+    start_time, end_time, status, quantity, hours, price, created_at
+)
+SELECT
+    'pc_booking', b.id, b.client_id, 'pc_club', b.pc_club_id, c.name,
+    COALESCE(b.plan_id, 0), COALESCE(p.name, ''),
+    COALESCE(b.plan_id, 0), COALESCE(p.name, ''), COALESCE(p.name_en, ''), COALESCE(p.name_uz, ''),
+    b.start_time, b.end_time, b.status, b.quantity,
+    b.quantity * b.hours, COALESCE(b.quantity * b.hours * p.price_per_hour, 0), b.created_at
+FROM pc_clubs_pcbooking b
+JOIN pc_clubs_pcclub c ON c.id = b.pc_club_id
+LEFT JOIN pc_clubs_pcplan p ON p.id = b.plan_id
+ON CONFLICT (kind, booking_id) DO NOTHING
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0015_reminder_attempts'),
+        ('pc_clubs', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunSQL(BACKFILL_APPOINTMENTS, migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_PC_BOOKINGS, migrations.RunSQL.noop),
+    ]
@@ -1,8 +1,9 @@
-import os
-import uuid
 from datetime import timedelta
-from django.db import models
+from django.db import connection, models
+from django.db.models import Func, Q
 from django.conf import settings
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -10,63 +11,37 @@ from django.utils.translation import get_language
 from django.core.validators import MinValueValidator
 from mptt.models import MPTTModel, TreeForeignKey
 
+from .i18n import accessor
+from .images import ProcessedImagesMixin, upload_path
+
 
 def salon_logo_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"salon_logos/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
+    return upload_path("salon_logos", filename)
 
 
 def salon_cover_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"salon_covers/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
+    return upload_path("salon_covers", filename)
 
 
 def salon_gallery_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"salon_photos/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
-
+    return upload_path("salon_photos", filename)
 
-def _process_image_to_webp(image_field, max_size=400):
-    """Resize uploaded image and convert to WebP. Returns a ContentFile."""
-    from io import BytesIO
-    from django.core.files.base import ContentFile
-    from PIL import Image
 
-    img = Image.open(image_field)
-    img = img.convert("RGB")
-    img.thumbnail((max_size, max_size), Image.LANCZOS)
-    buf = BytesIO()
-    img.save(buf, format="WEBP", quality=85, method=6)
-    buf.seek(0)
-    base = os.path.splitext(os.path.basename(getattr(image_field, "name", "img") or "img"))[0]
-    return ContentFile(buf.read(), name=f"{base}.webp")
+def service_img_upload_to(instance, filename):  # noqa: ARG001
+    return upload_path("services", filename)
 
 
-def _is_new_upload(field):
-    """Return True when field holds a freshly uploaded file (not a saved FieldFile)."""
-    try:
-        from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-        return isinstance(field.file, (InMemoryUploadedFile, TemporaryUploadedFile))
-    except Exception:
-        return False
+def master_photo_upload_to(instance, filename):  # noqa: ARG001
+    return upload_path("masters", filename)
 
 
-def service_img_upload_to(instance, filename):
-    ext = os.path.splitext(filename)[1].lower()
-    if not ext:
-        ext = ".jpg"
-    now = timezone.localtime()
-    unique = uuid.uuid4().hex[:8]
-    return f"services/{now:%Y/%m/%d}/{unique}{ext}"
+class TsTzRange(Func):
+    """tstzrange(start, end, '[)') — used by the appointment exclusion constraint."""
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
 
 
-def master_photo_upload_to(instance, filename):
-    ext = os.path.splitext(filename)[1].lower()
-    if not ext:
-        ext = ".jpg"
-    now = timezone.localtime()
-    unique = uuid.uuid4().hex[:8]
-    return f"masters/{now:%Y/%m/%d}/{unique}{ext}"
+SLOT_TAKEN_CONSTRAINT = "appointment_master_no_overlap"
 
 
 class MultilingualMixin(models.Model):
@@ -77,18 +52,14 @@ class MultilingualMixin(models.Model):
         """
         field_base example: "name" or "description"
         expects: field_base_ru, field_base_en, field_base_uz
+        Falls back to default_lang, then LANGUAGE_CODE, then the bare field
+        (see marketplace.i18n).
         """
         lang_code = (lang_code or default_lang).lower()
-        candidates = [
-            f"{field_base}_{lang_code}",
-            f"{field_base}_{default_lang}",
-        ]
-        for f in candidates:
-            if hasattr(self, f):
-                val = getattr(self, f)
-                if val:
-                    return val
-        return ""
+        val = accessor(type(self), field_base, lang_code)(self)
+        if not val and default_lang != lang_code:
+            val = accessor(type(self), field_base, default_lang)(self)
+        return val
 
 
 class Category(MultilingualMixin, MPTTModel):
@@ -131,7 +102,10 @@ class Category(MultilingualMixin, MPTTModel):
         return localized_name or self.name_ru or "Unnamed Category"
 
 
-class Salon(MultilingualMixin, models.Model):
+class Salon(ProcessedImagesMixin, MultilingualMixin, models.Model):
+    IMAGE_FIELDS = {"logo": ("thumb", "card"), "cover": ("card", "full")}
+    IMAGE_URL_FIELDS = {"logo": "logo_url", "cover": "cover_url"}
+
     name = models.CharField(max_length=200)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='salons', verbose_name="Владелец")
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='salons', verbose_name="Категория")
@@ -162,16 +136,6 @@ class Salon(MultilingualMixin, models.Model):
         if not self.qr_token:
             import secrets
             self.qr_token = secrets.token_urlsafe(16).replace("-", "").replace("_", "")[:24]
-        if self.logo and _is_new_upload(self.logo):
-            try:
-                self.logo = _process_image_to_webp(self.logo, max_size=400)
-            except Exception:
-                pass
-        if self.cover and _is_new_upload(self.cover):
-            try:
-                self.cover = _process_image_to_webp(self.cover, max_size=1200)
-            except Exception:
-                pass
         super().save(*args, **kwargs)
 
 
@@ -208,7 +172,10 @@ class Address(models.Model):
         return f"Location for {self.salon.name}"
 
 
-class SalonPhoto(models.Model):
+class SalonPhoto(ProcessedImagesMixin, models.Model):
+    IMAGE_FIELDS = {"image": ("card", "full")}
+    IMAGE_URL_FIELDS = {"image": "photo_url"}
+
     salon = models.ForeignKey(
         Salon,
         on_delete=models.CASCADE,
@@ -237,19 +204,13 @@ class SalonPhoto(models.Model):
             return self.image.url
         return self.photo_url
 
-    def save(self, *args, **kwargs):
-        if self.image and _is_new_upload(self.image):
-            try:
-                self.image = _process_image_to_webp(self.image, max_size=1200)
-            except Exception:
-                pass
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"Photo for {self.salon.name}"
 
 
-class Service(MultilingualMixin, models.Model):
+class Service(ProcessedImagesMixin, MultilingualMixin, models.Model):
+    IMAGE_FIELDS = {"img": ("thumb", "card")}
+
     name_uz = models.CharField(max_length=200, blank=True)
     name_en = models.CharField(max_length=200, blank=True)
     name_ru = models.CharField(max_length=200)
@@ -275,7 +236,9 @@ class Service(MultilingualMixin, models.Model):
         return f"{self.name_ru} - {self.price}"
 
 
-class Master(models.Model):
+class Master(ProcessedImagesMixin, models.Model):
+    IMAGE_FIELDS = {"photo": ("thumb", "card")}
+
     salon = models.ForeignKey(Salon, on_delete=models.CASCADE, related_name='masters', verbose_name="Салон")
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -345,7 +308,29 @@ class SalonWorkingHours(models.Model):
         return f"{self.salon} - {self.get_weekday_display()}"
 
 
-class Appointment(models.Model):
+class IndexedBookingMixin:
+    """
+    Remembers the BookingIndex source fields as loaded from the database,
+    so a save that changes none of them skips the index sync
+    (marketplace.booking_index.sync_booking).
+    """
+    INDEXED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_state = instance.indexed_state()
+        return instance
+
+    def indexed_state(self):
+        # __dict__, not getattr: a deferred field must not trigger a query.
+        return tuple(self.__dict__.get(field) for field in self.INDEXED_FIELDS)
+
+    def index_changed(self):
+        return getattr(self, "_indexed_state", None) != self.indexed_state()
+
+
+class Appointment(IndexedBookingMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает'),
         ('confirmed', 'Подтверждено'),
@@ -381,9 +366,66 @@ class Appointment(models.Model):
         verbose_name = "Запись"
         verbose_name_plural = "Записи"
         ordering = ['-start_time']
+        indexes = [
+            # reminder scans / overdue sweeper: status + time window
+            models.Index(fields=["status", "start_time"], name="appt_status_start_idx"),
+            # get_available_slots / clean(): a master's live bookings in a window
+            models.Index(
+                fields=["master", "start_time", "end_time"],
+                name="appt_master_active_idx",
+                condition=Q(status__in=["pending", "confirmed", "completed"]),
+            ),
+            # owner dashboard, PC-salon capacity (_pcs_booked_at)
+            models.Index(fields=["salon", "status", "start_time"], name="appt_salon_status_start_idx"),
+            # my_bookings
+            models.Index(fields=["client", "-start_time"], name="appt_client_start_idx"),
+        ]
+        constraints = [
+            # One master can't hold two live bookings over the same time range.
+            # Enforced by Postgres (GiST + btree_gist), so concurrent bookings
+            # can't both win the same slot.
+            ExclusionConstraint(
+                name=SLOT_TAKEN_CONSTRAINT,
+                expressions=[
+                    ("master", RangeOperators.EQUAL),
+                    (TsTzRange("start_time", "end_time", models.Value("[)")), RangeOperators.OVERLAPS),
+                ],
+                condition=Q(master__isnull=False, end_time__isnull=False) & ~Q(status="cancelled"),
+                violation_error_message="This time is already booked for the selected master.",
+            ),
+        ]
+
+    # Fields that decide whether an appointment can overlap another one.
+    # Saves touching none of them (status transitions, comments) skip
+    # validation entirely and cost a single UPDATE.
+    SLOT_FIELDS = frozenset({"start_time", "end_time", "master", "master_id", "service", "service_id"})
+    INDEXED_FIELDS = (
+        "client_id", "salon_id", "master_id", "service_id",
+        "start_time", "end_time", "status", "quantity", "hours",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"start_time", "end_time", "master_id"}.issubset(field_names):
+            instance._loaded_slot = instance._slot_key()
+        return instance
+
+    def _slot_key(self):
+        return (self.start_time, self.end_time, self.master_id)
+
+    def _slot_changed(self):
+        """True for new rows and for rows whose time or master was edited."""
+        return self._state.adding or getattr(self, "_loaded_slot", None) != self._slot_key()
 
     def clean(self):
-        if not self.start_time or not self.service or not self.master:
+        if self.status == "cancelled" or not self._slot_changed():
+            return
+        if not self.start_time or not self.service_id or not self.master_id:
+            return
+        if connection.vendor == "postgresql":
+            # SLOT_TAKEN_CONSTRAINT rejects overlaps on INSERT/UPDATE;
+            # callers catch it with marketplace.utils.is_slot_taken_error().
             return
 
         # compute end time candidate
@@ -391,7 +433,7 @@ class Appointment(models.Model):
 
         # overlap check (ignore cancelled)
         qs = Appointment.objects.filter(
-            master=self.master,
+            master_id=self.master_id,
             status__in=["pending", "confirmed", "completed"]
         ).exclude(pk=self.pk)
 
@@ -401,15 +443,208 @@ class Appointment(models.Model):
             raise ValidationError("This time is already booked for the selected master.")
 
     def save(self, *args, **kwargs):
-        if self.start_time and self.service and not self.end_time:
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not self.SLOT_FIELDS.intersection(update_fields):
+            super().save(*args, **kwargs)
+            return
+
+        if self.start_time and not self.end_time and self.service:
             self.end_time = self.start_time + timedelta(minutes=self.service.duration_minutes)
-        self.full_clean()
+        # The exclusion constraint is checked by the database itself. PC-club
+        # bookings carry a quantity instead of a master.
+        self.full_clean(exclude=["master"] if self.master_id is None else None, validate_constraints=False)
         super().save(*args, **kwargs)
+        self._loaded_slot = self._slot_key()
 
     def __str__(self):
         return f"{self.client} -> {self.service} ({timezone.localtime(self.start_time).strftime('%d.%m %H:%M')})"
 
 
+class BookingReminder(models.Model):
+    """
+    One row per (booking, reminder kind). Rows are queued in bulk by
+    marketplace.reminders and marked sent once delivered, so the unique
+    constraints guarantee a booking is never reminded twice. A failed
+    delivery is retried after next_attempt_at, up to MAX_ATTEMPTS times.
+    """
+    KIND_CHOICES = [
+        ("24h", "За 24 часа"),
+        ("1h", "За 1 час"),
+    ]
+
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="reminders", verbose_name="Запись"
+    )
+    pc_booking = models.ForeignKey(
+        "pc_clubs.PCBooking", on_delete=models.CASCADE, null=True, blank=True,
+        related_name="reminders", verbose_name="PC бронь"
+    )
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES, verbose_name="Тип")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Поставлено в очередь")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток отправки")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Следующая попытка")
+
+    class Meta:
+        verbose_name = "Напоминание"
+        verbose_name_plural = "Напоминания"
+        constraints = [
+            models.UniqueConstraint(fields=["appointment", "kind"], name="uniq_reminder_appointment_kind"),
+            models.UniqueConstraint(fields=["pc_booking", "kind"], name="uniq_reminder_pc_booking_kind"),
+        ]
+        indexes = [
+            models.Index(fields=["sent_at", "created_at"], name="reminder_queue_idx"),
+        ]
+
+    def __str__(self):
+        target = f"appointment #{self.appointment_id}" if self.appointment_id else f"pc booking #{self.pc_booking_id}"
+        return f"{self.get_kind_display()} → {target}"
+
+
+class BookingEvent(models.Model):
+    """
+    Short-lived change feed of Appointment / PCBooking saves, read by the
+    owner dashboard event stream (marketplace.events). The auto-increment
+    id doubles as the SSE event id; rows are pruned EVENT_TTL after the
+    rollup worker has applied them (marketplace.events.prune_events).
+    """
+    KIND_CHOICES = [
+        ("appointment", "Запись"),
+        ("pc_booking", "PC бронь"),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="Тип")
+    booking_id = models.PositiveBigIntegerField(verbose_name="ID брони")
+    salon = models.ForeignKey(
+        Salon, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+", verbose_name="Салон"
+    )
+    master = models.ForeignKey(
+        Master, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+", verbose_name="Мастер"
+    )
+    pc_club = models.ForeignKey(
+        "pc_clubs.PCClub", on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+", verbose_name="PC Club"
+    )
+    status = models.CharField(max_length=20, verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Создано")
+    rolled_up = models.BooleanField(default=False, verbose_name="Учтено в сводке")
+
+    class Meta:
+        verbose_name = "Событие брони"
+        verbose_name_plural = "События броней"
+        indexes = [
+            models.Index(fields=["id"], condition=Q(rolled_up=False), name="bookingevent_rollup_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} #{self.booking_id} → {self.status}"
+
+
+class DailyBookingRollup(models.Model):
+    """
+    Per venue, per local day, per service (salon) or plan (PC club) booking
+    totals for owner analytics. Rebuilt slice by slice by
+    marketplace.analytics from BookingEvent rows, plus a nightly
+    `rebuild_booking_rollups` pass, so the analytics page never scans the
+    booking tables.
+    """
+    VENUE_CHOICES = [
+        ("salon", "Салон"),
+        ("pc_club", "PC клуб"),
+    ]
+
+    venue_type = models.CharField(max_length=16, choices=VENUE_CHOICES, verbose_name="Тип заведения")
+    venue_id = models.PositiveBigIntegerField(verbose_name="ID заведения")
+    day = models.DateField(verbose_name="День")
+    item_id = models.PositiveBigIntegerField(default=0, verbose_name="ID услуги/тарифа")  # 0 = deleted/none
+    item_name = models.CharField(max_length=200, blank=True, verbose_name="Услуга/тариф")
+
+    bookings = models.PositiveIntegerField(default=0, verbose_name="Всего броней")
+    pending = models.PositiveIntegerField(default=0, verbose_name="Ожидают")
+    confirmed = models.PositiveIntegerField(default=0, verbose_name="Подтверждены")
+    completed = models.PositiveIntegerField(default=0, verbose_name="Завершены")
+    cancelled = models.PositiveIntegerField(default=0, verbose_name="Отменены")
+    # Confirmed + completed only. Hours are seat-hours (quantity × hours).
+    hours = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Часы")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Выручка")
+
+    class Meta:
+        verbose_name = "Дневная сводка броней"
+        verbose_name_plural = "Дневные сводки броней"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["venue_type", "venue_id", "day", "item_id"], name="uniq_rollup_venue_day_item"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["venue_type", "venue_id", "day"], name="rollup_venue_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.venue_type} #{self.venue_id} {self.day} {self.item_name}"
+
+
+class BookingIndex(models.Model):
+    """
+    Denormalized read model: one row per Appointment / PCBooking, kept in
+    sync by marketplace.booking_index from both models' post_save /
+    post_delete receivers (and by the overdue sweeper for its bulk
+    update). Cross-venue reads (client timeline, reminders, rollups) query
+    this table alone instead of both booking tables.
+    """
+    KIND_CHOICES = BookingEvent.KIND_CHOICES
+    VENUE_CHOICES = DailyBookingRollup.VENUE_CHOICES
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, verbose_name="Тип")
+    booking_id = models.PositiveBigIntegerField(verbose_name="ID брони")
+    client = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name="+", verbose_name="Клиент"
+    )
+
+    venue_type = models.CharField(max_length=16, choices=VENUE_CHOICES, verbose_name="Тип заведения")
+    venue_id = models.PositiveBigIntegerField(verbose_name="ID заведения")
+    venue_name = models.CharField(max_length=200, blank=True, verbose_name="Заведение")
+    # Master (salon) or plan (PC club); 0 = none/deleted.
+    resource_id = models.PositiveBigIntegerField(default=0, verbose_name="ID мастера/тарифа")
+    resource_name = models.CharField(max_length=200, blank=True, verbose_name="Мастер/тариф")
+    # Service (salon) or plan (PC club); 0 = none/deleted.
+    item_id = models.PositiveBigIntegerField(default=0, verbose_name="ID услуги/тарифа")
+    item_name = models.CharField(max_length=200, blank=True, verbose_name="Услуга/тариф (RU)")
+    item_name_en = models.CharField(max_length=200, blank=True, verbose_name="Услуга/тариф (EN)")
+    item_name_uz = models.CharField(max_length=200, blank=True, verbose_name="Услуга/тариф (UZ)")
+
+    start_time = models.DateTimeField(verbose_name="Начало")
+    end_time = models.DateTimeField(null=True, blank=True, verbose_name="Конец")
+    status = models.CharField(max_length=20, verbose_name="Статус")
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Количество")
+    # Booked seat-hours (quantity × hours); price covers every seat.
+    hours = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Часы")
+    price = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма")
+    created_at = models.DateTimeField(verbose_name="Создано")
+
+    class Meta:
+        verbose_name = "Бронь (сводный индекс)"
+        verbose_name_plural = "Брони (сводный индекс)"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "booking_id"], name="uniq_bookingindex_kind_booking"),
+        ]
+        indexes = [
+            # client timeline
+            models.Index(fields=["client", "-start_time", "-id"], name="bookingindex_client_idx"),
+            # owner views and rollups: a venue's bookings in a window
+            models.Index(fields=["venue_type", "venue_id", "start_time"], name="bookingindex_venue_idx"),
+            # reminders / sweeps
+            models.Index(fields=["status", "start_time"], name="bookingindex_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.booking_id} ({self.venue_name}) → {self.status}"
+
+
 class BusinessLead(models.Model):
     STATUS_CHOICES = [
         ("new", "Новая"),
@@ -0,0 +1,187 @@
+"""
+Reminder engine for upcoming bookings.
+
+Two steps, both set-based so a run stays cheap at tens of thousands of
+bookings per day:
+
+  1. queue_due_reminders()   – scans confirmed bookings in BookingIndex
+     whose start falls into a reminder window (e.g. 1h–24h ahead for the
+     "24h" reminder) and bulk-inserts BookingReminder rows. The unique
+     constraints on BookingReminder make re-queuing a no-op.
+  2. deliver_queued_reminders() – claims queued rows in a short
+     transaction, sends Telegram (SMS when the client has no Telegram or
+     it fails) outside of it, and marks delivered rows sent. Failed rows
+     are retried after RETRY_DELAY, at most MAX_ATTEMPTS times.
+
+Run via:  python manage.py send_booking_reminders [--loop]
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import BookingIndex, BookingReminder
+from .utils import send_sms, send_telegram_message
+
+logger = logging.getLogger(__name__)
+
+# (kind, how long before start_time). Keep ordered from furthest to nearest:
+# each window ends where the next (nearer) one begins, so a booking made
+# 30 minutes ahead only gets the "1h" reminder, not both.
+REMINDER_WINDOWS = (
+    ("24h", timedelta(hours=24)),
+    ("1h", timedelta(hours=1)),
+)
+
+REMIND_STATUSES = ("confirmed",)
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 3
+# Also the lease on a claimed row: no other worker picks it up while it
+# is being sent.
+RETRY_DELAY = timedelta(minutes=5)
+
+
+def _windows(now):
+    """Yield (kind, window_start, window_end) with non-overlapping bounds."""
+    offsets = [offset for _, offset in REMINDER_WINDOWS] + [timedelta(0)]
+    for i, (kind, offset) in enumerate(REMINDER_WINDOWS):
+        yield kind, now + offsets[i + 1], now + offset
+
+
+def queue_due_reminders(now=None):
+    """
+    Bulk-queue reminders for bookings entering a reminder window, found
+    with one BookingIndex query per window for both booking kinds.
+    Returns the number of reminder rows created.
+    """
+    now = now or timezone.now()
+    created = 0
+
+    for kind, window_start, window_end in _windows(now):
+        already_appt = BookingReminder.objects.filter(appointment=OuterRef("booking_id"), kind=kind)
+        already_pc = BookingReminder.objects.filter(pc_booking=OuterRef("booking_id"), kind=kind)
+        due = (
+            BookingIndex.objects
+            .filter(status__in=REMIND_STATUSES, start_time__gt=window_start, start_time__lte=window_end)
+            .exclude(Q(kind="appointment") & Exists(already_appt))
+            .exclude(Q(kind="pc_booking") & Exists(already_pc))
+            .values_list("kind", "booking_id")
+        )
+        created += len(BookingReminder.objects.bulk_create(
+            [
+                BookingReminder(appointment_id=pk, kind=kind) if booking_kind == "appointment"
+                else BookingReminder(pc_booking_id=pk, kind=kind)
+                for booking_kind, pk in due
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        ))
+
+    return created
+
+
+def _appointment_texts(reminder):
+    appt = reminder.appointment
+    start = timezone.localtime(appt.start_time).strftime("%d.%m.%Y %H:%M")
+    service_name = appt.service.name_ru if appt.service else "-"
+    when = "завтра" if reminder.kind == "24h" else "через час"
+    tg_text = (
+        f"<b>⏰ Напоминание: запись {when}</b>\n\n"
+        f"Заведение: {appt.salon.name}\n"
+        f"Услуга: {service_name}\n"
+        f"Время: {start}\n\n"
+        "Если планы изменились, отмените запись в разделе «Мои записи»."
+    )
+    sms_text = f"Napominanie: zapis #{appt.id}, {appt.salon.name}, {start}."
+    return tg_text, sms_text
+
+
+def _pc_booking_texts(reminder):
+    booking = reminder.pc_booking
+    start = timezone.localtime(booking.start_time).strftime("%d.%m.%Y %H:%M")
+    plan_name = booking.plan.name if booking.plan else "—"
+    when = "завтра" if reminder.kind == "24h" else "через час"
+    tg_text = (
+        f"<b>⏰ Напоминание: бронь {when}</b>\n\n"
+        f"Клуб: {booking.pc_club.name}\n"
+        f"Тариф: {plan_name}\n"
+        f"Мест: {booking.quantity} ПК\n"
+        f"Время: {start}"
+    )
+    sms_text = f"Napominanie: bron #{booking.id}, klub {booking.pc_club.name}, {start}."
+    return tg_text, sms_text
+
+
+def _deliver(reminder, booking):
+    """
+    Telegram when the client has it, SMS when they do not or Telegram
+    fails. True when delivered, or when the client has no usable channel
+    (nothing to retry).
+    """
+    texts = _appointment_texts if reminder.appointment_id else _pc_booking_texts
+    tg_text, sms_text = texts(reminder)
+    profile = getattr(booking.client, "profile", None)
+    telegram_id = getattr(profile, "telegram_id", None)
+    phone = getattr(profile, "phone", "")
+
+    if telegram_id and send_telegram_message(telegram_id, tg_text):
+        return True
+    if phone and getattr(settings, "SMS_BACKEND", "") == "eskiz":
+        return send_sms(phone, sms_text)
+    return not telegram_id
+
+
+def _claim(limit, now):
+    """
+    Lock up to `limit` due rows (SKIP LOCKED, so several workers can run
+    at once), count the attempt and push next_attempt_at past RETRY_DELAY,
+    then commit: sending happens outside the transaction.
+    """
+    with transaction.atomic():
+        batch = list(
+            BookingReminder.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(sent_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .select_related(
+                "appointment__client__profile", "appointment__salon", "appointment__service",
+                "pc_booking__client__profile", "pc_booking__pc_club", "pc_booking__plan",
+            )
+            .order_by("created_at")[:limit]
+        )
+        BookingReminder.objects.filter(pk__in=[r.pk for r in batch]).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + RETRY_DELAY,
+        )
+    for reminder in batch:
+        reminder.attempts += 1
+    return batch
+
+
+def deliver_queued_reminders(limit=BATCH_SIZE, now=None):
+    """
+    Send up to `limit` due reminders. Reminders whose booking was cancelled
+    or has already started are marked sent without messaging anyone.
+    Returns the number of rows claimed.
+    """
+    now = now or timezone.now()
+    batch = _claim(limit, now)
+
+    done = []
+    for reminder in batch:
+        booking = reminder.appointment or reminder.pc_booking
+        if booking is None or booking.status not in REMIND_STATUSES or booking.start_time <= now:
+            done.append(reminder.pk)
+        elif _deliver(reminder, booking):
+            done.append(reminder.pk)
+        elif reminder.attempts >= MAX_ATTEMPTS:
+            logger.warning(
+                "reminder not delivered, giving up",
+                extra={"fields": {"reminder_id": reminder.pk, "attempts": reminder.attempts}},
+            )
+
+    BookingReminder.objects.filter(pk__in=done).update(sent_at=timezone.now())
+    return len(batch)
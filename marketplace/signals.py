@@ -1,11 +1,38 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import Appointment
+from accounts.prefs import get_prefs
+
+from .booking_index import refresh_names, remove_booking, sync_booking
+from .events import publish_on_commit
+from .models import Appointment, Master, Salon, Service
 from .utils import send_telegram_message
 
 
+@receiver(post_save, sender=Appointment)
+def publish_appointment_event(sender, instance, **kwargs):
+    publish_on_commit(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def index_appointment(sender, instance, update_fields=None, **kwargs):
+    sync_booking(instance, update_fields)
+
+
+@receiver(post_delete, sender=Appointment)
+def unindex_appointment(sender, instance, **kwargs):
+    remove_booking("appointment", instance.pk)
+
+
+@receiver(post_save, sender=Salon)
+@receiver(post_save, sender=Master)
+@receiver(post_save, sender=Service)
+def refresh_indexed_names(sender, instance, created, **kwargs):
+    if not created:
+        refresh_names(instance)
+
+
 @receiver(post_save, sender=Appointment)
 def notify_booking_created(sender, instance, created, **kwargs):
     if not created:
@@ -13,18 +40,17 @@ def notify_booking_created(sender, instance, created, **kwargs):
 
     # -------- CUSTOMER --------
     customer = instance.client
-    customer_profile = getattr(customer, "profile", None)
+    customer_prefs = get_prefs(customer.pk)
 
     # -------- PROVIDER (Salon owner) --------
-    provider_user = instance.salon.owner
-    provider_profile = getattr(provider_user, "profile", None)
+    provider_prefs = get_prefs(instance.salon.owner_id)
 
     start_time = timezone.localtime(instance.start_time).strftime("%Y-%m-%d %H:%M")
 
     # Message to CUSTOMER
-    if customer_profile and customer_profile.telegram_id:
+    if customer_prefs.get("telegram_id"):
         send_telegram_message(
-            customer_profile.telegram_id,
+            customer_prefs["telegram_id"],
             (
                 "<b>⏳ Booking Request Sent</b>\n\n"
                 f"Salon: {instance.salon.name}\n"
@@ -35,9 +61,9 @@ def notify_booking_created(sender, instance, created, **kwargs):
         )
 
     # Message to PROVIDER
-    if provider_profile and provider_profile.telegram_id:
+    if provider_prefs.get("telegram_id"):
         send_telegram_message(
-            provider_profile.telegram_id,
+            provider_prefs["telegram_id"],
             (
                 "<b>🔔 New Booking Request</b>\n\n"
                 f"Client: {customer.get_full_name() or customer.username}\n"
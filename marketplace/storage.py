@@ -0,0 +1,55 @@
+"""
+Content-addressed media storage.
+
+Every saved file is named after the SHA-256 of its bytes:
+
+    cas/3f/a9/3fa9…c2.webp
+
+so the same logo, stock photo or rendered variant uploaded by many venues
+(or by every run of the seed commands) is written once, and a name never
+changes content, which lets nginx serve /media/cas/ with immutable,
+far-future Cache-Control.
+
+Because one file may back many rows, delete() is a no-op; unreferenced
+files are removed by:  python manage.py prune_media
+
+A save that finds its content already stored touches the file, so a
+re-uploaded old file counts as new for prune_media's --min-age grace.
+"""
+
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+CAS_PREFIX = "cas"
+
+
+def content_name(content, filename):
+    """cas/<h[:2]>/<h[2:4]>/<sha256>.<ext of filename> for a File-like `content`."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    h = digest.hexdigest()
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{CAS_PREFIX}/{h[:2]}/{h[2:4]}/{h}{ext}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        name = content_name(content, name)
+        try:
+            os.utime(self.path(name))  # same bytes already stored
+            return name
+        except FileNotFoundError:
+            return super()._save(name, content)
+
+    def delete(self, name):
+        # Shared by every row with the same content; see prune_media.
+        pass
+
+    def purge(self, name):
+        """Really delete `name`. Only prune_media should call this."""
+        super().delete(name)
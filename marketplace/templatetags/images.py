@@ -0,0 +1,150 @@
+"""
+Responsive image helpers for models using marketplace.images.ProcessedImagesMixin.
+
+Usage in templates:
+
+    {% load images %}
+
+    {% picture salon "logo" "thumb" alt=salon.name class="avatar-img" %}
+        -> <picture> with AVIF/WebP <source> srcsets and a WebP <img>;
+           a plain <img> of the original while variants are pending
+
+    <img src="{{ photo|image_url:'image:card' }}" srcset="{{ photo|srcset:'image' }}" sizes="480px">
+
+    style="background-image: url('{{ salon|image_url:'cover:full' }}')"
+
+    style="{{ salon|placeholder_style:'cover' }} background-image: url(...), var(--lqip, none);"
+        -> dominant colour + blurred LQIP behind a CSS background image
+
+    <img src="{{ salon.logo_url|proxied:'thumb' }}">   -> external URL via the local image proxy
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+MIME_TYPES = (("avif", "image/avif"), ("webp", "image/webp"))
+
+
+def _variants(obj, name):
+    if obj is None or not hasattr(obj, "current_variants"):
+        return {}
+    return obj.current_variants(name)
+
+
+def _srcset(field_file, variants, fmt):
+    return ", ".join(
+        f"{field_file.storage.url(v[fmt])} {v['w']}w"
+        for v in sorted(variants.values(), key=lambda v: v["w"])
+        if v.get(fmt)
+    )
+
+
+@register.filter
+def srcset(obj, name):
+    """WebP srcset for image field `name`, or "" while variants are pending."""
+    variants = _variants(obj, name)
+    return _srcset(getattr(obj, name), variants, "webp") if variants else ""
+
+
+def _placeholder(obj, name):
+    if obj is None or not hasattr(obj, "placeholder"):
+        return "", ""
+    return obj.placeholder(name)
+
+
+@register.filter
+def lqip(obj, name):
+    """Tiny blurred data: URI of image field `name`, or ""."""
+    return _placeholder(obj, name)[0]
+
+
+@register.filter
+def dominant_color(obj, name):
+    """"#rrggbb" average colour of image field `name`, or ""."""
+    return _placeholder(obj, name)[1]
+
+
+@register.filter
+def placeholder_style(obj, name):
+    """
+    Inline CSS declaring the dominant colour and the LQIP (as --lqip) of
+    image field `name`; list var(--lqip, none) after the real image in
+    background-image so it paints until the real one has loaded.
+    """
+    data_uri, color = _placeholder(obj, name)
+    if not color:
+        return ""
+    return format_html(
+        "background-color: {}; --lqip: url('{}');",
+        color, data_uri,
+    )
+
+
+@register.filter
+def proxied(url, size="card"):
+    """External image URL -> signed local proxy URL at `size`."""
+    from marketplace.image_proxy import proxy_url
+
+    return proxy_url(url, size)
+
+
+@register.filter
+def image_url(obj, spec):
+    """
+    URL of one WebP variant: spec is "field:size". Falls back to the
+    original upload while variants are pending, and without an upload to
+    the model's external URL field (IMAGE_URL_FIELDS) through the proxy.
+    """
+    name, _, size = spec.partition(":")
+    field_file = getattr(obj, name, None)
+    if not field_file:
+        external = getattr(obj, "IMAGE_URL_FIELDS", {}).get(name)
+        return proxied(getattr(obj, external, ""), size or "card") if external else ""
+    variant = _variants(obj, name).get(size)
+    if variant and variant.get("webp"):
+        return field_file.storage.url(variant["webp"])
+    return field_file.url
+
+
+@register.simple_tag
+def picture(obj, name, size="card", sizes=None, **attrs):
+    """<picture> for image field `name`, `size` being the default <img> source."""
+    field_file = getattr(obj, name, None)
+    if not field_file:
+        return ""
+
+    attrs.setdefault("alt", "")
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    placeholder = placeholder_style(obj, name)
+    if placeholder:
+        # Shows through until the (lazy) image has decoded.
+        attrs["style"] = (
+            f"{placeholder} background-image: var(--lqip); background-size: cover; "
+            f"{attrs.get('style', '')}"
+        ).strip()
+    variants = _variants(obj, name)
+    if not variants:
+        return format_html(
+            '<img src="{}"{}>', field_file.url,
+            format_html_join("", ' {}="{}"', attrs.items()),
+        )
+
+    default = variants.get(size) or max(variants.values(), key=lambda v: v["w"])
+    sizes = sizes or f"{default['w']}px"
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime, _srcset(field_file, variants, fmt), sizes)
+            for fmt, mime in MIME_TYPES
+            if any(v.get(fmt) for v in variants.values())
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" width="{}" height="{}"{}></picture>',
+        sources, field_file.storage.url(default["webp"]), default["w"], default["h"],
+        format_html_join("", ' {}="{}"', attrs.items()),
+    )
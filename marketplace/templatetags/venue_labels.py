@@ -45,15 +45,20 @@ _TIME_BASED_SLUGS = {"paddle-tennis", "big-tennis", "computer-cafe", "billiard"}
 
 
 def _root_slug_for(salon):
-    """Walk up the MPTT tree to the root category slug."""
+    """
+    Walk up the MPTT tree to the root category slug. Memoized on the
+    category instance: templates call these filters once per service row.
+    """
     cat = getattr(salon, "category", None)
     if not cat:
         return None
-    try:
-        root = cat.get_root()
-    except Exception:
-        root = cat
-    return root.slug if root else None
+    if not hasattr(cat, "_root_slug"):
+        try:
+            root = cat if cat.is_root_node() else cat.get_root()
+        except Exception:
+            root = cat
+        cat._root_slug = root.slug if root else None
+    return cat._root_slug
 
 
 @register.filter
@@ -1,3 +1,1137 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time as clock
+import zipfile
+from contextlib import redirect_stderr
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from config import instrumentation
+
+from . import image_proxy
+from .clock import TimeContext, activate, deactivate
+from .models import Address, Appointment, Category, Master, Salon, SalonPhoto, SalonWorkingHours, Service
+from .utils import get_available_slots
+
+
+# =====================================================================
+# IMAGE PROXY
+# =====================================================================
+
+def _png(size=(900, 600)):
+    buf = BytesIO()
+    Image.new("RGB", size, (0, 163, 173)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Stands in for the remote image host."""
+    routes = {
+        "/logo.png": ("image/png", _png()),
+        "/page.html": ("text/html", b"<html></html>"),
+    }
+    redirects = {
+        "/moved.png": "/logo.png",
+        "/metadata.png": "http://169.254.169.254/latest/meta-data/",
+    }
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path in self.redirects:
+            self.send_response(302)
+            self.send_header("Location", self.redirects[self.path])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path not in self.routes:
+            self.send_error(404)
+            return
+        content_type, body = self.routes[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageProxyTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        cls.server.hits = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.origin = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        # The stub host is loopback, which the proxy refuses unless listed.
+        settings = override_settings(
+            IMAGE_PROXY_CACHE_DIR=self.cache_dir, IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS=["127.0.0.1"],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.server.hits.clear()
+
+    def test_fetches_once_then_serves_from_cache(self):
+        url = f"{self.origin}/logo.png"
+        proxied = image_proxy.proxy_url(url, "thumb")
+
+        for _ in range(2):
+            response = self.client.get(proxied)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "image/webp")
+            img = Image.open(BytesIO(b"".join(response.streaming_content)))
+            self.assertEqual(img.format, "WEBP")
+            self.assertEqual(max(img.size), 160)
+
+        self.assertEqual(self.server.hits, ["/logo.png"])
+
+    def test_sizes_are_cached_separately(self):
+        url = f"{self.origin}/logo.png"
+        self.client.get(image_proxy.proxy_url(url, "thumb"))
+        self.client.get(image_proxy.proxy_url(url, "card"))
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_forged_token_is_rejected(self):
+        token = image_proxy.proxy_url(f"{self.origin}/logo.png").rstrip("/").rsplit("/", 1)[-1]
+        response = self.client.get(f"/img/{token[:-2]}xx/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.server.hits, [])
+
+    def test_non_image_falls_back_to_origin(self):
+        url = f"{self.origin}/page.html"
+        response = self.client.get(image_proxy.proxy_url(url))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertIsNone(image_proxy.lookup(url, "card"))
+
+    def test_missing_image_falls_back_to_origin(self):
+        url = f"{self.origin}/missing.png"
+        response = self.client.get(image_proxy.proxy_url(url))
+        self.assertEqual(response.status_code, 302)
+
+    def test_private_address_is_not_fetched(self):
+        url = f"http://localhost:{self.server.server_address[1]}/logo.png"
+        response = self.client.get(image_proxy.proxy_url(url))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(self.server.hits, [])
+
+    def test_internal_ranges_are_refused(self):
+        for url in (
+            "http://127.0.0.2/", "http://10.1.2.3/", "http://192.168.0.1/", "http://169.254.169.254/",
+            "http://[::1]/", "http://[fe80::1]/", "http://[::ffff:10.0.0.1]/", "http://0.0.0.0/",
+        ):
+            with self.subTest(url=url), self.assertRaises(image_proxy.FetchError):
+                image_proxy.check_public(url)
+        image_proxy.check_public("http://93.184.216.34/")
+
+    def test_connection_checks_the_connected_address(self):
+        # As after DNS rebinding: check_public passed, the socket lands on loopback.
+        with override_settings(IMAGE_PROXY_ALLOWED_PRIVATE_HOSTS=[]):
+            with self.assertRaises(image_proxy.FetchError):
+                image_proxy.session().get(f"{self.origin}/logo.png", timeout=1)
+        self.assertEqual(self.server.hits, [])
+
+    def test_cache_is_walked_only_past_the_cap(self):
+        with override_settings(IMAGE_PROXY_CACHE_MAX_BYTES=2500):
+            first = image_proxy.store("http://a/1", "card", b"x" * 1000)
+            # Written behind this process's back: not counted until the next walk.
+            os.remove(first)
+            image_proxy.store("http://a/2", "card", b"x" * 1000)
+            self.assertEqual(image_proxy._cache_bytes[self.cache_dir], 2000)
+            image_proxy.store("http://a/3", "card", b"x" * 1000)
+            self.assertEqual(image_proxy._cache_bytes[self.cache_dir], 2000)
+
+    def test_redirects_are_followed(self):
+        response = self.client.get(image_proxy.proxy_url(f"{self.origin}/moved.png"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, ["/moved.png", "/logo.png"])
+
+    def test_redirect_to_private_address_is_refused(self):
+        url = f"{self.origin}/metadata.png"
+        response = self.client.get(image_proxy.proxy_url(url))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertIsNone(image_proxy.lookup(url, "card"))
+
+    def test_decompression_bomb_falls_back_to_origin(self):
+        # 900x600 is over twice this limit, so Pillow refuses to decode it.
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, 1000
+        self.addCleanup(setattr, Image, "MAX_IMAGE_PIXELS", limit)
+
+        url = f"{self.origin}/logo.png"
+        response = self.client.get(image_proxy.proxy_url(url))
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertIsNone(image_proxy.lookup(url, "card"))
+
+    def test_lru_evicts_least_recently_used(self):
+        with override_settings(IMAGE_PROXY_CACHE_MAX_BYTES=2500):
+            first = image_proxy.store("http://a/1", "card", b"x" * 1000)
+            second = image_proxy.store("http://a/2", "card", b"x" * 1000)
+            os.utime(first, (1000, 1000))
+            os.utime(second, (2000, 2000))
+            # A hit makes `first` the most recently used entry.
+            self.assertEqual(image_proxy.lookup("http://a/1", "card"), first)
+
+            image_proxy.store("http://a/3", "card", b"x" * 1000)
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertIsNotNone(image_proxy.lookup("http://a/3", "card"))
+
+
+# =====================================================================
+# DETAIL PAGE QUERY BUDGET
+# =====================================================================
+
+class SalonDetailQueryTests(TestCase):
+    # salon (+category, location), one query each for photos, services,
+    # active masters and working hours, then the root category.
+    QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user("owner", "owner@example.com", "pw")
+        root = Category.objects.create(name_ru="Красота", slug="beauty")
+        category = Category.objects.create(name_ru="Барбершоп", slug="barber", parent=root)
+        cls.salon = Salon.objects.create(
+            name="Barber", owner=owner, category=category, address="Tashkent", phone="+998900000000",
+        )
+        Address.objects.create(salon=cls.salon, full_address="Tashkent, Chilonzor 1")
+        for weekday in range(7):
+            SalonWorkingHours.objects.create(
+                salon=cls.salon, weekday=weekday, open_time=time(9), close_time=time(21),
+            )
+        cls.add_rows(3)
+
+    @classmethod
+    def add_rows(cls, n):
+        for i in range(n):
+            Service.objects.create(
+                salon=cls.salon, name_ru=f"Стрижка {i}", description_ru="Классика",
+                price=100000, duration_minutes=60,
+            )
+            Master.objects.create(salon=cls.salon, name=f"Master {i}", is_active=bool(i % 2))
+            SalonPhoto.objects.create(salon=cls.salon, photo_url=f"https://example.com/{i}.jpg")
+
+    def get(self):
+        return self.client.get(reverse("marketplace:salon_detail", args=[self.salon.pk]))
+
+    def test_fixed_number_of_queries(self):
+        with self.assertNumQueries(self.QUERIES):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Стрижка 2")
+
+    def test_queries_do_not_grow_with_related_rows(self):
+        self.add_rows(10)
+        with self.assertNumQueries(self.QUERIES):
+            self.get()
+
+
+# =====================================================================
+# SLOT GENERATION
+# =====================================================================
+
+class AvailableSlotsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user("slots_owner", "slots_owner@example.com", "pw")
+        client = User.objects.create_user("slots_client", "slots_client@example.com", "pw")
+        cls.salon = Salon.objects.create(name="Slots", owner=owner, address="Tashkent", phone="+998900000001")
+        for weekday in range(7):
+            SalonWorkingHours.objects.create(
+                salon=cls.salon, weekday=weekday, open_time=time(9), close_time=time(12),
+            )
+        cls.service = Service.objects.create(
+            salon=cls.salon, name_ru="Стрижка", price=100000, duration_minutes=60,
+        )
+        cls.master = Master.objects.create(salon=cls.salon, name="Master")
+        cls.day = timezone.localdate() + timedelta(days=30)
+        # Back to back, so they merge into one busy range 09:30-10:45;
+        # the cancelled one does not block anything.
+        for start, end, status in (
+            (time(9, 30), time(10, 15), "confirmed"),
+            (time(10, 15), time(10, 45), "pending"),
+            (time(11, 0), time(12, 0), "cancelled"),
+        ):
+            Appointment.objects.create(
+                client=client, salon=cls.salon, master=cls.master, service=cls.service,
+                start_time=cls.at(start), end_time=cls.at(end), status=status,
+            )
+
+    @classmethod
+    def at(cls, t):
+        return timezone.make_aware(datetime.combine(cls.day, t))
+
+    def slots(self):
+        slots = get_available_slots(
+            salon=self.salon, master=self.master, service=self.service, date_obj=self.day,
+        )
+        return [timezone.localtime(s).strftime("%H:%M") for s in slots]
+
+    def test_busy_ranges_are_excluded(self):
+        self.assertEqual(self.slots(), ["10:45", "11:00"])
+
+    def test_past_times_are_excluded_today(self):
+        token = activate(TimeContext(now=self.at(time(10, 50))))
+        self.addCleanup(deactivate, token)
+        self.assertEqual(self.slots(), ["11:00"])
+
+    def test_api_returns_local_wall_times(self):
+        response = self.client.get(
+            reverse("marketplace:api_slots", args=[self.salon.pk, self.service.pk]),
+            {"master": self.master.pk, "date": self.day.isoformat()},
+        )
+        self.assertEqual(response.json()["slots"], ["10:45", "11:00"])
+
+    async def test_api_through_async_handler(self):
+        # The async-capable middleware chain behind the ASGI handler.
+        response = await self.async_client.get(
+            reverse("marketplace:api_slots", args=[self.salon.pk, self.service.pk]),
+            {"master": self.master.pk, "date": self.day.isoformat()},
+        )
+        self.assertEqual(response.json()["slots"], ["10:45", "11:00"])
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    async def test_async_variant_matches_sync(self):
+        # SERVER_MODE=asgi serves api_slots_async instead.
+        from . import views
+
+        request = AsyncRequestFactory().get("/", {"master": self.master.pk, "date": self.day.isoformat()})
+        response = await views.api_slots_async(request, self.salon.pk, self.service.pk)
+        self.assertEqual(json.loads(response.content)["slots"], ["10:45", "11:00"])
+
+
+# =====================================================================
+# BOOKING
+# =====================================================================
+
+class BookingConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user("conflict_owner", "conflict_owner@example.com", "pw")
+        cls.client_user = User.objects.create_user("conflict_client", "conflict_client@example.com", "pw")
+        cls.salon = Salon.objects.create(name="Conflict", owner=owner, address="Tashkent", phone="+998900000004")
+        cls.other_salon = Salon.objects.create(name="Elsewhere", owner=owner, address="Tashkent", phone="+998900000005")
+        for weekday in range(7):
+            SalonWorkingHours.objects.create(salon=cls.salon, weekday=weekday, open_time=time(9), close_time=time(18))
+        cls.service = Service.objects.create(salon=cls.salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        cls.master = Master.objects.create(salon=cls.salon, name="Master")
+        cls.day = timezone.localdate() + timedelta(days=30)
+        cls.start = timezone.make_aware(datetime.combine(cls.day, time(10)))
+
+    def test_slot_taken_between_check_and_insert(self):
+        # Booked through another salon, so get_available_slots still offers
+        # 10:00 and only the exclusion constraint catches the overlap, as
+        # when a concurrent request wins the slot.
+        Appointment.objects.create(
+            client=self.client_user, salon=self.other_salon, master=self.master, service=self.service,
+            start_time=self.start, status="confirmed",
+        )
+        self.client.force_login(self.client_user)
+        response = self.client.post(
+            reverse("marketplace:booking_start", args=[self.salon.pk, self.service.pk]),
+            {"master": self.master.pk, "date": self.day.isoformat(), "time": "10:00"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Selected time is no longer available.")
+        self.assertEqual(Appointment.objects.filter(master=self.master).count(), 1)
+
+    def test_pc_capacity_counts_overlapping_quantities(self):
+        from .utils import _pcs_booked_at
+
+        for start, quantity in ((self.start - timedelta(hours=2), 5), (self.start - timedelta(minutes=30), 3)):
+            Appointment.objects.create(
+                client=self.client_user, salon=self.salon, service=self.service,
+                start_time=start, quantity=quantity,
+            )
+        # 08:00-09:00 ended before 10:00; 09:30-10:30 overlaps with 3 PCs.
+        self.assertEqual(_pcs_booked_at(self.salon, self.start, self.start + timedelta(hours=1)), 3)
+
+    def test_pc_booking_stops_at_capacity(self):
+        self.salon.category = Category.objects.create(name_ru="ПК клуб", slug="pc-club")
+        self.salon.save(update_fields=["category"])
+        Master.objects.create(salon=self.salon, name="PC 2")
+        url = reverse("marketplace:booking_start", args=[self.salon.pk, self.service.pk])
+        data = {"date": self.day.isoformat(), "time": "10:00", "quantity": 2}
+        self.client.force_login(self.client_user)
+
+        self.assertRedirects(
+            self.client.post(url, data), reverse("marketplace:booking_success", args=[self.salon.pk]),
+            fetch_redirect_response=False,
+        )
+        response = self.client.post(url, {**data, "quantity": 1})
+
+        self.assertContains(response, "Only 0 PC(s) available at this time.")
+        self.assertEqual(list(Appointment.objects.filter(salon=self.salon).values_list("master", "quantity")), [(None, 2)])
+
+
+class AppointmentSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user("save_owner", "save_owner@example.com", "pw")
+        client = User.objects.create_user("save_client", "save_client@example.com", "pw")
+        salon = Salon.objects.create(name="Save", owner=owner, address="Tashkent", phone="+998900000006")
+        service = Service.objects.create(salon=salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        master = Master.objects.create(salon=salon, name="Master")
+        cls.pk = Appointment.objects.create(
+            client=client, salon=salon, master=master, service=service,
+            start_time=timezone.now() + timedelta(days=1), status="pending",
+        ).pk
+
+    def test_status_save_skips_validation(self):
+        appointment = Appointment.objects.get(pk=self.pk)
+        appointment.status = "confirmed"
+        with CaptureQueriesContext(connection) as queries:
+            appointment.save(update_fields=["status"])
+
+        sql = [query["sql"] for query in queries.captured_queries]
+        self.assertEqual([q for q in sql if q.startswith("SELECT")], [])
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "marketplace_appointment"')]), 1)
+
+    def test_slot_save_runs_full_clean(self):
+        from django.core.exceptions import ValidationError
+
+        appointment = Appointment.objects.get(pk=self.pk)
+        appointment.start_time = None
+        with self.assertRaises(ValidationError) as raised:
+            appointment.save(update_fields=["start_time", "status"])
+
+        self.assertIn("start_time", raised.exception.message_dict)
+        self.assertIsNotNone(Appointment.objects.get(pk=self.pk).start_time)
+
+
+# =====================================================================
+# BOOKING INDEX
+# =====================================================================
+
+class BookingIndexSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user("index_owner", "index_owner@example.com", "pw")
+        cls.booker = client = User.objects.create_user("index_client", "index_client@example.com", "pw")
+        cls.salon = salon = Salon.objects.create(name="Index", owner=owner, address="Tashkent", phone="+998900000005")
+        service = Service.objects.create(salon=salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        master = Master.objects.create(salon=salon, name="Master")
+        start = timezone.now() + timedelta(days=1)
+        cls.pk = Appointment.objects.create(
+            client=client, salon=salon, master=master, service=service,
+            start_time=start, end_time=start + timedelta(hours=1), status="pending", comment="first",
+        ).pk
+
+    def indexed_status(self):
+        from .models import BookingIndex
+
+        return BookingIndex.objects.get(kind="appointment", booking_id=self.pk).status
+
+    def test_status_save_updates_only_the_status(self):
+        appointment = Appointment.objects.get(pk=self.pk)
+        appointment.status = "confirmed"
+        with self.assertNumQueries(2):  # the appointment, then the index row
+            appointment.save(update_fields=["status"])
+        self.assertEqual(self.indexed_status(), "confirmed")
+
+    def test_save_without_indexed_changes_skips_the_index(self):
+        appointment = Appointment.objects.get(pk=self.pk)
+        appointment.comment = "second"
+        with self.assertNumQueries(1):
+            appointment.save(update_fields=["comment"])
+        with self.assertNumQueries(1):
+            appointment.save(update_fields=["status"])
+
+    def test_quantity_multiplies_hours_and_price(self):
+        from .booking_index import sync_bookings
+        from .models import BookingIndex
+
+        service = Service.objects.create(salon=self.salon, name_ru="Игра", price=15000, duration_minutes=90)
+        pk = Appointment.objects.create(
+            client=self.booker, salon=self.salon, service=service,
+            start_time=timezone.now() + timedelta(days=2), quantity=3,
+        ).pk
+        expected = {"quantity": 3, "hours": Decimal("4.50"), "price": Decimal("45000.00")}
+        row = BookingIndex.objects.filter(kind="appointment", booking_id=pk)
+
+        self.assertEqual(row.values(*expected).get(), expected)
+        row.delete()
+        sync_bookings("appointment", [pk])
+        self.assertEqual(row.values(*expected).get(), expected)
+
+
+# =====================================================================
+# REMINDERS
+# =====================================================================
+
+class _TelegramStub(BaseHTTPRequestHandler):
+    """Stands in for the Telegram Bot API; answers with server.status."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.hits += 1
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+class ReminderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _TelegramStub)
+        cls.server.hits = 0
+        cls.server.status = 200
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        from accounts.models import Profile
+
+        User = get_user_model()
+        owner = User.objects.create_user("remind_owner", "remind_owner@example.com", "pw")
+        cls.client_user = User.objects.create_user("remind_client", "remind_client@example.com", "pw")
+        Profile.objects.update_or_create(user=cls.client_user, defaults={"telegram_id": "42"})
+        cls.salon = Salon.objects.create(name="Remind", owner=owner, address="Tashkent", phone="+998900000003")
+        cls.service = Service.objects.create(salon=cls.salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        cls.master = Master.objects.create(salon=cls.salon, name="Master")
+        cls.now = timezone.now().replace(microsecond=0)
+
+    def setUp(self):
+        settings = override_settings(
+            TELEGRAM_API_URL=f"http://127.0.0.1:{self.server.server_address[1]}",
+            TELEGRAM_BOT_TOKEN="test", SMS_BACKEND="",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.server.hits = 0
+        self.server.status = 200
+
+    def book(self, ahead):
+        start = self.now + ahead
+        booking = Appointment.objects.create(
+            client=self.client_user, salon=self.salon, master=self.master, service=self.service,
+            start_time=start, end_time=start + timedelta(hours=1), status="confirmed",
+        )
+        self.server.hits = 0  # the "booking request sent" message
+        return booking
+
+    def queued(self):
+        from .models import BookingReminder
+
+        return sorted(BookingReminder.objects.values_list("appointment_id", "kind"))
+
+    def test_each_booking_is_queued_in_its_nearest_window(self):
+        from .reminders import queue_due_reminders
+
+        soon = self.book(timedelta(minutes=30))
+        later = self.book(timedelta(hours=5))
+        self.book(timedelta(hours=30))
+
+        self.assertEqual(queue_due_reminders(self.now), 2)
+        self.assertEqual(self.queued(), sorted([(soon.pk, "1h"), (later.pk, "24h")]))
+
+    def test_requeuing_is_a_no_op(self):
+        from .reminders import queue_due_reminders
+
+        booking = self.book(timedelta(hours=5))
+        queue_due_reminders(self.now)
+        self.assertEqual(queue_due_reminders(self.now), 0)
+
+        # Closer to the start only the "1h" reminder is added.
+        self.assertEqual(queue_due_reminders(self.now + timedelta(hours=4, minutes=30)), 1)
+        self.assertEqual(self.queued(), [(booking.pk, "1h"), (booking.pk, "24h")])
+
+    def test_failed_delivery_is_retried_then_sent(self):
+        from .models import BookingReminder
+        from .reminders import RETRY_DELAY, deliver_queued_reminders
+
+        booking = self.book(timedelta(hours=5))
+        reminder = BookingReminder.objects.create(appointment=booking, kind="24h")
+
+        self.server.status = 500
+        self.assertEqual(deliver_queued_reminders(now=self.now), 1)
+        # Not due again until RETRY_DELAY has passed.
+        self.assertEqual(deliver_queued_reminders(now=self.now), 0)
+
+        self.server.status = 200
+        self.assertEqual(deliver_queued_reminders(now=self.now + RETRY_DELAY), 1)
+        reminder.refresh_from_db()
+        self.assertIsNotNone(reminder.sent_at)
+        self.assertEqual(reminder.attempts, 2)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        from .models import BookingReminder
+        from .reminders import MAX_ATTEMPTS, RETRY_DELAY, deliver_queued_reminders
+
+        reminder = BookingReminder.objects.create(appointment=self.book(timedelta(hours=5)), kind="24h")
+        self.server.status = 500
+        for attempt in range(MAX_ATTEMPTS + 1):
+            deliver_queued_reminders(now=self.now + RETRY_DELAY * attempt)
+
+        reminder.refresh_from_db()
+        self.assertIsNone(reminder.sent_at)
+        self.assertEqual(reminder.attempts, MAX_ATTEMPTS)
+        self.assertEqual(self.server.hits, MAX_ATTEMPTS)
+
+
+# =====================================================================
+# MEDIA STORAGE
+# =====================================================================
+
+class MediaPruneTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def save_old(self, content):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        name = default_storage.save("upload.png", ContentFile(content))
+        old = clock.time() - 3 * 86400
+        os.utime(default_storage.path(name), (old, old))
+        return name
+
+    def test_reuploaded_file_survives_prune(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        orphan = self.save_old(b"orphan")
+        reused = self.save_old(b"reused")
+        # Same bytes again: a dedup hit, which must restart the grace period.
+        self.assertEqual(default_storage.save("again.png", ContentFile(b"reused")), reused)
+
+        call_command("prune_media", min_age=24, stdout=StringIO())
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(reused))
+
+
+class ImageWorkerTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Anything over 2 * 1000 pixels is a decompression bomb here.
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, 1000
+        self.addCleanup(setattr, Image, "MAX_IMAGE_PIXELS", limit)
+        self.owner = get_user_model().objects.create_user("images_owner", "images_owner@example.com", "pw")
+
+    def salon(self, cover):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return Salon.objects.create(
+            name="Images", owner=self.owner, address="Tashkent", phone="+998900000003",
+            cover=SimpleUploadedFile("cover.png", cover, content_type="image/png"),
+        )
+
+    def test_bad_images_fail_alone(self):
+        from .images import process_pending_images
+
+        # Lowest pks first: the bad rows come before the good one in the batch.
+        bomb = self.salon(_png((100, 100)))
+        broken = self.salon(b"not a png")
+        good = self.salon(_png((30, 20)))
+
+        self.assertEqual(process_pending_images(), 3)
+
+        for salon in (bomb, broken, good):
+            salon.refresh_from_db()
+            self.assertFalse(salon.images_pending)
+        self.assertEqual(bomb.current_variants("cover"), {})
+        self.assertEqual(broken.current_variants("cover"), {})
+        self.assertEqual(good.current_variants("cover")["card"]["w"], 30)
+        self.assertEqual(process_pending_images(), 0)
+
+
+# =====================================================================
+# OWNER DASHBOARD
+# =====================================================================
+
+class DashboardScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user("scope_owner", "scope_owner@example.com", "pw")
+        client = User.objects.create_user("scope_client", "scope_client@example.com", "pw")
+        cls.master_user = User.objects.create_user("scope_master", "scope_master@example.com", "pw")
+        cls.salon = Salon.objects.create(name="Scope", owner=owner, address="Tashkent", phone="+998900000002")
+        service = Service.objects.create(salon=cls.salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        cls.master = Master.objects.create(salon=cls.salon, name="Own", user=cls.master_user)
+        colleague = Master.objects.create(salon=cls.salon, name="Colleague")
+        start = timezone.now() + timedelta(days=2)
+        cls.own, cls.other = (
+            Appointment.objects.create(
+                client=client, salon=cls.salon, master=master, service=service,
+                start_time=start, end_time=start + timedelta(hours=1), status="confirmed",
+            )
+            for master in (cls.master, colleague)
+        )
+
+    def test_master_sees_only_own_appointments(self):
+        from .dashboard import build_owner_dashboard
+
+        context = build_owner_dashboard(self.master_user)
+        self.assertEqual(context["salons"], [self.salon])
+        self.assertEqual(context["bookings_upcoming"], [self.own])
+
+    def test_owner_sees_every_appointment(self):
+        from .dashboard import build_owner_dashboard
+
+        context = build_owner_dashboard(self.salon.owner)
+        self.assertCountEqual(context["bookings_upcoming"], [self.own, self.other])
+
+
+class EventPruneTests(TestCase):
+    def test_unrolled_events_survive_until_safety_ttl(self):
+        from .events import EVENT_TTL, UNROLLED_EVENT_TTL, prune_events
+        from .models import BookingEvent
+
+        now = timezone.now()
+        ages = {
+            "fresh": (timedelta(minutes=5), True),
+            "rolled": (EVENT_TTL + timedelta(minutes=5), True),
+            "unrolled": (EVENT_TTL + timedelta(minutes=5), False),
+            "stale": (UNROLLED_EVENT_TTL + timedelta(minutes=5), False),
+        }
+        for status, (age, rolled_up) in ages.items():
+            event = BookingEvent.objects.create(kind="appointment", booking_id=1, status=status, rolled_up=rolled_up)
+            BookingEvent.objects.filter(pk=event.pk).update(created_at=now - age)
+
+        self.assertEqual(prune_events(now), 2)
+        self.assertCountEqual(BookingEvent.objects.values_list("status", flat=True), ["fresh", "unrolled"])
+
+
+# =====================================================================
+# EXPORTS
+# =====================================================================
+
+class ExportTests(TestCase):
+    PAYLOAD = '=HYPERLINK("http://evil.example","x")'
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user("export_owner", "export_owner@example.com", "pw")
+        client = User.objects.create_user("export_client", "export_client@example.com", "pw", first_name="@cmd")
+        salon = Salon.objects.create(name="Export", owner=cls.owner, address="Tashkent", phone="+998900000004")
+        service = Service.objects.create(salon=salon, name_ru="Стрижка", price=100000, duration_minutes=60)
+        master = Master.objects.create(salon=salon, name="Master")
+        start = timezone.now() - timedelta(days=3)
+        Appointment.objects.create(
+            client=client, salon=salon, master=master, service=service, comment=cls.PAYLOAD,
+            start_time=start, end_time=start + timedelta(hours=1), status="completed",
+        )
+
+    def export(self, fmt):
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse("marketplace:export_bookings", args=["appointments"]), {"format": fmt},
+        )
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        body = self.export("csv").decode("utf-8-sig")
+        self.assertIn("\"'=HYPERLINK(\"\"http://evil.example\"\",\"\"x\"\")\"", body)
+        self.assertIn(",'@cmd,", body)
+
+    def test_xlsx_cells_are_inline_strings(self):
+        with zipfile.ZipFile(BytesIO(self.export("xlsx"))) as package:
+            self.assertIsNone(package.testzip())
+            sheet = package.read("xl/worksheets/sheet1.xml").decode()
+        self.assertNotIn("<f>", sheet)
+        self.assertIn(f'<c t="inlineStr"><is><t xml:space="preserve">{self.PAYLOAD}</t></is></c>', sheet)
+
+
+# =====================================================================
+# METRICS
+# =====================================================================
+
+@override_settings(METRICS_TOKEN="scrape-token")
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+        settings = override_settings(METRICS_DIR=self.metrics_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(setattr, instrumentation.REGISTRY, "_owner", instrumentation.REGISTRY._owner)
+
+    def write(self, pid, value):
+        snapshot = {"counters": [["test_total", [["view", "x"]], value]], "histograms": []}
+        with open(os.path.join(self.metrics_dir, f"{pid}.json"), "w") as f:
+            json.dump(snapshot, f)
+
+    def total(self):
+        line = next(l for l in instrumentation.render_metrics().splitlines() if l.startswith("test_total"))
+        return float(line.rsplit(" ", 1)[1])
+
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-token").status_code, 200)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-tokex").status_code, 404)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ключ").status_code, 404)
+
+    def test_exited_worker_is_archived(self):
+        exited = subprocess.Popen(["true"])
+        exited.wait()
+        self.write(exited.pid, 3)
+
+        self.assertEqual(self.total(), 3)
+        self.assertFalse(os.path.exists(os.path.join(self.metrics_dir, f"{exited.pid}.json")))
+        self.assertEqual(self.total(), 3)
+
+    def test_reused_pid_does_not_lower_counters(self):
+        # A previous worker with this process's pid left its snapshot behind.
+        self.write(os.getpid(), 5)
+        instrumentation.REGISTRY._owner = None
+
+        self.assertEqual(self.total(), 5)
+        instrumentation.REGISTRY.maybe_flush()
+        self.assertEqual(self.total(), 5)
+
+
+# =====================================================================
+# LOGGING
+# =====================================================================
+
+class _BlockingStream:
+    """Stream whose first write waits for `release`, as a stalled stdout would."""
+
+    def __init__(self):
+        self.lines = []
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait(5)
+        self.lines.append(text)
+
+    def flush(self):
+        pass
+
+
+class LoggingTests(SimpleTestCase):
+    def record(self, msg, *args, fields=None, exc_info=None):
+        record = logging.LogRecord("marketplace.test", logging.ERROR, __file__, 1, msg, args, exc_info)
+        if fields is not None:
+            record.fields = fields
+        return record
+
+    def test_redact_masks_phones_and_secrets(self):
+        from config.log import redact
+
+        for phone in ("+998 90 123 45 67", "998-90-123-45-67", "+998 (90) 123-45-67", "998901234567", "(90) 123-45-67"):
+            self.assertEqual(redact(f"to {phone}."), "to ***67.", phone)
+        self.assertEqual(redact("GET /bot123:AbC-9/sendMessage code=4821"), "GET /bot***/sendMessage code=***")
+
+    def test_redact_leaves_ids_and_card_numbers(self):
+        from config.log import redact
+
+        for text in (
+            "SELECT ... WHERE id IN (123456789)", "card 4111 1111 1111 1111",
+            "2026-10-19 12:52:13.745", "amount 150000000",
+        ):
+            self.assertEqual(redact(text), text)
+
+    def test_filter_redacts_message_fields_and_traceback(self):
+        from config.log import RedactFilter
+
+        try:
+            raise ValueError("token=abc123 for +998901234567")
+        except ValueError:
+            record = self.record(
+                "sms to %s", "+998 90 123 45 67",
+                fields={"phone": "+998 90 123 45 67", "code": "4821", "url": "/bot1:x/send", "status": 200},
+                exc_info=sys.exc_info(),
+            )
+
+        self.assertTrue(RedactFilter().filter(record))
+        self.assertEqual(record.getMessage(), "sms to ***67")
+        self.assertEqual(record.fields, {"phone": "***67", "code": "***", "url": "/bot***/send", "status": 200})
+        self.assertIn("ValueError: token=*** for ***67", record.exc_text)
+
+    def test_json_formatter_writes_fields_and_traceback(self):
+        from config.log import JsonFormatter
+
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = self.record("sent %d", 3, fields={"status": 502, "level": "spoofed"}, exc_info=sys.exc_info())
+
+        data = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(
+            {key: data[key] for key in ("level", "logger", "message", "status")},
+            {"level": "ERROR", "logger": "marketplace.test", "message": "sent 3", "status": 502},
+        )
+        self.assertTrue(data["exc"].endswith("ValueError: boom"))
+        datetime.fromisoformat(data["ts"])
+
+    def test_handler_drops_records_when_the_queue_is_full(self):
+        from config.log import QueuedStreamHandler
+
+        stream = _BlockingStream()
+        handler = QueuedStreamHandler(stream="stderr", maxsize=1)
+        self.addCleanup(handler.close)
+        self.addCleanup(stream.release.set)
+        with redirect_stderr(stream):
+            handler.handle(self.record("first"))
+            self.assertTrue(stream.writing.wait(5))  # the listener holds "first"
+            handler.handle(self.record("second"))  # fills the queue
+            handler.handle(self.record("third"))
+
+        self.assertEqual(handler.dropped, 1)
+        stream.release.set()
+        handler.close()
+        self.assertEqual(stream.lines, ["first\n", "second\n"])
+
+
+# =====================================================================
+# VIEW BUDGETS
+# =====================================================================
+
+# Every view of marketplace, pc_clubs and accounts against a seeded
+# dataset (seed_marketplace): url name -> (queries, max ms). Each request
+# must answer with its expected status, so a redirect to login or a form
+# error cannot pass for the measured path. Query counts are exact: a new
+# N+1 fails here, and so does a drop until the budget records it.
+# Latency is only checked with VIEW_BUDGET_SCALE set (1 locally, 2 or
+# more on slow CI): wall-clock limits are too noisy for every run.
+VIEW_BUDGETS = {
+    "marketplace:home": (1, 200),
+    "marketplace:nearby_salons": (1, 200),
+    "marketplace:salon_list_by_category": (7, 250),
+    "marketplace:salon_list": (5, 250),
+    "marketplace:salon_detail": (6, 250),
+    "marketplace:my_bookings": (4, 200),
+    "marketplace:my_bookings_history": (3, 150),
+    "marketplace:cancel_booking": (5, 150),
+    "marketplace:booking_start": (7, 200),
+    "marketplace:booking_success": (3, 150),
+    "marketplace:api_slots": (5, 150),
+    "marketplace:owner_dashboard": (9, 500),
+    "marketplace:owner_dashboard_events": (6, 150),
+    "marketplace:owner_analytics": (9, 300),
+    "marketplace:export_bookings": (6, 300),
+    "marketplace:accept_booking": (5, 150),
+    "marketplace:decline_booking": (5, 150),
+    "marketplace:appointment_change_status": (7, 150),
+    "marketplace:ajax_booking_form": (3, 150),
+    "marketplace:salon_search": (0, 100),
+    "marketplace:submit_business_lead": (1, 100),
+    "marketplace:serve_doc": (0, 100),
+    "marketplace:image_proxy": (0, 100),
+    "pc_clubs:list": (4, 250),
+    "pc_clubs:list_by_category": (3, 250),
+    "pc_clubs:detail": (4, 250),
+    "pc_clubs:book": (11, 200),
+    "pc_clubs:booking_change_status": (6, 150),
+    "accounts:login": (2, 150),
+    "accounts:login_register": (2, 150),
+    "accounts:set_language": (7, 150),
+    "accounts:settings": (6, 250),
+    "accounts:logout": (4, 100),
+    "accounts:verify_phone": (1, 100),
+    "accounts:password_reset_request": (0, 100),
+    "accounts:password_reset_verify": (1, 100),
+    "accounts:password_reset_confirm": (0, 100),
+}
+BUDGET_SCALE = float(os.environ["VIEW_BUDGET_SCALE"]) if os.environ.get("VIEW_BUDGET_SCALE") else None
+
+
+def _url_names(namespace):
+    resolver = get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver) and pattern.namespace == namespace:
+            for sub in pattern.url_patterns:
+                if isinstance(sub, URLPattern) and sub.name:
+                    yield f"{namespace}:{sub.name}"
+
+
+@override_settings(
+    TELEGRAM_BOT_TOKEN=None, BUSINESS_LEADS_TELEGRAM_ID=None, SMS_BACKEND="",
+    BOOKING_EVENTS_STREAM_SECONDS=0,
+)
+class ViewBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from accounts.models import Profile
+        from pc_clubs.models import PCBooking, PCClub
+
+        random.seed(45)
+        Faker.seed(45)
+        call_command("seed_marketplace", salons_per_sub=1, stdout=StringIO())
+
+        User = get_user_model()
+        cls.owner = User.objects.filter(is_staff=True).first()
+        cls.venue_owner = User.objects.get(username="demo_venue_owner")
+        cls.client_user = User.objects.get(username="user_0")
+        for user in (cls.owner, cls.venue_owner, cls.client_user):
+            Profile.objects.get_or_create(user=user, defaults={"phone": "+998901234567"})
+
+        cls.salon = Salon.objects.filter(owner=cls.owner, services__isnull=False).distinct().first()
+        cls.service = cls.salon.services.first()
+        cls.master = master = cls.salon.masters.filter(is_active=True).first()
+        start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=30), time(10)))
+        cls.pending = [
+            Appointment.objects.create(
+                client=cls.client_user, salon=cls.salon, master=master, service=cls.service,
+                start_time=start + timedelta(hours=i * 2), status="pending",
+            )
+            for i in range(4)
+        ]
+
+        cls.club = PCClub.objects.filter(owner=cls.venue_owner).first()
+        cls.plan = cls.club.plans.first()
+        cls.pc_booking = PCBooking.objects.create(
+            client=cls.client_user, pc_club=cls.club, plan=cls.plan,
+            start_time=start, end_time=start + timedelta(hours=1), status="pending",
+        )
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings = override_settings(IMAGE_PROXY_CACHE_DIR=cache_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Served from the proxy cache: no network in tests.
+        image_proxy.store("https://example.com/cover.jpg", "card", image_proxy.encode(_png(), "card"))
+
+    def view_requests(self):
+        """url name -> (expected status or redirect target, user, method, path, data, session)."""
+        salon, service, club = self.salon, self.service, self.club
+        day = (timezone.localdate() + timedelta(days=30)).isoformat()
+        reg = {"first_name": "Test", "last_name": "User", "phone": "+998901234567", "password": "x"}
+        return {
+            "marketplace:home": (200, None, "get", reverse("marketplace:home"), {}, {}),
+            "marketplace:nearby_salons": (200, None, "get", reverse("marketplace:nearby_salons"), {"lat": "41.31", "lng": "69.28"}, {}),
+            "marketplace:salon_list_by_category": (200, None, "get", reverse("marketplace:salon_list_by_category", args=[salon.category.slug]), {}, {}),
+            "marketplace:salon_list": (200, None, "get", reverse("marketplace:salon_list"), {}, {}),
+            "marketplace:salon_detail": (200, None, "get", reverse("marketplace:salon_detail", args=[salon.pk]), {}, {}),
+            "marketplace:my_bookings": (200, self.client_user, "get", reverse("marketplace:my_bookings"), {}, {}),
+            "marketplace:my_bookings_history": (200, self.client_user, "get", reverse("marketplace:my_bookings_history"), {}, {}),
+            "marketplace:cancel_booking": (reverse("marketplace:my_bookings"), self.client_user, "post", reverse("marketplace:cancel_booking", args=[self.pending[0].pk]), {}, {}),
+            "marketplace:booking_start": (200, self.client_user, "get", reverse("marketplace:booking_start", args=[salon.pk, service.pk]), {}, {}),
+            "marketplace:booking_success": (200, self.client_user, "get", reverse("marketplace:booking_success", args=[salon.pk]), {}, {}),
+            "marketplace:api_slots": (200, None, "get", reverse("marketplace:api_slots", args=[salon.pk, service.pk]), {"master": self.master.pk, "date": day}, {}),
+            "marketplace:owner_dashboard": (200, self.owner, "get", reverse("marketplace:owner_dashboard"), {}, {}),
+            "marketplace:owner_dashboard_events": (200, self.owner, "get", reverse("marketplace:owner_dashboard_events"), {}, {}),
+            "marketplace:owner_analytics": (200, self.owner, "get", reverse("marketplace:owner_analytics"), {}, {}),
+            "marketplace:export_bookings": (200, self.owner, "get", reverse("marketplace:export_bookings", args=["appointments"]), {}, {}),
+            "marketplace:accept_booking": (reverse("marketplace:owner_dashboard"), self.owner, "post", reverse("marketplace:accept_booking", args=[self.pending[1].pk]), {}, {}),
+            "marketplace:decline_booking": (reverse("marketplace:owner_dashboard"), self.owner, "post", reverse("marketplace:decline_booking", args=[self.pending[2].pk]), {}, {}),
+            "marketplace:appointment_change_status": (200, self.owner, "post", reverse("marketplace:appointment_change_status", args=[self.pending[3].pk]), {"status": "confirmed"}, {}),
+            "marketplace:ajax_booking_form": (200, None, "get", reverse("marketplace:ajax_booking_form", args=[salon.pk, service.pk]), {}, {}),
+            "marketplace:salon_search": (f"{reverse('marketplace:salon_list')}?{urlencode({'q': salon.name[:4]})}", None, "get", reverse("marketplace:salon_search"), {"q": salon.name[:4]}, {}),
+            "marketplace:submit_business_lead": (200, None, "post", reverse("marketplace:submit_business_lead"), {"phone": "+998901234567", "description": "Новый салон"}, {}),
+            "marketplace:serve_doc": (200, None, "get", reverse("marketplace:serve_doc", args=["oferta"]), {}, {}),
+            "marketplace:image_proxy": (200, None, "get", image_proxy.proxy_url("https://example.com/cover.jpg", "card"), {}, {}),
+            "pc_clubs:list": (200, None, "get", reverse("pc_clubs:list"), {}, {}),
+            "pc_clubs:list_by_category": (200, None, "get", reverse("pc_clubs:list_by_category", args=[club.category.slug]), {}, {}),
+            "pc_clubs:detail": (200, None, "get", reverse("pc_clubs:detail", args=[club.pk]), {}, {}),
+            "pc_clubs:book": (200, self.client_user, "post", reverse("pc_clubs:book", args=[club.pk]), {"plan_id": self.plan.pk, "quantity": 1, "hours": 2, "date": day, "time": "15:00"}, {}),
+            "pc_clubs:booking_change_status": (200, self.venue_owner, "post", reverse("pc_clubs:booking_change_status", args=[self.pc_booking.pk]), {"status": "confirmed"}, {}),
+            "accounts:login": (200, None, "get", reverse("accounts:login"), {}, {}),
+            "accounts:login_register": (200, None, "get", reverse("accounts:login_register"), {}, {}),
+            "accounts:set_language": ("/", self.client_user, "post", reverse("accounts:set_language"), {"language": "en", "next": "/"}, {}),
+            "accounts:settings": (200, self.owner, "get", reverse("accounts:settings"), {}, {}),
+            "accounts:logout": ("/", self.client_user, "get", reverse("accounts:logout"), {}, {}),
+            "accounts:verify_phone": (200, None, "get", reverse("accounts:verify_phone"), {}, {"reg_pending": reg, "reg_otp_expires": clock.time() + 300, "reg_otp_sent_at": clock.time()}),
+            "accounts:password_reset_request": (200, None, "get", reverse("accounts:password_reset_request"), {}, {}),
+            "accounts:password_reset_verify": (200, None, "get", reverse("accounts:password_reset_verify"), {}, {"reset_email": "user_0@example.com"}),
+            "accounts:password_reset_confirm": (200, None, "get", reverse("accounts:password_reset_confirm"), {"email": "user_0@example.com", "code": "000000"}, {}),
+        }
+
+    def measure(self, user, method, path, data, session):
+        """(response, queries, ms) of one request, its writes rolled back."""
+        self.client.logout()
+        if user is not None:
+            self.client.force_login(user)
+        if session:
+            store = self.client.session
+            store.update(session)
+            store.save()
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = clock.perf_counter()
+                response = getattr(self.client, method)(path, data)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                elapsed = (clock.perf_counter() - started) * 1000
+            transaction.set_rollback(True)
+        return response, queries, elapsed
+
+    def test_every_view_has_a_budget(self):
+        names = {name for ns in ("marketplace", "pc_clubs", "accounts") for name in _url_names(ns)}
+        self.assertEqual(names - set(VIEW_BUDGETS), set(), "views without a budget")
+        self.assertEqual(set(self.view_requests()), set(VIEW_BUDGETS))
+
+    def test_views_stay_within_budget(self):
+        for name, (expected, *spec) in self.view_requests().items():
+            budget_queries, max_ms = VIEW_BUDGETS[name]
+            with self.subTest(view=name):
+                self.measure(*spec)  # warm-up: template loading, first-request caches
+                response, queries, ms = self.measure(*spec)
+                if isinstance(expected, str):
+                    self.assertRedirects(response, expected, fetch_redirect_response=False)
+                else:
+                    self.assertEqual(response.status_code, expected, f"{name}: status {response.status_code}")
+                self.assertEqual(
+                    len(queries), budget_queries,
+                    f"{name}: {len(queries)} queries, budget {budget_queries}\n"
+                    + "\n".join(q["sql"] for q in queries.captured_queries),
+                )
+                if BUDGET_SCALE is not None:
+                    self.assertLessEqual(ms, max_ms * BUDGET_SCALE, f"{name}: {ms:.0f} ms, budget {max_ms} ms")
@@ -0,0 +1,78 @@
+"""
+Client booking timeline for my_bookings.
+
+Appointments and PC bookings are read together from the BookingIndex
+read model with one query on its (client, -start_time, -id) index.
+
+History is keyset-paginated on (start_time, id) descending. The opaque
+cursor string encodes the last row shown.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import get_language
+
+from .models import Appointment, BookingIndex
+
+PAGE_SIZE = 20
+ACTIVE_STATUSES = ("pending", "confirmed")
+STATUS_LABELS = dict(Appointment.STATUS_CHOICES)
+
+FIELDS = (
+    "pk", "kind", "booking_id", "start_time", "status",
+    "venue_id", "venue_name", "item_name", "item_name_en", "item_name_uz",
+)
+
+
+def _entries(qs):
+    lang = (get_language() or "ru")[:2]
+    rows = []
+    for row in qs.values(*FIELDS):
+        row["id"] = row["booking_id"]
+        row["item_name"] = row.get(f"item_name_{lang}") or row["item_name"]
+        row["status_display"] = STATUS_LABELS.get(row["status"], row["status"])
+        rows.append(row)
+    return rows
+
+
+def upcoming(user, now=None):
+    now = now or timezone.now()
+    qs = BookingIndex.objects.filter(client=user, start_time__gte=now, status__in=ACTIVE_STATUSES)
+    # Upcoming lists stay short; the cap only guards against abuse.
+    return _entries(qs.order_by("start_time", "id")[:200])
+
+
+def encode_cursor(row):
+    raw = f"{row['start_time'].isoformat()}~{row['pk']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(start_time, index row id) or None for a missing/garbled cursor."""
+    try:
+        start, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("~")
+        return datetime.fromisoformat(start), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def history(user, cursor=None, now=None, page_size=PAGE_SIZE):
+    """
+    One page of past bookings (started already, or cancelled/completed),
+    newest first. Returns (rows, next_cursor or None).
+    """
+    now = now or timezone.now()
+    qs = BookingIndex.objects.filter(client=user).filter(
+        Q(start_time__lt=now) | ~Q(status__in=ACTIVE_STATUSES)
+    )
+    if cursor:
+        start, pk = cursor
+        qs = qs.filter(Q(start_time__lt=start) | Q(start_time=start, id__lt=pk))
+
+    # One extra row tells whether another page exists.
+    rows = _entries(qs.order_by("-start_time", "-id")[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -10,6 +10,7 @@ urlpatterns = [
     path("salons/", views.salon_list, name="salon_list"),
     path("salon/<int:salon_id>/", views.salon_detail, name="salon_detail"),
     path("my-bookings/", views.my_bookings, name="my_bookings"),
+    path("my-bookings/history/", views.my_bookings_history, name="my_bookings_history"),
     path("booking/<int:appointment_id>/cancel/", views.cancel_booking, name="cancel_booking"),
 
     path("salon/<int:salon_id>/service/<int:service_id>/book/", views.booking_start, name="booking_start"),
@@ -18,6 +19,9 @@ urlpatterns = [
     path("api/salon/<int:salon_id>/service/<int:service_id>/slots/", views.api_slots, name="api_slots"),
 
     path("business/dashboard/", views.owner_dashboard, name="owner_dashboard"),
+    path("business/dashboard/events/", views.owner_dashboard_events, name="owner_dashboard_events"),
+    path("business/analytics/", views.owner_analytics, name="owner_analytics"),
+    path("business/export/<slug:kind>/", views.export_bookings, name="export_bookings"),
 
     # NEW: provider actions on pending bookings
     path("business/booking/<int:appointment_id>/accept/", views.accept_booking, name="accept_booking"),
@@ -32,4 +36,5 @@ urlpatterns = [
     path("business-lead/", views.submit_business_lead, name="submit_business_lead"),
 
     path("docs/<str:doc_type>/", views.serve_doc, name="serve_doc"),
+    path("img/<str:token>/", views.image_proxy, name="image_proxy"),
 ]
\ No newline at end of file
@@ -1,17 +1,25 @@
+import asyncio
+import logging
 from datetime import datetime, timedelta
 
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q
 from django.utils import timezone
 
 import requests
 from django.conf import settings
 
-from .models import Appointment, SalonWorkingHours
+from config.instrumentation import track_external
+
+from . import clock
+from .models import SLOT_TAKEN_CONSTRAINT, Appointment, SalonWorkingHours
+
+logger = logging.getLogger(__name__)
 
 
 def get_available_slots(*, salon, master, service, date_obj, interval_minutes=15):
     """
-    Returns list[datetime] (timezone-aware) for available start times.
+    Returns list[datetime] (aware, UTC) for available start times.
 
     Rules:
     - uses SalonWorkingHours for weekday schedule
@@ -30,25 +38,22 @@ def get_available_slots(*, salon, master, service, date_obj, interval_minutes=15
     if not wh or wh.is_closed or not wh.open_time or not wh.close_time:
         return []
 
-    # 2) Build aware start/end window for that date
-    tz = timezone.get_current_timezone()
-
-    start_naive = datetime.combine(date_obj, wh.open_time)
-    end_naive = datetime.combine(date_obj, wh.close_time)
-
-    start_dt = timezone.make_aware(start_naive, tz)
-    end_dt = timezone.make_aware(end_naive, tz)
+    # 2) Opening window as UTC minutes since the epoch
+    ctx = clock.current()
+    start_dt = ctx.aware(datetime.combine(date_obj, wh.open_time))
+    end_dt = ctx.aware(datetime.combine(date_obj, wh.close_time))
 
     # If close_time is past midnight (rare) you can handle it like this:
     if end_dt <= start_dt:
         end_dt = end_dt + timedelta(days=1)
 
-    duration = timedelta(minutes=int(service.duration_minutes))
-    step = timedelta(minutes=int(interval_minutes))
+    open_m = clock.to_minutes(start_dt)
+    duration = int(service.duration_minutes)
+    step = int(interval_minutes)
 
     # Latest start time so that service fits before closing
-    latest_start = end_dt - duration
-    if latest_start < start_dt:
+    latest_start = clock.to_minutes(end_dt) - duration
+    if latest_start < open_m:
         return []
 
     # 3) Pull existing appointments to exclude overlaps
@@ -58,60 +63,50 @@ def get_available_slots(*, salon, master, service, date_obj, interval_minutes=15
         .filter(master=master, salon=salon)
         .filter(status__in=["pending", "confirmed", "completed"])
         .filter(start_time__lt=end_dt, end_time__gt=start_dt)  # overlaps window
+        .order_by("start_time")
         .values_list("start_time", "end_time")
     )
 
+    # Merged into disjoint, sorted [start, end) minute ranges.
     busy_ranges = []
     for a_start, a_end in busy:
-        if timezone.is_naive(a_start):
-            a_start = timezone.make_aware(a_start, tz)
-        if timezone.is_naive(a_end):
-            a_end = timezone.make_aware(a_end, tz)
-        busy_ranges.append((a_start, a_end))
-
-    # 4) Generate candidates
-    now = timezone.localtime(timezone.now(), tz)
+        b_start, b_end = clock.to_minutes(a_start), clock.to_minutes_ceil(a_end)
+        if busy_ranges and b_start <= busy_ranges[-1][1]:
+            busy_ranges[-1][1] = max(busy_ranges[-1][1], b_end)
+        else:
+            busy_ranges.append([b_start, b_end])
+
+    # 4) Generate candidates; the busy pointer only moves forward.
+    # Past times are excluded if today (t <= now).
+    not_after = ctx.now_minutes if date_obj == ctx.today else None
     candidates = []
-    t = start_dt
-    while t <= latest_start:
-        # exclude past times if today
-        if date_obj == now.date() and t <= now:
-            t += step
+    i = 0
+    for t in range(open_m, latest_start + 1, step):
+        if not_after is not None and t <= not_after:
             continue
-
-        # overlap check
-        cand_end = t + duration
-        overlapped = False
-        for b_start, b_end in busy_ranges:
-            if t < b_end and cand_end > b_start:
-                overlapped = True
-                break
-
-        if not overlapped:
-            candidates.append(t)
-
-        t += step
+        while i < len(busy_ranges) and busy_ranges[i][1] <= t:
+            i += 1
+        if i < len(busy_ranges) and busy_ranges[i][0] < t + duration:
+            continue
+        candidates.append(clock.from_minutes(t))
 
     return candidates
 
 def _pcs_booked_at(salon, start_dt, end_dt):
     """Count PCs booked during [start_dt, end_dt) at this salon."""
+    from django.db.models import Sum
     from .models import Appointment
-    from datetime import timedelta
 
-    overlapping = Appointment.objects.filter(
+    # Runs under the salon row lock in booking_start: one aggregate over
+    # the overlapping rows (appt_salon_status_start_idx), end_time being
+    # set from the service duration on save.
+    return Appointment.objects.filter(
         salon=salon,
         status__in=["pending", "confirmed"],
+        service__isnull=False,
         start_time__lt=end_dt,
-    )
-    total = 0
-    for appt in overlapping:
-        if not appt.service:
-            continue
-        appt_end = appt.start_time + timedelta(minutes=appt.service.duration_minutes)
-        if appt_end > start_dt:
-            total += getattr(appt, "quantity", 1) or 1
-    return total
+        end_time__gt=start_dt,
+    ).aggregate(total=Sum("quantity"))["total"] or 0
 
 
 def can_book_pc_quantity(salon, service, start_dt, quantity):
@@ -126,107 +121,313 @@ def can_book_pc_quantity(salon, service, start_dt, quantity):
     return (available >= quantity, available)
 
 
+def is_slot_taken_error(exc):
+    """True if an IntegrityError was raised by the appointment overlap constraint."""
+    diag = getattr(getattr(exc, "__cause__", None), "diag", None)
+    return getattr(diag, "constraint_name", None) == SLOT_TAKEN_CONSTRAINT
+
+
+def complete_overdue_bookings(now=None):
+    """
+    Mark confirmed Appointment / PCBooking rows whose end time has passed as
+    completed, with one set-based UPDATE per model, and mirror the change
+    into BookingIndex and the dashboard events in bulk (queryset.update()
+    skips post_save).
+    Runs from the `complete_overdue_bookings` command, not from page views.
+    Returns {"appointments": n, "pc_bookings": m}.
+    """
+    from pc_clubs.models import PCBooking
 
+    from .booking_index import set_status
+    from .events import publish_events
+    from .models import BookingEvent
 
+    now = now or timezone.now()
 
-TELEGRAM_API = "https://api.telegram.org/bot{token}/sendMessage"
+    # Legacy appointments without end_time (no service): fall back to `hours`.
+    fallback_end = ExpressionWrapper(
+        F("start_time") + F("hours") * timedelta(hours=1),
+        output_field=DateTimeField(),
+    )
+    with transaction.atomic():
+        overdue = list(
+            Appointment.objects
+            .select_for_update()
+            .filter(status="confirmed")
+            .alias(fallback_end=fallback_end)
+            .filter(Q(end_time__lt=now) | Q(end_time__isnull=True, fallback_end__lt=now))
+            .values_list("pk", "salon_id", "master_id")
+        )
+        Appointment.objects.filter(pk__in=[row[0] for row in overdue]).update(status="completed")
+        set_status("appointment", [row[0] for row in overdue], "completed")
+        publish_events([
+            BookingEvent(kind="appointment", booking_id=pk, salon_id=salon_id, master_id=master_id, status="completed")
+            for pk, salon_id, master_id in overdue
+        ])
+
+    with transaction.atomic():
+        pc_overdue = list(
+            PCBooking.objects
+            .select_for_update()
+            .filter(status="confirmed", end_time__lt=now)
+            .values_list("pk", "pc_club_id")
+        )
+        PCBooking.objects.filter(pk__in=[row[0] for row in pc_overdue]).update(status="completed")
+        set_status("pc_booking", [row[0] for row in pc_overdue], "completed")
+        publish_events([
+            BookingEvent(kind="pc_booking", booking_id=pk, pc_club_id=pc_club_id, status="completed")
+            for pk, pc_club_id in pc_overdue
+        ])
 
+    return {"appointments": len(overdue), "pc_bookings": len(pc_overdue)}
+
+
+
+
+
+TELEGRAM_API = "{base}/bot{token}/sendMessage"
+ESKIZ_API = "https://notify.eskiz.uz/api"
 
-def send_telegram_message(chat_id: str, text: str):
-    if not chat_id:
-        return False
 
-    url = TELEGRAM_API.format(token=settings.TELEGRAM_BOT_TOKEN)
+def _telegram_request(chat_id, text):
+    url = TELEGRAM_API.format(base=settings.TELEGRAM_API_URL.rstrip("/"), token=settings.TELEGRAM_BOT_TOKEN)
     payload = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": "HTML",
     }
+    return url, payload
 
-    try:
-        response = requests.post(url, json=payload, timeout=5)
-        print("Telegram:", response.status_code, response.text)
+
+def _log_telegram_result(chat_id, status: int) -> bool:
+    fields = {"chat_id": chat_id, "status": status}
+    if 200 <= status < 300:
+        logger.info("telegram sent", extra={"fields": fields})
         return True
-    except Exception as e:
-        print("Telegram error:", e)
+    logger.warning("telegram rejected message", extra={"fields": fields})
+    return False
+
+
+def send_telegram_message(chat_id: str, text: str):
+    if not chat_id:
         return False
 
+    url, payload = _telegram_request(chat_id, text)
+    try:
+        with track_external("telegram"):
+            response = requests.post(url, json=payload, timeout=5)
+        return _log_telegram_result(chat_id, response.status_code)
+    except Exception:
+        logger.exception("telegram send failed", extra={"fields": {"chat_id": chat_id}})
+        return False
+
+
+def _eskiz_credentials():
+    return getattr(settings, "ESKIZ_EMAIL", ""), getattr(settings, "ESKIZ_PASSWORD", "")
+
+
+def _eskiz_token_from(body: dict) -> str:
+    token = (body or {}).get("data", {}).get("token", "")
+    if token:
+        # Patch the live settings object so subsequent calls in this process use it
+        settings.ESKIZ_TOKEN = token
+        logger.info("eskiz token refreshed via login")
+    return token
+
 
 def _eskiz_get_token() -> str:
     """Login to Eskiz and return a fresh token."""
-    email    = getattr(settings, "ESKIZ_EMAIL", "")
-    password = getattr(settings, "ESKIZ_PASSWORD", "")
+    email, password = _eskiz_credentials()
     if not email or not password:
         return ""
     try:
-        r = requests.post(
-            "https://notify.eskiz.uz/api/auth/login",
-            data={"email": email, "password": password},
-            timeout=10,
-        )
-        token = r.json().get("data", {}).get("token", "")
-        if token:
-            # Patch the live settings object so subsequent calls in this process use it
-            settings.ESKIZ_TOKEN = token
-            print(f"[SMS] Eskiz token refreshed via login.")
-        return token
-    except Exception as e:
-        print(f"[SMS] Eskiz login error: {e}")
+        with track_external("eskiz"):
+            r = requests.post(
+                f"{ESKIZ_API}/auth/login",
+                data={"email": email, "password": password},
+                timeout=10,
+            )
+        return _eskiz_token_from(r.json())
+    except Exception:
+        logger.exception("eskiz login failed")
         return ""
 
 
 def _eskiz_send(token: str, phone: str, text: str, sender: str) -> requests.Response:
-    return requests.post(
-        "https://notify.eskiz.uz/api/message/sms/send",
-        headers={"Authorization": f"Bearer {token}"},
-        json={"mobile_phone": phone, "message": text, "from": sender},
-        timeout=10,
-    )
+    with track_external("eskiz"):
+        return requests.post(
+            f"{ESKIZ_API}/message/sms/send",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"mobile_phone": phone, "message": text, "from": sender},
+            timeout=10,
+        )
 
 
-def send_sms(phone: str, text: str) -> bool:
-    """Send SMS via Eskiz. Requires SMS_BACKEND=eskiz in settings/.env."""
+def _sms_target(phone: str, text: str) -> str:
+    """Normalized phone, or "" when this SMS should not go out (logged)."""
     phone = (phone or "").strip().replace(" ", "")
     if not phone:
-        print("[SMS] No phone number provided, skipping.")
-        return False
+        logger.info("sms skipped: no phone number")
+        return ""
 
     backend = getattr(settings, "SMS_BACKEND", "")
-    print(f"[SMS] backend='{backend}'  phone={phone}")
-
     if backend != "eskiz":
-        print(f"[SMS] stub (set SMS_BACKEND=eskiz in .env to enable real sending)")
-        print(f"[SMS] message: {text}")
+        logger.info(
+            "sms not sent: SMS_BACKEND is not eskiz",
+            extra={"fields": {"backend": backend, "phone": phone, "length": len(text)}},
+        )
+        return ""
+    return phone
+
+
+def _log_sms_result(phone: str, status: int) -> bool:
+    fields = {"phone": phone, "status": status}
+    if status == 200:
+        logger.info("sms sent", extra={"fields": fields})
+        return True
+    logger.warning("sms rejected by eskiz", extra={"fields": fields})
+    return False
+
+
+def send_sms(phone: str, text: str) -> bool:
+    """Send SMS via Eskiz. Requires SMS_BACKEND=eskiz in settings/.env."""
+    phone = _sms_target(phone, text)
+    if not phone:
         return False
 
     token  = getattr(settings, "ESKIZ_TOKEN", "").strip()
     sender = getattr(settings, "ESKIZ_SENDER", "4546")
 
     if not token:
-        print("[SMS] No ESKIZ_TOKEN — attempting login ...")
+        logger.info("no ESKIZ_TOKEN, logging in")
         token = _eskiz_get_token()
         if not token:
-            print("[SMS] Could not obtain token. SMS not sent.")
+            logger.error("sms not sent: no eskiz token", extra={"fields": {"phone": phone}})
             return False
 
     try:
         resp = _eskiz_send(token, phone, text, sender)
-        print(f"[SMS] Eskiz response: {resp.status_code} → {resp.text[:200]}")
 
         # Token expired — refresh and retry once
         if resp.status_code == 401:
-            print("[SMS] Token expired, refreshing ...")
+            logger.info("eskiz token expired, refreshing")
             token = _eskiz_get_token()
             if not token:
-                print("[SMS] Token refresh failed. SMS not sent.")
+                logger.error("sms not sent: eskiz token refresh failed", extra={"fields": {"phone": phone}})
                 return False
             resp = _eskiz_send(token, phone, text, sender)
-            print(f"[SMS] Eskiz retry: {resp.status_code} → {resp.text[:200]}")
 
-        return resp.status_code == 200
+        return _log_sms_result(phone, resp.status_code)
+
+    except Exception:
+        logger.exception("sms send failed", extra={"fields": {"phone": phone}})
+        return False
+
+
+# ── Async senders ──────────────────────────────────────────────────────
+# Same behaviour as the senders above, on aiohttp: under ASGI a slow
+# Telegram / Eskiz round trip yields the event loop instead of holding a
+# worker thread. Used by the async views; signals and commands stay sync.
+
+# One session (connection pool, DNS cache, TLS sessions) per process.
+# A session is bound to the event loop it was created on; under uvicorn
+# that is the worker's only loop, so it is replaced only if a caller
+# runs on a different one (e.g. async_to_sync in a command).
+_session = (None, None)  # (loop, session)
+
+
+def _client_session():
+    global _session
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    session_loop, session = _session
+    if session is None or session.closed or session_loop is not loop:
+        session = aiohttp.ClientSession()
+        _session = (loop, session)
+    return session
+
+
+def _timeout(seconds):
+    import aiohttp
+
+    return aiohttp.ClientTimeout(total=seconds)
+
+
+async def send_telegram_message_async(chat_id: str, text: str):
+    if not chat_id:
+        return False
+
+    url, payload = _telegram_request(chat_id, text)
+    try:
+        with track_external("telegram"):
+            async with _client_session().post(url, json=payload, timeout=_timeout(5)) as response:
+                status = response.status
+        return _log_telegram_result(chat_id, status)
+    except Exception:
+        logger.exception("telegram send failed", extra={"fields": {"chat_id": chat_id}})
+        return False
+
+
+async def _eskiz_get_token_async(session) -> str:
+    email, password = _eskiz_credentials()
+    if not email or not password:
+        return ""
+    try:
+        with track_external("eskiz"):
+            async with session.post(
+                f"{ESKIZ_API}/auth/login", data={"email": email, "password": password}, timeout=_timeout(10),
+            ) as r:
+                body = await r.json(content_type=None)
+        return _eskiz_token_from(body)
+    except Exception:
+        logger.exception("eskiz login failed")
+        return ""
+
+
+async def _eskiz_send_async(session, token: str, phone: str, text: str, sender: str) -> int:
+    with track_external("eskiz"):
+        async with session.post(
+            f"{ESKIZ_API}/message/sms/send",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"mobile_phone": phone, "message": text, "from": sender},
+            timeout=_timeout(10),
+        ) as response:
+            return response.status
+
+
+async def send_sms_async(phone: str, text: str) -> bool:
+    phone = _sms_target(phone, text)
+    if not phone:
+        return False
+
+    token  = getattr(settings, "ESKIZ_TOKEN", "").strip()
+    sender = getattr(settings, "ESKIZ_SENDER", "4546")
+
+    session = _client_session()
+    try:
+        if not token:
+            logger.info("no ESKIZ_TOKEN, logging in")
+            token = await _eskiz_get_token_async(session)
+            if not token:
+                logger.error("sms not sent: no eskiz token", extra={"fields": {"phone": phone}})
+                return False
+
+        status = await _eskiz_send_async(session, token, phone, text, sender)
+
+        # Token expired — refresh and retry once
+        if status == 401:
+            logger.info("eskiz token expired, refreshing")
+            token = await _eskiz_get_token_async(session)
+            if not token:
+                logger.error("sms not sent: eskiz token refresh failed", extra={"fields": {"phone": phone}})
+                return False
+            status = await _eskiz_send_async(session, token, phone, text, sender)
+
+        return _log_sms_result(phone, status)
 
-    except Exception as e:
-        print(f"[SMS] Request error: {e}")
+    except Exception:
+        logger.exception("sms send failed", extra={"fields": {"phone": phone}})
         return False
 
 
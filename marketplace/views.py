@@ -1,13 +1,18 @@
+import logging
 import math
 import os
 from datetime import datetime
-from django.http import HttpResponse, Http404
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed, Http404
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Exists, OuterRef, Prefetch, Min
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import get_language
 from django.views.decorators.http import require_GET
@@ -15,9 +20,16 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.conf import settings
 from django.core.mail import send_mail
 
+from . import clock
 from .forms import BookingForm, BusinessLeadForm
-from .models import Appointment, Category, Master, Salon, Service
-from .utils import get_available_slots, send_telegram_message, can_book_pc_quantity
+from .i18n import annotate_localized
+from .models import Appointment, Category, Master, Salon, SalonPhoto, SalonWorkingHours, Service
+from .utils import (
+    can_book_pc_quantity, get_available_slots, is_slot_taken_error, send_telegram_message,
+    send_telegram_message_async,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def _haversine_km(lat1, lng1, lat2, lng2):
@@ -71,43 +83,6 @@ def nearby_salons(request):
         "total_found": len(results),
     })
 
-def auto_complete_overdue_appointments(salon=None, user=None):
-    """
-    Lazy auto-complete:
-    Find confirmed appointments whose end time has passed and mark them completed.
-    Optionally scope to a single salon (for owner dashboard) or a single user (for my_bookings).
-    """
-    from datetime import timedelta
-    now = timezone.now()
-
-    qs = Appointment.objects.filter(status="confirmed")
-    if salon:
-        qs = qs.filter(salon=salon)
-    if user:
-        qs = qs.filter(client=user)
-
-    # Limit to recent ones (avoid scanning whole history)
-    qs = qs.filter(start_time__gte=now - timedelta(days=7))
-
-    updated_count = 0
-    for appt in qs:
-        # Compute end time priority: end_time > hours > service.duration > 1h default
-        end_dt = appt.end_time
-        if not end_dt:
-            if appt.service:
-                end_dt = appt.start_time + timedelta(minutes=appt.service.duration_minutes)
-            elif appt.hours:
-                end_dt = appt.start_time + timedelta(hours=appt.hours)
-            else:
-                end_dt = appt.start_time + timedelta(hours=1)
-
-        if end_dt < now:
-            appt.status = "completed"
-            appt.save(update_fields=["status"])
-            updated_count += 1
-    return updated_count
-
-
 @login_required
 @require_POST
 def appointment_change_status(request, appointment_id):
@@ -159,8 +134,8 @@ def appointment_change_status(request, appointment_id):
                     f"Бронь #{appt.id}"
                 ),
             )
-    except Exception as e:
-        print(f"Telegram notify error: {e}")
+    except Exception:
+        logger.exception("appointment notify failed", extra={"fields": {"appointment_id": appt.id}})
 
     return JsonResponse({
         "ok": True,
@@ -170,25 +145,10 @@ def appointment_change_status(request, appointment_id):
     })
 
 def search_view(request):
-    query = request.GET.get('q', '').strip()
-    location = request.GET.get('location', '').strip()
-    
-    # Start with all active salons (or masters)
-    results = Salon.objects.all()
-
-    if query:
-        # Creative part: Search across multiple related models
-        results = results.filter(
-            Q(name__icontains=query) | 
-            Q(category__name_ru__icontains=query) | 
-            Q(services__name_ru__icontains=query) |
-            Q(description_ru__icontains=query)
-        ).distinct()
-
-    if location:
-        results = results.filter(address__icontains=location)
-
-    return render(request, 'search_results.html', {'results': results, 'query': query})
+    # salon_list searches names, categories and services (?q=&location=);
+    # search_results.html never existed, so this view used to 500.
+    url = reverse("marketplace:salon_list")
+    return redirect(f"{url}?{request.GET.urlencode()}" if request.GET else url)
 
 def _salon_is_pc_club(salon):
     """Detect PC clubs by category slug (fast, no DB column needed)."""
@@ -265,7 +225,7 @@ def salon_list(request, category_slug=None):
     elif sort == "price_desc":
         salons_qs = salons_qs.annotate(min_price=Min("services__price")).order_by("-min_price")
     elif sort == "open_now":
-        now_local = timezone.localtime()
+        now_local = clock.current().local_now
         salons_qs = salons_qs.filter(
             working_hours__weekday=now_local.weekday(),
             working_hours__is_closed=False,
@@ -273,14 +233,20 @@ def salon_list(request, category_slug=None):
             working_hours__close_time__gte=now_local.time(),
         )
 
-    # Prefetch services for card display
+    # Prefetch services for card display, and photos for cards without a
+    # cover (salon.photos.first then reads the prefetched, ordered list)
     salons_qs = salons_qs.prefetch_related(
         Prefetch(
             "services",
-            queryset=Service.objects.only(
-                "id", "salon_id", "name_ru", "name_en", "name_uz", "price", "duration_minutes", "img"
+            queryset=annotate_localized(
+                Service.objects.only("id", "salon_id", "price", "duration_minutes", "img"),
+                "name", "description",
             ),
-        )
+        ),
+        Prefetch(
+            "photos",
+            queryset=SalonPhoto.objects.only("id", "salon_id", "image", "photo_url", "image_variants"),
+        ),
     )
 
     # Nearest: Python-side haversine sort (Paginator handles lists too)
@@ -335,29 +301,46 @@ def salon_list(request, category_slug=None):
     )
 
 def salon_detail(request, salon_id):
-    # Optimized query with select_related and prefetch_related
+    # Every related list is fetched once, filtered and narrowed to the
+    # columns the template renders (see SalonDetailQueryTests).
     salon = get_object_or_404(
-        Salon.objects.select_related("category").prefetch_related("photos", "services", "masters", "working_hours"), 
+        Salon.objects.select_related("category", "location").prefetch_related(
+            Prefetch(
+                "photos",
+                queryset=SalonPhoto.objects.only("id", "salon_id", "image", "photo_url", "image_variants"),
+            ),
+            Prefetch(
+                "services",
+                queryset=annotate_localized(
+                    Service.objects.only("id", "salon_id", "price", "duration_minutes"),
+                    "name", "description",
+                ),
+            ),
+            Prefetch(
+                "masters",
+                queryset=Master.objects.filter(is_active=True).only("id", "salon_id"),
+                to_attr="active_masters",
+            ),
+            Prefetch(
+                "working_hours",
+                queryset=SalonWorkingHours.objects.only(
+                    "id", "salon_id", "weekday", "is_closed", "open_time", "close_time"
+                ),
+            ),
+        ),
         pk=salon_id
     )
-    
-    services = salon.services.all()
-    masters = salon.masters.filter(is_active=True)
-    photos = salon.photos.all()
-    
-    # Get working hours ordered by weekday (Monday=0, Sunday=6)
-    working_hours = salon.working_hours.all().order_by('weekday')
-    
+
     return render(
         request,
         "marketplace/salon_detail.html",
         {
             "salon": salon, 
-            "services": services, 
-            "masters": masters,
-            "photos": photos,
-            "working_hours": working_hours,
-            "today_weekday": timezone.localtime().weekday() # Returns 0-6
+            "services": salon.services.all(),
+            "masters": salon.active_masters,
+            "photos": salon.photos.all(),
+            "working_hours": salon.working_hours.all(),  # Meta.ordering: Monday -> Sunday
+            "today_weekday": clock.current().today.weekday() # Returns 0-6
         },
     )
 
@@ -374,20 +357,25 @@ def booking_start(request, salon_id, service_id):
             quantity = form.cleaned_data.get("quantity") or 1
             
             if is_pc_club:
-                ok, available = can_book_pc_quantity(salon, service, start_dt, quantity)
+                # Lock the salon row so concurrent bookings can't both see
+                # the same free capacity.
+                with transaction.atomic():
+                    Salon.objects.select_for_update().filter(pk=salon.pk).exists()
+                    ok, available = can_book_pc_quantity(salon, service, start_dt, quantity)
+                    if ok:
+                        Appointment.objects.create(
+                            client=request.user,
+                            salon=salon,
+                            master=None,
+                            service=service,
+                            start_time=start_dt,
+                            status="pending",
+                            comment=form.cleaned_data.get("comment", ""),
+                            quantity=quantity
+                        )
                 if not ok:
                     form.add_error(None, f"Only {available} PC(s) available at this time.")
                 else:
-                    Appointment.objects.create(
-                        client=request.user,
-                        salon=salon,
-                        master=None,
-                        service=service,
-                        start_time=start_dt,
-                        status="pending",
-                        comment=form.cleaned_data.get("comment", ""),
-                        quantity=quantity
-                    )
                     return redirect("marketplace:booking_success", salon_id=salon.id)
             else:
                 master = form.cleaned_data["master"]
@@ -400,19 +388,30 @@ def booking_start(request, salon_id, service_id):
                 if start_dt not in slots:
                     form.add_error(None, "Selected time is no longer available.")
                 else:
-                    Appointment.objects.create(
-                        client=request.user,
-                        salon=salon,
-                        master=master,
-                        service=service,
-                        start_time=start_dt,
-                        status="pending",
-                        comment=form.cleaned_data.get("comment", ""),
-                        quantity=1
-                    )
-                    return redirect("marketplace:booking_success", salon_id=salon.id)
+                    # The slot may be taken between the check above and the
+                    # INSERT; the database exclusion constraint has the final say.
+                    try:
+                        with transaction.atomic():
+                            Appointment.objects.create(
+                                client=request.user,
+                                salon=salon,
+                                master=master,
+                                service=service,
+                                start_time=start_dt,
+                                status="pending",
+                                comment=form.cleaned_data.get("comment", ""),
+                                quantity=1
+                            )
+                    except IntegrityError as e:
+                        if not is_slot_taken_error(e):
+                            raise
+                        form.add_error(None, "Selected time is no longer available.")
+                    except ValidationError:
+                        form.add_error(None, "Selected time is no longer available.")
+                    else:
+                        return redirect("marketplace:booking_success", salon_id=salon.id)
     else:
-        initial = {"date": timezone.localdate()}
+        initial = {"date": clock.current().today}
         if is_pc_club:
             try:
                 initial["quantity"] = int(request.GET.get("quantity", 1))
@@ -431,97 +430,79 @@ def booking_success(request, salon_id):
     salon = get_object_or_404(Salon, pk=salon_id)
     return render(request, "marketplace/booking_success.html", {"salon": salon})
 
+ANALYTICS_PERIODS = (7, 30, 90)
+
+
 @login_required
 def owner_dashboard(request):
-    from pc_clubs.models import PCClub, PCBooking
-
-    salons = request.user.salons.all()
-    master_profile = getattr(request.user, 'master_profile', None)
-    user_pc_clubs = PCClub.objects.filter(owner=request.user)
-
-    today = timezone.localdate()
-
-    # ── Salon bookings ──────────────────────────────────────────────
-    target_salon = None
-    bookings_pending = Appointment.objects.none()
-    bookings_today = Appointment.objects.none()
-    bookings_upcoming = Appointment.objects.none()
-    bookings_past = Appointment.objects.none()
-
-    if salons.exists() or master_profile:
-        if salons.exists():
-            target_salon = salons.first()
-            base_query = Appointment.objects.filter(salon=target_salon)
-            auto_complete_overdue_appointments(salon=target_salon)
-        else:
-            target_salon = master_profile.salon
-            base_query = Appointment.objects.filter(master=master_profile)
-            auto_complete_overdue_appointments(salon=target_salon)
-
-        bookings_pending = base_query.filter(status="pending").select_related(
-            "client", "client__profile", "service", "master"
-        ).order_by("start_time")
-        bookings_today = (
-            base_query.filter(start_time__date=today)
-            .exclude(status="cancelled")
-            .select_related("client", "service", "master")
-            .order_by("start_time")
-        )
-        bookings_upcoming = (
-            base_query.filter(start_time__date__gt=today)
-            .exclude(status="cancelled")
-            .select_related("client", "service", "master")
-            .order_by("start_time")
-        )
-        bookings_past = (
-            base_query.filter(start_time__date__lt=today)
-            .select_related("client", "service", "master")
-            .order_by("-start_time")
-        )
+    from .dashboard import build_owner_dashboard
+
+    context = build_owner_dashboard(
+        request.user,
+        page=request.GET.get("page"),
+        pc_page=request.GET.get("pc_page"),
+    )
+    return render(request, "business/dashboard.html", context)
+
+
+@login_required
+def owner_analytics(request):
+    from .analytics import build_owner_analytics
+
+    try:
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        days = 30
+    days = days if days in ANALYTICS_PERIODS else 30
+
+    context = build_owner_analytics(request.user, days=days)
+    context["periods"] = ANALYTICS_PERIODS
+    return render(request, "business/analytics.html", context)
+
+
+@login_required
+@require_GET
+def export_bookings(request, kind):
+    """Owner export of Appointment / PCBooking history: ?format=csv|xlsx&from=&to=."""
+    from .exports import EXPORTS, csv_response, parse_period, xlsx_response
+
+    if kind not in EXPORTS:
+        raise Http404
+    header, rows = EXPORTS[kind]
+    start, end = parse_period(request.GET)
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}"
+
+    if request.GET.get("format") == "xlsx":
+        return xlsx_response(header, rows(request.user, start, end), filename)
+    return csv_response(header, rows(request.user, start, end), filename)
+
+
+@login_required
+@require_GET
+def owner_dashboard_events(request):
+    """
+    Server-sent events for the owner dashboard (see marketplace.events).
+    Resumes after the Last-Event-ID header, or ?since= on first connect.
+    """
+    from .events import owner_event_scope, stream_owner_events
+
+    scope, multi_salon = owner_event_scope(request.user)
+    if scope is None:
+        return HttpResponse(status=204)  # tells EventSource not to reconnect
+
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.GET.get("since") or 0)
+    except ValueError:
+        last_id = 0
+
+    response = StreamingHttpResponse(
+        stream_owner_events(scope, last_id, multi_salon),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
-    # ── PC club bookings ────────────────────────────────────────────
-    pc_bookings_pending = PCBooking.objects.none()
-    pc_bookings_today = PCBooking.objects.none()
-    pc_bookings_upcoming = PCBooking.objects.none()
-    pc_bookings_past = PCBooking.objects.none()
-
-    if user_pc_clubs.exists():
-        pc_base = (
-            PCBooking.objects
-            .filter(pc_club__in=user_pc_clubs)
-            .select_related("client", "client__profile", "plan", "pc_club")
-        )
-        pc_bookings_pending = pc_base.filter(status="pending").order_by("start_time")
-        pc_bookings_today = (
-            pc_base.filter(start_time__date=today)
-            .exclude(status="cancelled")
-            .order_by("start_time")
-        )
-        pc_bookings_upcoming = (
-            pc_base.filter(start_time__date__gt=today)
-            .exclude(status="cancelled")
-            .order_by("start_time")
-        )
-        pc_bookings_past = pc_base.filter(start_time__date__lt=today).order_by("-start_time")
-
-    # Show "No Active Salon" page only if user has nothing at all
-    has_anything = target_salon or user_pc_clubs.exists()
-
-    return render(request, "business/dashboard.html", {
-        "salon": target_salon,
-        "bookings_pending": bookings_pending,
-        "bookings_today": bookings_today,
-        "bookings_upcoming": bookings_upcoming,
-        "bookings_past": bookings_past,
-        "today": today,
-        "user_pc_clubs": user_pc_clubs,
-        "pc_bookings_pending": pc_bookings_pending,
-        "pc_bookings_today": pc_bookings_today,
-        "pc_bookings_upcoming": pc_bookings_upcoming,
-        "pc_bookings_past": pc_bookings_past,
-        "has_anything": has_anything,
-    })
-    
 
 @login_required
 @require_POST
@@ -622,7 +603,7 @@ def ajax_booking_form(request, salon_id, service_id):
     salon = get_object_or_404(Salon, pk=salon_id)
     service = get_object_or_404(Service, pk=service_id, salon=salon)
     
-    form = BookingForm(salon=salon, initial={"date": timezone.localdate()})
+    form = BookingForm(salon=salon, initial={"date": clock.current().today})
     form.fields["master"].queryset = Master.objects.filter(salon=salon, is_active=True)
 
     return render(
@@ -632,17 +613,19 @@ def ajax_booking_form(request, salon_id, service_id):
     )
 
 
-@require_GET
-def api_slots(request, salon_id, service_id):
-    salon = get_object_or_404(Salon, pk=salon_id)
-    service = get_object_or_404(Service, pk=service_id, salon=salon)
+# ── Slots API ───────────────────────────────────────────────────────
+# Sync under WSGI, async under ASGI (settings.SERVER_MODE): an async view
+# behind the WSGI handler would pay for an event loop and thread hops on
+# every request. Both variants share the parsing and the response.
 
+def _slots_request(request):
+    """(master_id, date_str, date_obj, error response or None)."""
     master_id = request.GET.get("master") or request.GET.get("master_id")
     date_str = request.GET.get("date") or request.GET.get("day")
 
     # Useful for debugging from browser DevTools Network tab
     if not master_id or not date_str:
-        return JsonResponse(
+        return master_id, date_str, None, JsonResponse(
             {"slots": [], "error": "missing master/date", "got": {"master": master_id, "date": date_str}},
             status=400,
         )
@@ -650,26 +633,20 @@ def api_slots(request, salon_id, service_id):
     try:
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
     except ValueError:
-        return JsonResponse({"slots": [], "error": "bad date format, expected YYYY-MM-DD"}, status=400)
+        return master_id, date_str, None, JsonResponse(
+            {"slots": [], "error": "bad date format, expected YYYY-MM-DD"}, status=400,
+        )
+    return master_id, date_str, date_obj, None
 
-    # Ensure master exists and belongs to salon
-    master = salon.masters.filter(pk=master_id, is_active=True).first()
-    if not master:
-        return JsonResponse({"slots": [], "error": "master not found for this salon"}, status=404)
 
-    try:
-        slots = get_available_slots(salon=salon, master=master, service=service, date_obj=date_obj)
-    except Exception as e:
-        # So you see errors instead of silent empty behavior
-        return JsonResponse({"slots": [], "error": f"server error: {str(e)}"}, status=500)
+def _master_not_found():
+    return JsonResponse({"slots": [], "error": "master not found for this salon"}, status=404)
 
-    # Make sure all datetimes are aware before localtime()
-    out = []
-    tz = timezone.get_current_timezone()
-    for s in slots:
-        if timezone.is_naive(s):
-            s = timezone.make_aware(s, tz)
-        out.append(timezone.localtime(s, tz).strftime("%H:%M"))
+
+def _slots_response(slots, date_str, date_obj, salon_id, service_id, master_id):
+    # Slots are UTC; local wall time only for the response.
+    ctx = clock.current()
+    out = [ctx.local(s).strftime("%H:%M") for s in slots]
 
     return JsonResponse(
         {
@@ -686,30 +663,113 @@ def api_slots(request, salon_id, service_id):
     )
 
 
-@login_required
-def my_bookings(request):
-    now = timezone.now()
+def _slots_error(e):
+    # So you see errors instead of silent empty behavior
+    return JsonResponse({"slots": [], "error": f"server error: {str(e)}"}, status=500)
 
-    # Lazy auto-complete: mark overdue confirmed bookings as completed
-    auto_complete_overdue_appointments(user=request.user)
 
-    bookings = Appointment.objects.filter(client=request.user).select_related(
-        'salon', 'service', 'master'
-    )
+@require_GET
+def api_slots_sync(request, salon_id, service_id):
+    salon = get_object_or_404(Salon, pk=salon_id)
+    service = get_object_or_404(Service, pk=service_id, salon=salon)
+
+    master_id, date_str, date_obj, error = _slots_request(request)
+    if error:
+        return error
+
+    # Ensure master exists and belongs to salon
+    master = salon.masters.filter(pk=master_id, is_active=True).first()
+    if not master:
+        return _master_not_found()
+
+    try:
+        slots = get_available_slots(salon=salon, master=master, service=service, date_obj=date_obj)
+    except Exception as e:
+        return _slots_error(e)
+    return _slots_response(slots, date_str, date_obj, salon_id, service_id, master_id)
+
+
+async def _aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404
 
-    # Upcoming = not past + not cancelled/completed
-    upcoming_bookings = bookings.filter(
-        start_time__gte=now,
-    ).exclude(status__in=["cancelled", "completed"]).order_by('start_time')
 
-    past_bookings = bookings.filter(
-        start_time__lt=now,
-    ).order_by('-start_time')
+# require_GET / require_POST only wrap sync views in Django 4.2, so the
+# async variants check the method inline.
+async def api_slots_async(request, salon_id, service_id):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    salon = await _aget_object_or_404(Salon.objects, pk=salon_id)
+    service = await _aget_object_or_404(Service.objects, pk=service_id, salon=salon)
 
+    master_id, date_str, date_obj, error = _slots_request(request)
+    if error:
+        return error
+
+    master = await salon.masters.filter(pk=master_id, is_active=True).afirst()
+    if not master:
+        return _master_not_found()
+
+    try:
+        slots = await sync_to_async(get_available_slots)(
+            salon=salon, master=master, service=service, date_obj=date_obj,
+        )
+    except Exception as e:
+        return _slots_error(e)
+    return _slots_response(slots, date_str, date_obj, salon_id, service_id, master_id)
+
+
+api_slots = api_slots_async if settings.SERVER_MODE == "asgi" else api_slots_sync
+
+
+@login_required
+def my_bookings(request):
+    from .timeline import history, upcoming
+
+    # Overdue confirmed bookings are completed by the
+    # `complete_overdue_bookings` sweeper, not here.
+    past, next_cursor = history(request.user)
     return render(request, 'marketplace/my_bookings.html', {
-        'upcoming': upcoming_bookings,
-        'past': past_bookings,
+        'upcoming': upcoming(request.user),
+        'past': past,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_GET
+def my_bookings_history(request):
+    """Older my_bookings entries as JSON: ?cursor=<next_cursor from the previous page>."""
+    from django.template.loader import render_to_string
+    from .timeline import decode_cursor, history
+
+    cursor = None
+    if request.GET.get("cursor"):
+        cursor = decode_cursor(request.GET["cursor"])
+        if cursor is None:
+            return JsonResponse({"ok": False, "error": "Invalid cursor."}, status=400)
+
+    rows, next_cursor = history(request.user, cursor=cursor)
+    return JsonResponse({
+        "ok": True,
+        "items": [
+            {
+                "kind": b["kind"],
+                "id": b["id"],
+                "start_time": b["start_time"].isoformat(),
+                "status": b["status"],
+                "venue": b["venue_name"],
+                "item": b["item_name"],
+                "html": render_to_string("marketplace/partials/booking_history_item.html", {"b": b}, request),
+            }
+            for b in rows
+        ],
+        "next_cursor": next_cursor,
     })
+
+
 @login_required
 @require_POST
 def cancel_booking(request, appointment_id):
@@ -718,7 +778,7 @@ def cancel_booking(request, appointment_id):
     # Only allow cancellation if it's pending or confirmed
     if appointment.status in ['pending', 'confirmed']:
         appointment.status = 'cancelled'
-        appointment.save()
+        appointment.save(update_fields=["status"])
         messages.success(request, "Your booking has been cancelled.")
     else:
         messages.error(request, "This booking cannot be cancelled.")
@@ -726,8 +786,44 @@ def cancel_booking(request, appointment_id):
     return redirect('marketplace:my_bookings')
 
 
+# ── Business leads ──────────────────────────────────────────────────
+# Sync / async variants as for the slots API.
+
+def _lead_chat_id(lead):
+    """Chat to notify about `lead`, or None (logged) when Telegram is not configured."""
+    chat_id = getattr(settings, "BUSINESS_LEADS_TELEGRAM_ID", None)
+    bot_token = getattr(settings, "TELEGRAM_BOT_TOKEN", None)
+
+    if not chat_id:
+        logger.warning("business lead not forwarded: BUSINESS_LEADS_TELEGRAM_ID is not set",
+                       extra={"fields": {"lead_id": lead.pk}})
+        return None
+    if not bot_token:
+        logger.warning("business lead not forwarded: TELEGRAM_BOT_TOKEN is not set",
+                       extra={"fields": {"lead_id": lead.pk}})
+        return None
+    return str(chat_id)
+
+
+def _lead_text(lead):
+    return (
+        "<b>🆕 Новая заявка на добавление бизнеса</b>\n\n"
+        f"📞 <b>Телефон:</b> {lead.phone}\n"
+        f"📝 <b>Описание:</b>\n{lead.description}\n\n"
+        f"🕒 {lead.created_at:%Y-%m-%d %H:%M}\n"
+        f"🆔 ID: {lead.pk}"
+    )
+
+
+def _lead_saved():
+    return JsonResponse({
+        "ok": True,
+        "message": "Спасибо! Мы свяжемся с вами в ближайшее время.",
+    })
+
+
 @require_POST
-def submit_business_lead(request):
+def submit_business_lead_sync(request):
     """Handle 'Add Business' popup form. Saves lead + sends Telegram notification."""
     form = BusinessLeadForm(request.POST)
     if not form.is_valid():
@@ -736,38 +832,39 @@ def submit_business_lead(request):
     lead = form.save()
 
     # Send Telegram notification to admin
-    chat_id = getattr(settings, "BUSINESS_LEADS_TELEGRAM_ID", None)
-    bot_token = getattr(settings, "TELEGRAM_BOT_TOKEN", None)
+    chat_id = _lead_chat_id(lead)
+    if chat_id:
+        try:
+            ok = send_telegram_message(chat_id, _lead_text(lead))
+            logger.info("business lead forwarded", extra={"fields": {"lead_id": lead.pk, "sent": ok}})
+        except Exception:
+            logger.exception("business lead notify failed", extra={"fields": {"lead_id": lead.pk}})
 
-    print("=" * 60)
-    print(f"[LEAD #{lead.pk}] Sending Telegram notification...")
-    print(f"  chat_id   = {chat_id!r}")
-    print(f"  bot_token = {'SET (' + str(len(bot_token)) + ' chars)' if bot_token else 'MISSING'}")
+    return _lead_saved()
 
-    if not chat_id:
-        print(f"[LEAD #{lead.pk}] BUSINESS_LEADS_TELEGRAM_ID is not set in .env")
-    elif not bot_token:
-        print(f"[LEAD #{lead.pk}] TELEGRAM_BOT_TOKEN is not set in .env")
-    else:
+
+async def submit_business_lead_async(request):
+    """submit_business_lead_sync, waiting on Telegram without holding a worker thread."""
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    form = BusinessLeadForm(request.POST)
+    if not await sync_to_async(form.is_valid)():
+        return JsonResponse({"ok": False, "errors": form.errors}, status=400)
+
+    lead = await sync_to_async(form.save)()
+
+    chat_id = _lead_chat_id(lead)
+    if chat_id:
         try:
-            text = (
-                "<b>🆕 Новая заявка на добавление бизнеса</b>\n\n"
-                f"📞 <b>Телефон:</b> {lead.phone}\n"
-                f"📝 <b>Описание:</b>\n{lead.description}\n\n"
-                f"🕒 {lead.created_at:%Y-%m-%d %H:%M}\n"
-                f"🆔 ID: {lead.pk}"
-            )
-            ok = send_telegram_message(str(chat_id), text)
-            print(f"[LEAD #{lead.pk}] send_telegram_message returned: {ok}")
-        except Exception as e:
-            print(f"[LEAD #{lead.pk}] Exception: {e}")
+            ok = await send_telegram_message_async(chat_id, _lead_text(lead))
+            logger.info("business lead forwarded", extra={"fields": {"lead_id": lead.pk, "sent": ok}})
+        except Exception:
+            logger.exception("business lead notify failed", extra={"fields": {"lead_id": lead.pk}})
 
-    print("=" * 60)
+    return _lead_saved()
 
-    return JsonResponse({
-        "ok": True,
-        "message": "Спасибо! Мы свяжемся с вами в ближайшее время.",
-    })
+
+submit_business_lead = submit_business_lead_async if settings.SERVER_MODE == "asgi" else submit_business_lead_sync
 
 
 @login_required
@@ -822,8 +919,8 @@ def appointment_change_status(request, appointment_id):
                     f"Бронь #{appt.id}"
                 ),
             )
-    except Exception as e:
-        print(f"Telegram notify error: {e}")
+    except Exception:
+        logger.exception("appointment notify failed", extra={"fields": {"appointment_id": appt.id}})
 
     return JsonResponse({
         "ok": True,
@@ -850,3 +947,23 @@ def serve_doc(request, doc_type):
         template_name = f"marketplace/legal/{doc_type}_ru.html"
 
     return render(request, template_name)
+
+
+@require_GET
+def image_proxy(request, token):
+    """External venue image, resized to WebP and served from the local LRU cache."""
+    from .image_proxy import FetchError, get_or_fetch, unsign
+
+    target = unsign(token)
+    if target is None:
+        raise Http404
+    url, size = target
+    try:
+        path = get_or_fetch(url, size)
+    except FetchError:
+        # Remote host down or not an image: let the browser try it directly.
+        return redirect(url)
+
+    response = FileResponse(open(path, "rb"), content_type="image/webp")
+    response["Cache-Control"] = "public, max-age=604800"
+    return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pc_clubs', '0003_pcclub_cover_pcclub_cover_url_pcphoto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pcbooking',
+            index=models.Index(fields=['status', 'start_time'], name='pcbooking_status_start_idx'),
+        ),
+    ]
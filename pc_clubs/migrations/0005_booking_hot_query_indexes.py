@@ -0,0 +1,25 @@
+# Generated by Django 4.2.26 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pc_clubs', '0004_pcbooking_pcbooking_status_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pcbooking',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'confirmed'])), fields=['pc_club', 'start_time', 'end_time'], name='pcbooking_club_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pcbooking',
+            index=models.Index(fields=['pc_club', 'status', 'start_time'], name='pcbooking_club_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pcbooking',
+            index=models.Index(fields=['client', '-start_time'], name='pcbooking_client_start_idx'),
+        ),
+    ]
@@ -1,4 +1,3 @@
-import uuid
 import secrets
 from django.db import models
 from django.conf import settings
@@ -6,48 +5,26 @@ from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 
+from marketplace.images import ProcessedImagesMixin, upload_path
+from marketplace.models import IndexedBookingMixin
+
 
 def pc_logo_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"pc_club_logos/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
+    return upload_path("pc_club_logos", filename)
 
 
 def pc_cover_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"pc_club_covers/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
+    return upload_path("pc_club_covers", filename)
 
 
 def pc_photo_upload_to(instance, filename):  # noqa: ARG001
-    now = timezone.localtime()
-    return f"pc_club_photos/{now:%Y/%m/%d}/{uuid.uuid4().hex[:8]}.webp"
-
-
-def _process_image_to_webp(image_field, max_size=400):
-    """Resize uploaded image and convert to WebP."""
-    import os as _os
-    from io import BytesIO
-    from django.core.files.base import ContentFile
-    from PIL import Image
+    return upload_path("pc_club_photos", filename)
 
-    img = Image.open(image_field)
-    img = img.convert("RGB")
-    img.thumbnail((max_size, max_size), Image.LANCZOS)
-    buf = BytesIO()
-    img.save(buf, format="WEBP", quality=85, method=6)
-    buf.seek(0)
-    base = _os.path.splitext(_os.path.basename(getattr(image_field, "name", "logo") or "logo"))[0]
-    return ContentFile(buf.read(), name=f"{base}.webp")
 
+class PCClub(ProcessedImagesMixin, models.Model):
+    IMAGE_FIELDS = {"logo": ("thumb", "card"), "cover": ("card", "full")}
+    IMAGE_URL_FIELDS = {"logo": "logo_url", "cover": "cover_url"}
 
-def _is_new_upload(field):
-    try:
-        from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-        return isinstance(field.file, (InMemoryUploadedFile, TemporaryUploadedFile))
-    except Exception:
-        return False
-
-
-class PCClub(models.Model):
     name = models.CharField(max_length=200, verbose_name="Название")
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
@@ -77,16 +54,6 @@ class PCClub(models.Model):
     def save(self, *args, **kwargs):
         if not self.qr_token:
             self.qr_token = secrets.token_urlsafe(16).replace("-", "").replace("_", "")[:24]
-        if self.logo and _is_new_upload(self.logo):
-            try:
-                self.logo = _process_image_to_webp(self.logo, max_size=400)
-            except Exception:
-                pass
-        if self.cover and _is_new_upload(self.cover):
-            try:
-                self.cover = _process_image_to_webp(self.cover, max_size=1200)
-            except Exception:
-                pass
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -168,7 +135,7 @@ class PCWorkingHours(models.Model):
         return f"{self.pc_club.name} – {self.get_weekday_display()}"
 
 
-class PCBooking(models.Model):
+class PCBooking(IndexedBookingMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает'),
         ('confirmed', 'Подтверждено'),
@@ -194,17 +161,37 @@ class PCBooking(models.Model):
     comment = models.TextField(blank=True, verbose_name="Комментарий")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    INDEXED_FIELDS = (
+        "client_id", "pc_club_id", "plan_id", "start_time", "end_time", "status", "quantity", "hours",
+    )
+
     class Meta:
         verbose_name = "PC Booking"
         verbose_name_plural = "PC Bookings"
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=["status", "start_time"], name="pcbooking_status_start_idx"),
+            # PCClub.pcs_booked_at(): capacity held by live bookings in a window
+            models.Index(
+                fields=["pc_club", "start_time", "end_time"],
+                name="pcbooking_club_active_idx",
+                condition=models.Q(status__in=["pending", "confirmed"]),
+            ),
+            # owner dashboard
+            models.Index(fields=["pc_club", "status", "start_time"], name="pcbooking_club_status_idx"),
+            # client booking history
+            models.Index(fields=["client", "-start_time"], name="pcbooking_client_start_idx"),
+        ]
 
     def __str__(self):
         plan_name = self.plan.name if self.plan else "?"
         return f"{self.client} → {self.pc_club.name} [{plan_name}] {timezone.localtime(self.start_time):%d.%m %H:%M}"
 
 
-class PCPhoto(models.Model):
+class PCPhoto(ProcessedImagesMixin, models.Model):
+    IMAGE_FIELDS = {"image": ("card", "full")}
+    IMAGE_URL_FIELDS = {"image": "photo_url"}
+
     pc_club = models.ForeignKey(PCClub, on_delete=models.CASCADE, related_name='photos', verbose_name="PC Club")
     image = models.ImageField(upload_to=pc_photo_upload_to, blank=True, null=True, verbose_name="Фото")
     photo_url = models.URLField(max_length=500, blank=True, verbose_name="URL фото (демо/внешний)")
@@ -223,14 +210,6 @@ class PCPhoto(models.Model):
             return self.image.url
         return self.photo_url
 
-    def save(self, *args, **kwargs):
-        if self.image and _is_new_upload(self.image):
-            try:
-                self.image = _process_image_to_webp(self.image, max_size=1200)
-            except Exception:
-                pass
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"Photo for {self.pc_club.name}"
 
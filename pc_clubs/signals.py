@@ -1,20 +1,44 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import PCBooking
+from .models import PCBooking, PCClub, PCPlan
+from accounts.prefs import get_prefs
+from marketplace.booking_index import refresh_names, remove_booking, sync_booking
+from marketplace.events import publish_on_commit
 from marketplace.utils import send_telegram_message, send_sms
 
 
+@receiver(post_save, sender=PCBooking)
+def publish_pc_booking_event(sender, instance, **kwargs):
+    publish_on_commit(instance)
+
+
+@receiver(post_save, sender=PCBooking)
+def index_pc_booking(sender, instance, update_fields=None, **kwargs):
+    sync_booking(instance, update_fields)
+
+
+@receiver(post_delete, sender=PCBooking)
+def unindex_pc_booking(sender, instance, **kwargs):
+    remove_booking("pc_booking", instance.pk)
+
+
+@receiver(post_save, sender=PCClub)
+@receiver(post_save, sender=PCPlan)
+def refresh_indexed_names(sender, instance, created, **kwargs):
+    if not created:
+        refresh_names(instance)
+
+
 @receiver(post_save, sender=PCBooking)
 def notify_pc_booking_created(sender, instance, created, **kwargs):
     if not created:
         return
 
     client = instance.client
-    client_profile = getattr(client, "profile", None)
-    provider_user = instance.pc_club.owner
-    provider_profile = getattr(provider_user, "profile", None)
+    client_prefs = get_prefs(client.pk)
+    provider_prefs = get_prefs(instance.pc_club.owner_id)
 
     start_dt = timezone.localtime(instance.start_time).strftime("%d.%m.%Y %H:%M")
     plan_name = instance.plan.name if instance.plan else "—"
@@ -41,14 +65,14 @@ def notify_pc_booking_created(sender, instance, created, **kwargs):
     )
 
     # Telegram
-    if client_profile and client_profile.telegram_id:
-        send_telegram_message(client_profile.telegram_id, client_tg)
-    if provider_profile and provider_profile.telegram_id:
-        send_telegram_message(provider_profile.telegram_id, owner_tg)
+    if client_prefs.get("telegram_id"):
+        send_telegram_message(client_prefs["telegram_id"], client_tg)
+    if provider_prefs.get("telegram_id"):
+        send_telegram_message(provider_prefs["telegram_id"], owner_tg)
 
     # SMS
-    client_phone = getattr(client_profile, "phone", "") if client_profile else ""
-    owner_phone = getattr(provider_profile, "phone", "") if provider_profile else ""
+    client_phone = client_prefs.get("phone", "")
+    owner_phone = provider_prefs.get("phone", "")
     sms_client = f"Zayavka otpravlena! Klub: {club_name}, {plan_name}, {start_dt}. Ozhidayte podtverzhdeniya."
     sms_owner = f"Novaya zayavka na PK! Klient: {client.get_full_name() or client.username}, {plan_name}, {start_dt}."
     send_sms(client_phone, sms_client)
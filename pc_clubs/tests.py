@@ -1,3 +1,48 @@
+from datetime import time
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import PCClub, PCPhoto, PCPlan, PCWorkingHours
+
+
+class PCClubDetailQueryTests(TestCase):
+    # club, then one query each for active plans, working hours and photos.
+    QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user("owner", "owner@example.com", "pw")
+        cls.club = PCClub.objects.create(
+            name="Cyber Arena", owner=owner, address="Tashkent", phone="+998900000000",
+        )
+        for weekday in range(7):
+            PCWorkingHours.objects.create(
+                pc_club=cls.club, weekday=weekday, open_time=time(0), close_time=time(23, 59),
+            )
+        cls.add_rows(3)
+
+    @classmethod
+    def add_rows(cls, n):
+        start = PCPlan.objects.filter(pc_club=cls.club).count()
+        for i in range(start, start + n):
+            PCPlan.objects.create(
+                pc_club=cls.club, name=f"VIP {i}", price_per_hour=15000, is_active=bool(i % 2),
+            )
+            PCPhoto.objects.create(pc_club=cls.club, photo_url=f"https://example.com/{i}.jpg")
+
+    def get(self):
+        return self.client.get(reverse("pc_clubs:detail", args=[self.club.pk]))
+
+    def test_fixed_number_of_queries(self):
+        with self.assertNumQueries(self.QUERIES):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "VIP 1")
+        self.assertNotContains(response, "VIP 0")
 
-# Create your tests here.
+    def test_queries_do_not_grow_with_related_rows(self):
+        self.add_rows(10)
+        with self.assertNumQueries(self.QUERIES):
+            self.get()
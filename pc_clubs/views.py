@@ -1,16 +1,21 @@
+import logging
 import math
 from datetime import datetime, timedelta
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Min
+from django.db import transaction
+from django.db.models import Min, Prefetch
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from marketplace import clock
 from marketplace.models import Category
 
-from .models import PCBooking, PCClub, PCPlan
+from .models import PCBooking, PCClub, PCPhoto, PCPlan, PCWorkingHours
+
+logger = logging.getLogger(__name__)
 
 
 def _haversine_km(lat1, lng1, lat2, lng2):
@@ -48,7 +53,7 @@ def pc_club_list(request, category_slug=None):
     elif sort == "price_desc":
         clubs_qs = clubs_qs.annotate(min_price=Min("plans__price_per_hour")).order_by("-min_price")
     elif sort == "open_now":
-        now_local = timezone.localtime()
+        now_local = clock.current().local_now
         clubs_qs = clubs_qs.filter(
             working_hours__weekday=now_local.weekday(),
             working_hours__is_closed=False,
@@ -94,13 +99,31 @@ def pc_club_list(request, category_slug=None):
 
 
 def pc_club_detail(request, pk):
+    # One query per related list, narrowed to what the template renders
+    # (see PCClubDetailQueryTests).
     club = get_object_or_404(
-        PCClub.objects
-            .prefetch_related('plans', 'working_hours')
-            .select_related('category', 'location'),
+        PCClub.objects.prefetch_related(
+            Prefetch(
+                'plans',
+                queryset=PCPlan.objects.filter(is_active=True).only(
+                    'id', 'pc_club_id', 'name', 'description_ru', 'price_per_hour', 'color', 'icon_class'
+                ),
+                to_attr='active_plans',
+            ),
+            Prefetch(
+                'working_hours',
+                queryset=PCWorkingHours.objects.only(
+                    'id', 'pc_club_id', 'weekday', 'is_closed', 'open_time', 'close_time'
+                ),
+            ),
+            Prefetch(
+                'photos',
+                queryset=PCPhoto.objects.only('id', 'pc_club_id', 'image', 'photo_url', 'image_variants'),
+            ),
+        ),
         pk=pk,
     )
-    plans = club.plans.filter(is_active=True)
+    plans = club.active_plans
     working_hours = club.working_hours.all()
 
     booked_success = request.GET.get('booked') == '1'
@@ -109,7 +132,7 @@ def pc_club_detail(request, pk):
         'club': club,
         'plans': plans,
         'working_hours': working_hours,
-        'today_weekday': timezone.localtime().weekday(),
+        'today_weekday': clock.current().today.weekday(),
         'booked_success': booked_success,
     })
 
@@ -137,36 +160,40 @@ def pc_club_book(request, pk):
 
     plan = get_object_or_404(PCPlan, pk=plan_id, pc_club=club, is_active=True)
 
-    tz = timezone.get_current_timezone()
+    ctx = clock.current()
     try:
-        start_time = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        start_time = timezone.make_aware(start_time, tz)
+        start_time = ctx.aware(datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M"))
     except ValueError:
         return JsonResponse({'ok': False, 'error': 'Неверный формат даты или времени.'}, status=400)
 
-    if start_time < timezone.now():
+    if start_time < ctx.now:
         return JsonResponse({'ok': False, 'error': 'Нельзя бронировать прошедшее время.'}, status=400)
 
     end_time = start_time + timedelta(hours=hours)
 
-    available = club.available_pcs(start_time, end_time)
-    if quantity > available:
-        return JsonResponse({
-            'ok': False,
-            'error': f'Доступно только {available} ПК на это время.',
-        }, status=400)
-
-    PCBooking.objects.create(
-        client=request.user,
-        pc_club=club,
-        plan=plan,
-        quantity=quantity,
-        hours=hours,
-        start_time=start_time,
-        end_time=end_time,
-        comment=comment,
-        status='pending',
-    )
+    # Capacity is a sum over overlapping bookings, which an exclusion
+    # constraint can't express; lock the club row instead so concurrent
+    # requests check and insert one at a time.
+    with transaction.atomic():
+        PCClub.objects.select_for_update().filter(pk=club.pk).exists()
+        available = club.available_pcs(start_time, end_time)
+        if quantity > available:
+            return JsonResponse({
+                'ok': False,
+                'error': f'Доступно только {available} ПК на это время.',
+            }, status=400)
+
+        PCBooking.objects.create(
+            client=request.user,
+            pc_club=club,
+            plan=plan,
+            quantity=quantity,
+            hours=hours,
+            start_time=start_time,
+            end_time=end_time,
+            comment=comment,
+            status='pending',
+        )
 
     return JsonResponse({'ok': True, 'redirect': f'/pc-clubs/{club.pk}/?booked=1'})
 
@@ -226,8 +253,8 @@ def pc_booking_change_status(request, booking_id):
         phone = getattr(client_profile, "phone", "") if client_profile else ""
         send_sms(phone, sms_text)
 
-    except Exception as e:
-        print(f"PC booking notify error: {e}")
+    except Exception:
+        logger.exception("pc booking notify failed", extra={"fields": {"booking_id": booking.id}})
 
     return JsonResponse({
         "ok": True,
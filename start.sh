@@ -0,0 +1,18 @@
+#!/bin/sh
+# Web container entrypoint. SERVER_MODE (from .env) picks the deployment:
+#   wsgi (default)  gunicorn + gthread workers serving config.wsgi
+#   asgi            gunicorn + uvicorn workers serving config.asgi; the async
+#                   views (api_slots, submit_business_lead) wait on Telegram /
+#                   Eskiz without holding a worker thread
+# Compare the two with: python manage.py bench_concurrency
+set -e
+
+python manage.py collectstatic --noinput
+
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn config.asgi:application --bind 0.0.0.0:8000 --workers 3 \
+        --worker-class uvicorn_worker.UvicornWorker --timeout 60
+fi
+
+exec gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers 3 \
+    --worker-class gthread --threads 4 --timeout 60